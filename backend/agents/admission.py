@@ -0,0 +1,202 @@
+# agents/admission.py
+"""
+AdmissionController: Bounds how many agent pipelines run at once.
+
+Every /chat pipeline makes several Gemini calls. Without a bound, a
+burst overruns the provider quota and slows down every request in
+flight. The controller admits at most max_concurrent pipelines. Others
+wait in a bounded queue, served round-robin across users, so one user
+repeating requests cannot starve the rest. When the queue is full,
+requests are rejected immediately with a Retry-After hint:
+
+    429  the user already has max_queued_per_user requests waiting
+    503  the global queue is full, or the wait exceeded its limit
+
+Limits are per worker process (asyncio only, no locks).
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from tracing import metrics, span
+
+MAX_CONCURRENT_PIPELINES = int(os.getenv("AGENT_MAX_CONCURRENT_PIPELINES", "4"))
+MAX_QUEUED_PIPELINES = int(os.getenv("AGENT_MAX_QUEUED_PIPELINES", "32"))
+MAX_QUEUED_PER_USER = int(os.getenv("AGENT_MAX_QUEUED_PER_USER", "2"))
+MAX_QUEUE_WAIT_SECONDS = float(os.getenv("AGENT_ADMISSION_MAX_WAIT_SECONDS", "15"))
+
+metrics.describe(
+    "vibe_admission_queue_wait_seconds", "histogram",
+    "Time /chat pipelines waited for an admission slot"
+)
+metrics.describe(
+    "vibe_admission_rejections_total", "counter",
+    "Pipelines rejected by the admission controller, by reason"
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a pipeline cannot be admitted (maps to an HTTP error)."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded, per-user fair wait queue."""
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_PIPELINES,
+        max_queued: int = MAX_QUEUED_PIPELINES,
+        max_queued_per_user: int = MAX_QUEUED_PER_USER,
+        max_wait_seconds: float = MAX_QUEUE_WAIT_SECONDS
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.max_wait_seconds = max_wait_seconds
+        self.in_flight = 0
+        # user_id -> deque of waiting futures; iteration order is the
+        # round-robin order (a served user moves to the back)
+        self._waiting = OrderedDict()
+        self._queued = 0
+        # Moving average of pipeline duration, for Retry-After estimates
+        self._avg_duration = 10.0
+        self.admitted = 0
+        self.rejected = 0
+
+    def _retry_after(self) -> int:
+        """Seconds until a slot is likely free for a new request."""
+        rounds = (self._queued + 1) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(rounds * self._avg_duration))
+
+    def _reject(self, status_code: int, reason: str):
+        self.rejected += 1
+        metrics.inc("vibe_admission_rejections_total", reason=reason)
+        raise AdmissionRejected(status_code, reason, self._retry_after())
+
+    def _update_gauges(self):
+        metrics.set_gauge("vibe_admission_in_flight", self.in_flight)
+        metrics.set_gauge("vibe_admission_queue_depth", self._queued)
+
+    def _dispatch(self):
+        """Hands free slots to waiting users, one request per user per turn."""
+        while self.in_flight < self.max_concurrent and self._waiting:
+            user_id, waiters = next(iter(self._waiting.items()))
+            future = waiters.popleft()
+            self._queued -= 1
+            if waiters:
+                self._waiting.move_to_end(user_id)
+            else:
+                del self._waiting[user_id]
+            if future.done():
+                continue  # Cancelled or timed out while waiting
+            self.in_flight += 1
+            future.set_result(None)
+        self._update_gauges()
+
+    def _remove_waiter(self, user_id: str, future: asyncio.Future):
+        waiters = self._waiting.get(user_id)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            self._queued -= 1
+            if not waiters:
+                del self._waiting[user_id]
+        self._update_gauges()
+
+    async def acquire(self, user_id: str, max_wait: float = None):
+        """
+        Waits for a pipeline slot.
+
+        Args:
+            user_id: Spotify user ID (fairness key)
+            max_wait: Longest time to wait (capped by max_wait_seconds)
+
+        Raises:
+            AdmissionRejected: Queue full, per-user limit or wait exceeded
+        """
+        start = time.monotonic()
+        if self.in_flight < self.max_concurrent and not self._waiting:
+            self.in_flight += 1
+        else:
+            if len(self._waiting.get(user_id, ())) >= self.max_queued_per_user:
+                self._reject(429, "user_queue_full")
+            if self._queued >= self.max_queued:
+                self._reject(503, "queue_full")
+
+            future = asyncio.get_running_loop().create_future()
+            self._waiting.setdefault(user_id, deque()).append(future)
+            self._queued += 1
+            self._update_gauges()
+
+            timeout = self.max_wait_seconds
+            if max_wait is not None:
+                timeout = min(timeout, max_wait)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if future.done() and not future.cancelled():
+                    # Admitted just as we gave up: hand the slot back
+                    self.release()
+                else:
+                    future.cancel()
+                    self._remove_waiter(user_id, future)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self._reject(503, "wait_timeout")
+
+        self.admitted += 1
+        metrics.observe("vibe_admission_queue_wait_seconds", time.monotonic() - start)
+        self._update_gauges()
+
+    def release(self, duration: float = None):
+        """
+        Frees a slot and admits the next waiting request.
+
+        Args:
+            duration: How long the pipeline ran (improves Retry-After)
+        """
+        self.in_flight -= 1
+        if duration is not None:
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, user_id: str, max_wait: float = None):
+        """
+        Holds a pipeline slot for the duration of the block.
+
+        Usage:
+            async with admission_controller.admit(user_id):
+                result = await run_agent_with_context(...)
+        """
+        with span("admission_wait"):
+            await self.acquire(user_id, max_wait)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self._queued,
+            "queued_users": len(self._waiting),
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_pipeline_seconds": round(self._avg_duration, 2),
+        }
+
+
+# Shared controller for the /chat endpoint
+admission_controller = AdmissionController()
@@ -1,14 +1,28 @@
 import logging
+import os
+import random
 import warnings
+from contextlib import aclosing
+from google.adk.apps import App
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.genai import types
 
+from agents.deadline import (
+    QUEUEING_RESERVE_SECONDS,
+    Deadline,
+    fallback_playlist,
+    iterate_with_timeout
+)
+from agents.mood_targets import feature_args_to_mood_params
 from agents.orchestrator import create_orchestrator_agent
 from agents.context_formatter import (
     format_for_merger_agent,
     format_queue_info
 )
+from agents.scout_agent import SEARCH_ARGS_KEY
+from agents.tracing_plugin import TracingPlugin
+from tracing import begin_span, end_span, metrics, span
 
 # Suppress Google ADK warnings about non-text parts in responses
 logging.getLogger('google.genai').setLevel(logging.ERROR)
@@ -18,11 +32,16 @@ warnings.filterwarnings('ignore', message='.*non-text parts.*')
 # Provides run_agent_with_context() function to execute the orchestrator
 # pipeline with user context and return playlist results.
 
+# Fraction of requests that print the detailed agent outputs analysis
+# (0 disables it; 1 prints it for every request, useful when debugging)
+AGENT_DEBUG_SAMPLE_RATE = float(os.getenv("AGENT_DEBUG_SAMPLE_RATE", "0"))
+
 
 async def run_agent_with_context(
     user_message: str,
     spotify_context: dict,
-    user_id: str
+    user_id: str,
+    deadline: Deadline = None
 ) -> dict:
     """
     Runs the orchestrator agent with Google ADK using the official
@@ -32,32 +51,42 @@ async def run_agent_with_context(
         user_message: User's request/message
         spotify_context: Dict with 'user_profile' and 'queue'
         user_id: Spotify user ID
+        deadline: Request deadline (a new CHAT_DEADLINE_SECONDS one by
+                  default). Stages that overrun it are cancelled and the
+                  results already available are returned instead.
     
     Returns:
-        dict with playlist and metadata from MergerAgent
+        dict with playlist and metadata from MergerAgent (or a fallback
+        playlist marked "degraded"), plus "mood_params": the feature
+        ranges the catalog was searched with, or None when unknown
     """
-    # Format context using centralized formatter
-    user_profile_str = format_for_merger_agent(
-        spotify_context["user_profile"]
-    )
-    queue_str = format_queue_info(spotify_context["queue"])
-    
-    # Get full user context
-    user_context = spotify_context["user_profile"]
-    
-    # Create orchestrator agent
-    orchestrator = create_orchestrator_agent(
-        user_context=user_context,
-        user_id=user_id,
-        user_profile_str=user_profile_str,
-        queue_str=queue_str,
-        user_message=user_message
-    )
+    deadline = deadline or Deadline()
+
+    with span("prompt_build"):
+        # Format context using centralized formatter (unless the profile
+        # summary was already built by the login prefetch)
+        user_profile_str = spotify_context.get("user_profile_str") or format_for_merger_agent(
+            spotify_context["user_profile"]
+        )
+        queue_str = format_queue_info(spotify_context["queue"])
+        
+        # Get full user context
+        user_context = spotify_context["user_profile"]
+        
+        # Create orchestrator agent
+        orchestrator = create_orchestrator_agent(
+            user_context=user_context,
+            user_id=user_id,
+            user_profile_str=user_profile_str,
+            queue_str=queue_str,
+            user_message=user_message,
+            deadline=deadline
+        )
     
     # Setup session service and runner
     session_service = InMemorySessionService()
     
-    APP_NAME = "vibe-mood-playlist-agent"
+    APP_NAME = "vibe_mood_playlist_agent"
     USER_ID = f"spotify_{user_id}"
     SESSION_ID = f"session_{user_id}"
     
@@ -68,10 +97,14 @@ async def run_agent_with_context(
         session_id=SESSION_ID
     )
     
-    # Create runner
+    # Create runner (the tracing plugin records LLM turns and tool calls)
+    app = App(
+        name=APP_NAME,
+        root_agent=orchestrator,
+        plugins=[TracingPlugin()]
+    )
     runner = Runner(
-        agent=orchestrator,
-        app_name=APP_NAME,
+        app=app,
         session_service=session_service
     )
     
@@ -90,45 +123,92 @@ async def run_agent_with_context(
         "merger_input": None,
         "final_playlist": None
     }
+    # Arguments of the catalog search the ScoutAgent ran (its cache hit
+    # or its last successful tool call)
+    scout_search_args = None
     
-    async for event in runner.run_async(
-        user_id=USER_ID,
-        session_id=SESSION_ID,
-        new_message=content
-    ):
-        # Store event for debugging
-        all_events.append({
-            "author": event.author,
-            "content": str(event.content.parts[0]) if event.content and event.content.parts else "No content"
-        })
+    pipeline_span = begin_span("agent_pipeline")
+    events = iterate_with_timeout(
+        runner.run_async(
+            user_id=USER_ID,
+            session_id=SESSION_ID,
+            new_message=content
+        ),
+        max(deadline.remaining() - QUEUEING_RESERVE_SECONDS, 0.0)
+    )
+    try:
+        async with aclosing(events):
+            async for event in events:
+                # Store event for debugging
+                all_events.append({
+                    "author": event.author,
+                    "content": str(event.content.parts[0]) if event.content and event.content.parts else "No content"
+                })
         
-        # Capture output from each agent
-        if event.content and event.content.parts:
-            for part in event.content.parts:
-                # Check for text content (agent outputs)
-                if hasattr(part, 'text') and part.text:
-                    if event.author == "ScoutAgent":
-                        agent_outputs["scout_results"] = part.text
-                    elif event.author == "PersonalizedAgent":
-                        agent_outputs["personalized_results"] = part.text
-                    elif event.author == "MergerAgent":
-                        agent_outputs["merger_input"] = part.text
+                state_delta = event.actions.state_delta if event.actions else None
+                if state_delta and state_delta.get(SEARCH_ARGS_KEY):
+                    scout_search_args = state_delta[SEARCH_ARGS_KEY]
+
+                # Capture output from each agent
+                if event.content and event.content.parts:
+                    for part in event.content.parts:
+                        # Check for text content (agent outputs)
+                        if hasattr(part, 'text') and part.text:
+                            if event.author == "ScoutAgent":
+                                agent_outputs["scout_results"] = part.text
+                            elif event.author == "PersonalizedAgent":
+                                agent_outputs["personalized_results"] = part.text
+                            elif event.author == "MergerAgent":
+                                agent_outputs["merger_input"] = part.text
                 
-                # Look for MergerAgent's return_playlist_to_queue response
-                if (hasattr(part, 'function_response') and
-                        part.function_response):
-                    if (part.function_response.name ==
-                            'return_playlist_to_queue'):
-                        playlist_result = dict(
-                            part.function_response.response
-                        )
-                        agent_outputs["final_playlist"] = playlist_result
+                        # Look for MergerAgent's return_playlist_to_queue response
+                        if (hasattr(part, 'function_response') and
+                                part.function_response):
+                            if (part.function_response.name ==
+                                    'return_playlist_to_queue'):
+                                playlist_result = dict(
+                                    part.function_response.response
+                                )
+                                agent_outputs["final_playlist"] = playlist_result
         
-        # Break when orchestrator finishes
-        if event.is_final_response() and event.author == "OrchestratorAgent":
-            break
+                # Break when orchestrator finishes
+                if event.is_final_response() and event.author == "OrchestratorAgent":
+                    break
+    except TimeoutError:
+        print("--- Agent pipeline reached the request deadline, cancelled ---")
+        pipeline_span.set(timed_out=True)
+        metrics.inc("vibe_stage_timeouts_total", agent="OrchestratorAgent")
+    finally:
+        end_span(pipeline_span)
+
+    if AGENT_DEBUG_SAMPLE_RATE and random.random() < AGENT_DEBUG_SAMPLE_RATE:
+        _print_agent_outputs_analysis(agent_outputs)
     
-    # Print detailed analysis
+    # The MergerAgent did not finish in time (or returned nothing): use
+    # the scout / personalized results already available, or the database
+    if not (playlist_result and playlist_result.get("playlist")):
+        with span("fallback_playlist"):
+            playlist_result = fallback_playlist(agent_outputs, user_message)
+
+    # Feature target of the playlist, None when the scout never searched
+    if scout_search_args:
+        playlist_result["mood_params"] = feature_args_to_mood_params(scout_search_args)
+    else:
+        playlist_result.setdefault("mood_params", None)
+
+    return playlist_result if playlist_result.get("playlist") else {
+        "status": "error",
+        "message": "No playlist generated"
+    }
+
+
+def _print_agent_outputs_analysis(agent_outputs: dict):
+    """
+    Prints which agent contributed which tracks to the final playlist.
+
+    Debug aid only: sampled through AGENT_DEBUG_SAMPLE_RATE because
+    printing on every request is a cost on the hot path.
+    """
     print("\n" + "="*80)
     print("DETAILED AGENT OUTPUTS ANALYSIS")
     print("="*80)
@@ -200,12 +280,6 @@ async def run_agent_with_context(
         print("  ❌ NO FINAL PLAYLIST generated")
     
     print("\n" + "="*80)
-    
-    # Return the playlist result or empty dict if none found
-    return playlist_result if playlist_result else {
-        "status": "error",
-        "message": "No playlist generated"
-    }
 
 
 # Old implementation (commented for reference)
@@ -3,69 +3,262 @@
 Centralized context formatting for all agents.
 Provides consistent formatting of user music context with different
 detail levels for different agent needs.
+
+The PersonalizedAgent library is token-budgeted: tracks are deduplicated
+across sections, ranked, truncated to the budget and referenced through
+short local handles (t1, t2, ...) that are mapped back to URIs after
+generation with resolve_track_handles().
 """
+import os
+import re
+
+# Prompt budget for the PersonalizedAgent library section
+DEFAULT_LIBRARY_TOKEN_BUDGET = int(
+    os.getenv("PERSONALIZED_LIBRARY_TOKEN_BUDGET", "3000")
+)
+
+# Rank weight of each section a track appears in
+SECTION_WEIGHTS = {
+    "top_tracks": 3,
+    "recently_played": 2,
+    "playlists": 1,
+}
+
+SECTION_TITLES = {
+    "top_tracks": "YOUR TOP TRACKS:",
+    "recently_played": "RECENTLY PLAYED:",
+    "playlists": "YOUR PLAYLISTS:",
+    "top_artists": "YOUR FAVORITE ARTISTS:",
+}
+
+_HANDLE_RE = re.compile(r"\bt(\d+)\b")
+_URI_RE = re.compile(r"spotify:track:[A-Za-z0-9]+")
 
 
-def format_for_personalized_agent(user_context: dict) -> str:
+def estimate_tokens(text: str) -> int:
     """
-    Formats user library for PersonalizedAgent with FULL DETAIL.
-    
-    PersonalizedAgent needs URIs to select specific tracks, so this
-    format includes complete track information with URIs.
-    
+    Estimates the LLM token count of a string.
+
+    Uses the usual ~4 characters per token approximation, which is close
+    enough for budgeting without pulling in a tokenizer.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated number of tokens
+    """
+    return (len(text) + 3) // 4 if text else 0
+
+
+def collect_library_tracks(user_context: dict) -> list:
+    """
+    Deduplicates tracks across top tracks, recently played and playlists.
+
     Args:
         user_context: Processed user context dict
-    
+
     Returns:
-        Detailed string with all track URIs
+        List of track dicts (name, artist, uri, sections, playlists,
+        score) ranked by score, best first
     """
-    lines = []
-    
-    # User's playlists with tracks (DETAILED with URIs)
-    playlists = user_context.get("playlists", [])
-    if playlists:
-        lines.append("YOUR PLAYLISTS:")
-        for playlist in playlists:
-            tracks = playlist.get("tracks", [])
-            if tracks:
-                lines.append(f"  • {playlist['name']}:")
-                # Show tracks with URIs (up to 30 per playlist)
-                for track in tracks[:30]:
-                    name = track.get("name", "Unknown")
-                    artist = track.get("artist", "Unknown")
-                    uri = track.get("uri", "")
-                    lines.append(f"    - {name} by {artist} ({uri})")
-    
-    # Top tracks
-    top_tracks = user_context.get("top_tracks", [])
-    if top_tracks:
-        lines.append("\nYOUR TOP TRACKS:")
-        for track in top_tracks[:20]:
-            name = track.get("name", "Unknown")
-            artist = track.get("artist", "Unknown")
-            uri = track.get("uri", "")
-            lines.append(f"  • {name} by {artist} ({uri})")
-    
-    # Recently played
-    recently = user_context.get("recently_played", [])
-    if recently:
-        lines.append("\nRECENTLY PLAYED:")
-        for track in recently[:20]:
-            name = track.get("name", "Unknown")
-            artist = track.get("artist", "Unknown")
-            uri = track.get("uri", "")
-            lines.append(f"  • {name} by {artist} ({uri})")
-    
-    # Top artists for context
-    top_artists = user_context.get("top_artists", [])
-    if top_artists:
-        lines.append("\nYOUR FAVORITE ARTISTS:")
-        for artist in top_artists[:20]:
-            name = artist.get("name", "Unknown")
-            genres = ", ".join(artist.get("genres", [])[:3])
-            lines.append(f"  • {name} ({genres})")
-    
-    return "\n".join(lines)
+    tracks_by_uri = {}
+
+    def add(track: dict, section: str, playlist_name: str = None):
+        uri = track.get("uri")
+        if not uri:
+            return
+        entry = tracks_by_uri.get(uri)
+        if entry is None:
+            entry = tracks_by_uri[uri] = {
+                "name": track.get("name", "Unknown"),
+                "artist": track.get("artist", "Unknown"),
+                "uri": uri,
+                "sections": [],
+                "playlists": [],
+                "score": 0,
+                "order": len(tracks_by_uri),
+            }
+        if section not in entry["sections"]:
+            entry["sections"].append(section)
+        if playlist_name and playlist_name not in entry["playlists"]:
+            entry["playlists"].append(playlist_name)
+        entry["score"] += SECTION_WEIGHTS[section]
+
+    for track in user_context.get("top_tracks", [])[:20]:
+        add(track, "top_tracks")
+    for track in user_context.get("recently_played", [])[:20]:
+        add(track, "recently_played")
+    for playlist in user_context.get("playlists", []):
+        for track in playlist.get("tracks", [])[:30]:
+            add(track, "playlists", playlist.get("name"))
+
+    return sorted(
+        tracks_by_uri.values(),
+        key=lambda t: (-t["score"], t["order"])
+    )
+
+
+def _format_track_line(track: dict, use_handles: bool) -> str:
+    """Formats one library track as a prompt line."""
+    if use_handles:
+        return f"  • [{track['handle']}] {track['name']} by {track['artist']}"
+    return f"  • {track['name']} by {track['artist']} ({track['uri']})"
+
+
+def build_personalized_library(
+    user_context: dict,
+    token_budget: int = DEFAULT_LIBRARY_TOKEN_BUDGET,
+    use_handles: bool = True
+) -> dict:
+    """
+    Builds the token-budgeted user library for the PersonalizedAgent.
+
+    Tracks are deduplicated across playlists, top tracks and recently
+    played, ranked (tracks present in several sections and top tracks
+    first) and included until the token budget is spent. Each track is
+    listed once, under the highest-weighted section it appears in.
+
+    Args:
+        user_context: Processed user context dict
+        token_budget: Maximum estimated tokens for the library text
+        use_handles: Reference tracks by short handles instead of URIs
+
+    Returns:
+        dict with:
+        - text: formatted library
+        - handles: dict mapping handle -> URI
+        - section_tokens: estimated tokens per section
+        - total_tokens: estimated tokens of the whole text
+        - included_tracks / dropped_tracks: counts after deduplication
+    """
+    # Favorite artists are small and give the model taste context, so
+    # they are reserved first
+    artist_lines = []
+    for artist in user_context.get("top_artists", [])[:20]:
+        genres = ", ".join(artist.get("genres", [])[:3])
+        artist_lines.append(f"  • {artist.get('name', 'Unknown')} ({genres})")
+    artists_text = ""
+    if artist_lines:
+        artists_text = "\n".join([SECTION_TITLES["top_artists"]] + artist_lines)
+
+    # Section titles and playlist headers are charged when the first
+    # track that needs them is selected, so the text stays within budget
+    # and empty sections cost nothing
+    remaining = token_budget - estimate_tokens(artists_text)
+    ranked = collect_library_tracks(user_context)
+    selected = []
+    grouped = {section: [] for section in SECTION_WEIGHTS}
+    opened_playlists = set()
+    for track in ranked:
+        track["handle"] = f"t{len(selected) + 1}"
+        # Each track is listed under its best section
+        section = max(track["sections"], key=SECTION_WEIGHTS.get)
+        playlist_name = track["playlists"][0] if section == "playlists" else None
+        line = _format_track_line(track, use_handles)
+        if playlist_name is not None:
+            line = "  " + line  # Indented under its playlist
+        cost = estimate_tokens(line) + 1
+        if not grouped[section]:
+            cost += estimate_tokens(SECTION_TITLES[section]) + 1
+        if playlist_name is not None and playlist_name not in opened_playlists:
+            cost += estimate_tokens(f"  {playlist_name}:") + 1
+        if cost > remaining:
+            break
+        remaining -= cost
+        selected.append(track)
+        grouped[section].append(track)
+        if playlist_name is not None:
+            opened_playlists.add(playlist_name)
+
+    sections = {}
+    for section, tracks in grouped.items():
+        if not tracks:
+            continue
+        lines = [SECTION_TITLES[section]]
+        if section == "playlists":
+            # Keep playlist names, they carry strong mood hints
+            by_playlist = {}
+            for track in tracks:
+                by_playlist.setdefault(track["playlists"][0], []).append(track)
+            for playlist_name, playlist_tracks in by_playlist.items():
+                lines.append(f"  {playlist_name}:")
+                lines.extend(
+                    "  " + _format_track_line(t, use_handles)
+                    for t in playlist_tracks
+                )
+        else:
+            lines.extend(_format_track_line(t, use_handles) for t in tracks)
+        sections[section] = "\n".join(lines)
+    if artists_text:
+        sections["top_artists"] = artists_text
+
+    text = "\n\n".join(sections.values())
+    return {
+        "text": text,
+        "handles": {t["handle"]: t["uri"] for t in selected} if use_handles else {},
+        "section_tokens": {
+            section: estimate_tokens(section_text)
+            for section, section_text in sections.items()
+        },
+        "total_tokens": estimate_tokens(text),
+        "included_tracks": len(selected),
+        "dropped_tracks": len(ranked) - len(selected),
+    }
+
+
+def resolve_track_handles(text: str, handles: dict) -> str:
+    """
+    Maps the handles in a PersonalizedAgent response back to URIs.
+
+    Each line may contain a handle (t12, [t12]) or a full Spotify URI.
+    Unknown handles and duplicates are dropped.
+
+    Args:
+        text: Raw model output
+        handles: dict mapping handle -> URI from build_personalized_library
+
+    Returns:
+        Spotify URIs, one per line
+    """
+    uris = []
+    for line in (text or "").splitlines():
+        uri_match = _URI_RE.search(line)
+        handle_match = _HANDLE_RE.search(line)
+        if uri_match:
+            uri = uri_match.group(0)
+        elif handle_match:
+            uri = handles.get(f"t{handle_match.group(1)}")
+        else:
+            uri = None
+        if uri and uri not in uris:
+            uris.append(uri)
+    return "\n".join(uris)
+
+
+def format_for_personalized_agent(
+    user_context: dict,
+    token_budget: int = DEFAULT_LIBRARY_TOKEN_BUDGET
+) -> str:
+    """
+    Formats user library for PersonalizedAgent with full URIs.
+
+    Deduplicated and truncated to the token budget like
+    build_personalized_library(), but tracks keep their URIs so the
+    output can be used without handle resolution.
+
+    Args:
+        user_context: Processed user context dict
+        token_budget: Maximum estimated tokens for the library text
+
+    Returns:
+        Detailed string with track URIs
+    """
+    return build_personalized_library(
+        user_context,
+        token_budget=token_budget,
+        use_handles=False
+    )["text"]
 
 
 def format_for_merger_agent(user_context: dict) -> str:
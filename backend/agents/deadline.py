@@ -0,0 +1,206 @@
+# agents/deadline.py
+"""
+Request deadline and per-stage time budgets for the agent pipeline.
+
+Each /chat request gets a Deadline. Every agent stage runs inside a
+DeadlineAgent. That wrapper gives the stage min(stage budget, time left
+before the deadline minus the reserve kept for validating and queueing
+tracks). When a stage overruns, its event generator is cancelled, so
+the in-flight LLM request or tool call gets CancelledError and stops
+using resources. The pipeline then continues with what is already
+available:
+
+    PersonalizedAgent late -> MergerAgent merges the scout results only
+    MergerAgent late       -> scout + personalized picks, interleaved
+    nothing available      -> direct database search for the mood
+
+Tail latency matters more than perfect curation, so a late answer is
+replaced by a good-enough one rather than an error.
+"""
+import asyncio
+import os
+import re
+import time
+from contextlib import aclosing
+from typing import AsyncGenerator
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+
+from agents.mood_targets import estimate_mood_params
+from data_spotify.database_service import search_all_songs
+from tracing import begin_span, end_span, metrics
+
+# End-to-end budget of a /chat request (Spotify lookups + agents + queueing)
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "30"))
+
+# Time kept aside at the end for validating and queueing the tracks
+QUEUEING_RESERVE_SECONDS = float(os.getenv("CHAT_QUEUEING_RESERVE_SECONDS", "4"))
+
+# Maximum time per agent stage (further capped by the request deadline)
+STAGE_BUDGETS = {
+    "ScoutAgent": float(os.getenv("SCOUT_BUDGET_SECONDS", "12")),
+    "PersonalizedAgent": float(os.getenv("PERSONALIZED_BUDGET_SECONDS", "10")),
+    "MergerAgent": float(os.getenv("MERGER_BUDGET_SECONDS", "12")),
+}
+
+# Size of the playlist built when the MergerAgent did not finish
+FALLBACK_PLAYLIST_SIZE = 20
+
+_URI_RE = re.compile(r"spotify:track:[A-Za-z0-9]+")
+
+metrics.describe(
+    "vibe_stage_timeouts_total", "counter",
+    "Agent stages cancelled for exceeding their time budget"
+)
+metrics.describe(
+    "vibe_deadline_fallbacks_total", "counter",
+    "Requests answered with a fallback playlist, by source"
+)
+
+
+class Deadline:
+    """Absolute deadline of one request."""
+
+    def __init__(self, seconds: float = None):
+        """
+        Args:
+            seconds: Time allowed from now (defaults to CHAT_DEADLINE_SECONDS)
+        """
+        self.seconds = CHAT_DEADLINE_SECONDS if seconds is None else seconds
+        self.expires_at = time.monotonic() + self.seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)."""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def budget(self, stage: str) -> float:
+        """
+        Time a stage may use now.
+
+        Args:
+            stage: Agent name (see STAGE_BUDGETS); unknown stages only get
+                   the deadline cap
+
+        Returns:
+            Seconds, capped so that the queueing reserve is preserved
+        """
+        available = max(self.remaining() - QUEUEING_RESERVE_SECONDS, 0.0)
+        return min(STAGE_BUDGETS.get(stage, available), available)
+
+
+async def iterate_with_timeout(
+    events: AsyncGenerator, timeout: float
+) -> AsyncGenerator:
+    """
+    Yields from an async generator until it ends or timeout elapses.
+
+    The timeout only applies while waiting for the next item (never
+    across a yield), so the cancellation lands inside the generator: its
+    pending awaits (LLM requests, child tasks) are cancelled, and the
+    generator is closed.
+
+    Raises:
+        TimeoutError: When the timeout elapsed before the generator ended
+    """
+    expires_at = asyncio.get_running_loop().time() + timeout
+    async with aclosing(events):
+        while True:
+            try:
+                async with asyncio.timeout_at(expires_at):
+                    item = await anext(events)
+            except StopAsyncIteration:
+                return
+            yield item
+
+
+class DeadlineAgent(BaseAgent):
+    """
+    Runs a single sub-agent within its stage budget.
+
+    Events of the sub-agent are passed through unchanged (same author),
+    so callers that look for e.g. "PersonalizedAgent" events still work.
+    On timeout the sub-agent is cancelled and the wrapper simply ends.
+    """
+
+    deadline: Deadline
+
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        agent = self.sub_agents[0]
+        budget = self.deadline.budget(agent.name)
+        stage_span = begin_span("agent_stage", agent=agent.name, budget_s=round(budget, 2))
+        try:
+            async with aclosing(iterate_with_timeout(agent.run_async(ctx), budget)) as events:
+                async for event in events:
+                    yield event
+        except TimeoutError:
+            print(f"--- {agent.name} exceeded its {budget:.1f}s budget, cancelled ---")
+            stage_span.set(timed_out=True)
+            metrics.inc("vibe_stage_timeouts_total", agent=agent.name)
+        finally:
+            end_span(stage_span)
+
+
+def with_deadline(agent: BaseAgent, deadline: Deadline) -> DeadlineAgent:
+    """Wraps an agent so it runs within its stage budget of deadline."""
+    return DeadlineAgent(
+        name=f"{agent.name}WithDeadline",
+        description=agent.description,
+        sub_agents=[agent],
+        deadline=deadline
+    )
+
+
+def fallback_playlist(agent_outputs: dict, user_message: str) -> dict:
+    """
+    Builds the playlist when the MergerAgent did not return one in time.
+
+    Interleaves the personalized picks and scout results that are
+    already available. When there are none, runs a direct database search
+    for the mood estimated from the message (no LLM involved).
+
+    Args:
+        agent_outputs: Texts captured from the agent events
+            (scout_results, personalized_results)
+        user_message: User's request/message
+
+    Returns:
+        dict in the return_playlist_to_queue format, plus "degraded",
+        "fallback_source" and, for a database search, its "mood_params"
+    """
+    scout = _URI_RE.findall(agent_outputs.get("scout_results") or "")
+    personalized = _URI_RE.findall(agent_outputs.get("personalized_results") or "")
+
+    interleaved = []
+    for i in range(max(len(scout), len(personalized))):
+        interleaved.extend(uri_list[i] for uri_list in (personalized, scout) if i < len(uri_list))
+    playlist = list(dict.fromkeys(interleaved))[:FALLBACK_PLAYLIST_SIZE]
+    source = "+".join(
+        name for name, uris in (("personalized", personalized), ("scout", scout)) if uris
+    )
+
+    mood_params = None
+    if not playlist:
+        mood_params = estimate_mood_params(user_message) or {}
+        songs = search_all_songs(mood_params, None, FALLBACK_PLAYLIST_SIZE)
+        playlist = list(dict.fromkeys(song["uri"] for song in songs))
+        source = "database"
+
+    metrics.inc("vibe_deadline_fallbacks_total", source=source)
+    print(f"--- Fallback playlist from {source}: {len(playlist)} tracks ---")
+    return {
+        "status": "success" if playlist else "error",
+        "playlist": playlist,
+        "total_tracks": len(playlist),
+        "message": f"Playlist created with {len(playlist)} songs (fallback: {source})",
+        "degraded": True,
+        "fallback_source": source,
+        "mood_params": mood_params or None,
+    }
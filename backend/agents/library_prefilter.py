@@ -0,0 +1,94 @@
+# agents/library_prefilter.py
+"""
+Pre-filters the user's library by audio features before it is handed to
+the PersonalizedAgent.
+
+Library tracks are joined against the local audio_features table and
+scored by distance to the requested mood; only the best slice goes into
+the prompt. Liked songs from the persistent user library store that
+match the mood are added as an extra playlist. When the mood cannot be
+estimated, or no library track is in the local catalog, the context is
+returned unchanged.
+"""
+import logging
+import os
+
+from agents.context_formatter import collect_library_tracks
+from agents.mood_targets import estimate_mood_params
+from data_spotify.database_service import (
+    enrich_songs_with_features,
+    rank_songs_by_mood,
+    search_liked_songs
+)
+
+PREFILTER_KEEP_TRACKS = int(os.getenv("PERSONALIZED_PREFILTER_KEEP", "60"))
+
+logger = logging.getLogger(__name__)
+
+
+def prefilter_user_context(
+    user_context: dict,
+    user_message: str,
+    user_id: str = None,
+    keep: int = PREFILTER_KEEP_TRACKS
+) -> dict:
+    """
+    Keeps only the library tracks closest to the requested mood.
+
+    Args:
+        user_context: Processed user context dict
+        user_message: User's request/message
+        user_id: Spotify user ID; when given, mood-matching liked songs
+            from the library store are added
+        keep: Number of tracks to keep
+
+    Returns:
+        Copy of user_context whose track lists only contain the kept
+        tracks (top_artists and other keys untouched)
+    """
+    mood_params = estimate_mood_params(user_message)
+    if not mood_params:
+        return user_context
+
+    songs = [
+        {"name": t["name"], "artist": t["artist"], "uri": t["uri"]}
+        for t in collect_library_tracks(user_context)
+    ]
+    enriched = enrich_songs_with_features(songs)
+    liked = search_liked_songs(user_id, mood_params, limit=keep // 2) if user_id else []
+    if not liked and not any(song["features"] for song in enriched):
+        return user_context
+
+    ranked = rank_songs_by_mood(enriched, mood_params, limit=keep)
+    kept_uris = {song["uri"] for song in ranked}
+    logger.debug(
+        "Library pre-filter: kept %d of %d tracks for mood %s",
+        len(kept_uris), len(songs), mood_params
+    )
+
+    filtered = dict(user_context)
+    for key in ("top_tracks", "recently_played"):
+        if key in user_context:
+            filtered[key] = [
+                t for t in user_context[key] if t.get("uri") in kept_uris
+            ]
+    if "playlists" in user_context:
+        filtered["playlists"] = [
+            {
+                **playlist,
+                "tracks": [
+                    t for t in playlist.get("tracks", [])
+                    if t.get("uri") in kept_uris
+                ]
+            }
+            for playlist in user_context["playlists"]
+        ]
+    if liked:
+        filtered["playlists"] = [{
+            "name": "Liked Songs (mood match)",
+            "tracks": [
+                {"name": song["track_name"], "artist": song["artist_name"], "uri": song["uri"]}
+                for song in liked
+            ]
+        }] + filtered.get("playlists", [])
+    return filtered
@@ -0,0 +1,214 @@
+# agents/model_backend.py
+"""
+Pluggable model backend for the ADK agents.
+
+By default every agent uses Gemini. With AGENT_MODEL_BACKEND=scripted the
+agents use ScriptedLlm instead. It is a local fake that replays scripted
+responses and tool calls after a configurable latency, with no network and
+no Gemini quota. It is meant for benchmarks and load tests, which measure
+our own pipeline overhead.
+
+Configuration (environment):
+    AGENT_MODEL_BACKEND        gemini (default) | scripted
+    SCRIPTED_LLM_LATENCY       latency spec for every turn, e.g.
+                               "fixed:800", "uniform:200:1200",
+                               "lognormal:800:0.5" (median ms, sigma)
+    SCRIPTED_LLM_SCRIPT        optional JSON file with per-agent steps
+
+Script file format (every key optional):
+    {
+      "ScoutAgent": {
+        "latency": "lognormal:900:0.4",
+        "steps": [
+          {"function_call": {"name": "search_local_db_by_mood", "args": {...}}},
+          {"text": "spotify:track:..."}
+        ]
+      }
+    }
+
+Without steps, each agent follows a default script that mimics the real
+pipeline: the scout calls its tool and returns the URIs it got back, the
+personalized agent picks handles from its library, and the merger calls
+return_playlist_to_queue with the URIs it has seen.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import re
+from typing import AsyncGenerator
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+
+from agents.context_formatter import estimate_tokens
+
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# Feature ranges the default ScoutAgent script searches with
+DEFAULT_SCOUT_ARGS = {
+    "energy_min": 0.3, "energy_max": 0.8,
+    "valence_min": 0.3, "valence_max": 0.8,
+    "danceability_min": 0.3, "danceability_max": 0.8,
+    "acousticness_min": 0.0, "acousticness_max": 0.7,
+    "tempo_min": 80, "tempo_max": 140,
+    "limit": 20,
+}
+
+_URI_RE = re.compile(r"spotify:track:[A-Za-z0-9]+")
+_HANDLE_RE = re.compile(r"\[(t\d+)\]")
+
+
+def sample_latency(spec: str) -> float:
+    """
+    Draws one latency (seconds) from a distribution spec.
+
+    Args:
+        spec: "fixed:<ms>", "uniform:<min_ms>:<max_ms>" or
+              "lognormal:<median_ms>:<sigma>"
+
+    Returns:
+        Latency in seconds
+    """
+    kind, *values = (spec or "fixed:0").split(":")
+    values = [float(v) for v in values]
+    if kind == "fixed":
+        ms = values[0]
+    elif kind == "uniform":
+        ms = random.uniform(values[0], values[1])
+    elif kind == "lognormal":
+        ms = random.lognormvariate(math.log(max(values[0], 1e-3)), values[1])
+    else:
+        raise ValueError(f"Unknown latency distribution: {spec}")
+    return max(ms, 0.0) / 1000
+
+
+def _load_script() -> dict:
+    """Loads the optional per-agent script file."""
+    script_file = os.getenv("SCRIPTED_LLM_SCRIPT")
+    if not script_file:
+        return {}
+    with open(script_file) as f:
+        return json.load(f)
+
+
+def _request_text(llm_request: LlmRequest) -> str:
+    """Concatenates all text the model would see (instruction + contents)."""
+    texts = []
+    instruction = llm_request.config.system_instruction if llm_request.config else None
+    if isinstance(instruction, str):
+        texts.append(instruction)
+    for content in llm_request.contents:
+        for part in content.parts or []:
+            if part.text:
+                texts.append(part.text)
+    return "\n".join(texts)
+
+
+def _function_responses(llm_request: LlmRequest) -> list:
+    """Function responses already present in the request (own tool results)."""
+    return [
+        part.function_response
+        for content in llm_request.contents
+        for part in content.parts or []
+        if part.function_response
+    ]
+
+
+class ScriptedLlm(BaseLlm):
+    """
+    Offline stand-in for Gemini that replays scripted turns.
+
+    One instance is created per agent so it knows which default script
+    to follow.
+    """
+
+    agent_name: str
+    latency: str = "fixed:0"
+    steps: list = []
+
+    def _next_step(self, llm_request: LlmRequest) -> dict:
+        """Picks the step for this turn (one step per completed tool call)."""
+        turn = len(_function_responses(llm_request))
+        if self.steps:
+            return self.steps[min(turn, len(self.steps) - 1)]
+        return self._default_step(llm_request, turn)
+
+    def _default_step(self, llm_request: LlmRequest, turn: int) -> dict:
+        """Default behaviour mimicking each agent of the real pipeline."""
+        if self.agent_name == "ScoutAgent":
+            responses = _function_responses(llm_request)
+            if not responses:
+                return {"function_call": {
+                    "name": "search_local_db_by_mood",
+                    "args": DEFAULT_SCOUT_ARGS
+                }}
+            results = (responses[-1].response or {}).get("results", [])
+            return {"text": "\n".join(song["uri"] for song in results)}
+
+        if self.agent_name == "PersonalizedAgent":
+            instruction = llm_request.config.system_instruction or ""
+            handles = _HANDLE_RE.findall(str(instruction))[:20]
+            return {"text": "\n".join(handles)}
+
+        if self.agent_name == "MergerAgent":
+            if turn:
+                return {"text": "Playlist ready."}
+            uris = list(dict.fromkeys(_URI_RE.findall(_request_text(llm_request))))
+            return {"function_call": {
+                "name": "return_playlist_to_queue",
+                "args": {"playlist": uris[:20]}
+            }}
+
+        return {"text": "OK"}
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        step = self._next_step(llm_request)
+        await asyncio.sleep(sample_latency(step.get("latency", self.latency)))
+
+        if "function_call" in step:
+            part = types.Part(function_call=types.FunctionCall(
+                name=step["function_call"]["name"],
+                args=step["function_call"].get("args", {})
+            ))
+            output_text = json.dumps(step["function_call"])
+        else:
+            part = types.Part(text=step.get("text", ""))
+            output_text = part.text
+
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[part]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=estimate_tokens(_request_text(llm_request)),
+                candidates_token_count=estimate_tokens(output_text)
+            )
+        )
+
+
+def get_model(agent_name: str):
+    """
+    Returns the model an agent should use.
+
+    Args:
+        agent_name: Name of the agent (ScoutAgent, PersonalizedAgent, ...)
+
+    Returns:
+        The Gemini model name, or a ScriptedLlm when
+        AGENT_MODEL_BACKEND=scripted
+    """
+    # Read at call time so benchmarks can switch backends after import
+    if os.getenv("AGENT_MODEL_BACKEND", "gemini") != "scripted":
+        return GEMINI_MODEL
+
+    agent_script = _load_script().get(agent_name, {})
+    return ScriptedLlm(
+        model=f"scripted-{agent_name}",
+        agent_name=agent_name,
+        latency=agent_script.get(
+            "latency", os.getenv("SCRIPTED_LLM_LATENCY", "fixed:0")
+        ),
+        steps=agent_script.get("steps", [])
+    )
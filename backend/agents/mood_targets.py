@@ -0,0 +1,113 @@
+# agents/mood_targets.py
+"""
+Estimates audio-feature targets for a user request without an LLM call.
+
+Used where a mood is needed before (or instead of) the ScoutAgent, e.g.
+to pre-filter the user's library for the PersonalizedAgent. The estimate
+comes from the translation cache when the ScoutAgent has already
+translated this vibe, otherwise from a small keyword lexicon.
+"""
+import re
+
+from agents.translation_cache import translation_cache
+
+# Half-width of the range built around a lexicon target
+RANGE_HALF_WIDTH = 0.2
+TEMPO_HALF_WIDTH = 25.0
+
+# Keyword -> feature targets (English and Spanish)
+MOOD_LEXICON = {
+    "chill": {"energy": 0.3, "valence": 0.5, "acousticness": 0.6, "tempo": 95},
+    "relax": {"energy": 0.25, "valence": 0.5, "acousticness": 0.7, "tempo": 90},
+    "relaxed": {"energy": 0.25, "valence": 0.5, "acousticness": 0.7, "tempo": 90},
+    "relajado": {"energy": 0.25, "valence": 0.5, "acousticness": 0.7, "tempo": 90},
+    "study": {"energy": 0.3, "danceability": 0.4, "acousticness": 0.6, "tempo": 100},
+    "focus": {"energy": 0.35, "danceability": 0.4, "acousticness": 0.5, "tempo": 105},
+    "estudiar": {"energy": 0.3, "danceability": 0.4, "acousticness": 0.6, "tempo": 100},
+    "sleep": {"energy": 0.15, "valence": 0.4, "acousticness": 0.8, "tempo": 75},
+    "dormir": {"energy": 0.15, "valence": 0.4, "acousticness": 0.8, "tempo": 75},
+    "sad": {"energy": 0.3, "valence": 0.15, "acousticness": 0.6, "tempo": 85},
+    "triste": {"energy": 0.3, "valence": 0.15, "acousticness": 0.6, "tempo": 85},
+    "happy": {"energy": 0.7, "valence": 0.85, "danceability": 0.7},
+    "feliz": {"energy": 0.7, "valence": 0.85, "danceability": 0.7},
+    "party": {"energy": 0.85, "valence": 0.75, "danceability": 0.85, "tempo": 124},
+    "fiesta": {"energy": 0.85, "valence": 0.75, "danceability": 0.85, "tempo": 124},
+    "dance": {"energy": 0.8, "danceability": 0.85, "tempo": 122},
+    "bailar": {"energy": 0.8, "danceability": 0.85, "tempo": 122},
+    "gym": {"energy": 0.9, "valence": 0.6, "danceability": 0.7, "tempo": 135},
+    "workout": {"energy": 0.9, "valence": 0.6, "danceability": 0.7, "tempo": 135},
+    "hype": {"energy": 0.9, "valence": 0.7, "danceability": 0.75, "tempo": 130},
+    "entrenar": {"energy": 0.9, "valence": 0.6, "danceability": 0.7, "tempo": 135},
+    "energetic": {"energy": 0.85, "tempo": 128},
+    "energia": {"energy": 0.85, "tempo": 128},
+    "acoustic": {"acousticness": 0.85, "energy": 0.35},
+    "acustico": {"acousticness": 0.85, "energy": 0.35},
+    "romantic": {"energy": 0.4, "valence": 0.6, "acousticness": 0.5, "tempo": 95},
+    "romantico": {"energy": 0.4, "valence": 0.6, "acousticness": 0.5, "tempo": 95},
+}
+
+FEATURE_ARG_NAMES = ("energy", "valence", "danceability", "acousticness", "tempo")
+
+
+def feature_args_to_mood_params(args: dict) -> dict:
+    """
+    Converts search_local_db_by_mood arguments into mood_params.
+
+    Args:
+        args: Tool arguments like {"energy_min": 0.2, "energy_max": 0.5, ...}
+
+    Returns:
+        mood_params dict like {"energy": {"min": 0.2, "max": 0.5}, ...}
+    """
+    mood_params = {}
+    for feature in FEATURE_ARG_NAMES:
+        bounds = {}
+        if args.get(f"{feature}_min") is not None:
+            bounds["min"] = args[f"{feature}_min"]
+        if args.get(f"{feature}_max") is not None:
+            bounds["max"] = args[f"{feature}_max"]
+        if bounds:
+            mood_params[feature] = bounds
+    return mood_params
+
+
+def _lexicon_mood_params(user_message: str) -> dict | None:
+    """Averages the lexicon targets of every mood keyword in the message."""
+    tokens = re.findall(r"\w+", (user_message or "").lower())
+    matches = [MOOD_LEXICON[token] for token in tokens if token in MOOD_LEXICON]
+    if not matches:
+        return None
+
+    mood_params = {}
+    features = {feature for match in matches for feature in match}
+    for feature in features:
+        values = [match[feature] for match in matches if feature in match]
+        target = round(sum(values) / len(values), 2)
+        if feature == "tempo":
+            mood_params[feature] = {
+                "min": target - TEMPO_HALF_WIDTH,
+                "max": target + TEMPO_HALF_WIDTH
+            }
+        else:
+            mood_params[feature] = {
+                "min": round(max(0.0, target - RANGE_HALF_WIDTH), 2),
+                "max": round(min(1.0, target + RANGE_HALF_WIDTH), 2)
+            }
+    return mood_params
+
+
+def estimate_mood_params(user_message: str) -> dict | None:
+    """
+    Estimates feature ranges for a request without calling the LLM.
+
+    Args:
+        user_message: User's request/message
+
+    Returns:
+        mood_params dict (same format as search_all_songs), or None when
+        the message has no recognizable mood
+    """
+    cached_args = translation_cache.peek(user_message)
+    if cached_args:
+        return feature_args_to_mood_params(cached_args)
+    return _lexicon_mood_params(user_message)
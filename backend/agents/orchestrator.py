@@ -10,12 +10,17 @@ Architecture:
     )
 
 Includes the return_playlist_to_queue tool used exclusively by MergerAgent.
+
+With a Deadline, every stage is wrapped in a DeadlineAgent so a slow
+agent is cancelled at its budget instead of stalling the request.
 """
 from typing import List
 
 from google.adk.agents import LlmAgent, ParallelAgent, SequentialAgent
 from google.adk.tools import FunctionTool as Tool
 
+from agents.deadline import Deadline, with_deadline
+from agents.model_backend import get_model
 from agents.personalized_agent import create_personalized_agent
 from agents.prompts import MERGER_AGENT_PROMPT
 from agents.scout_agent import create_scout_agent
@@ -47,7 +52,8 @@ def create_orchestrator_agent(
     user_id: str,
     user_profile_str: str,
     queue_str: str,
-    user_message: str
+    user_message: str,
+    deadline: Deadline = None
 ) -> SequentialAgent:
     """
     Creates the orchestrator agent that coordinates the entire pipeline.
@@ -58,6 +64,8 @@ def create_orchestrator_agent(
         user_profile_str: User profile summary for MergerAgent
         queue_str: Current playback queue formatted as string
         user_message: User's request/message
+        deadline: Request deadline; when given, each agent runs within
+                  its stage budget
     
     Returns:
         SequentialAgent configured with sub-agents
@@ -71,9 +79,14 @@ def create_orchestrator_agent(
     personalized_agent = create_personalized_agent(
         user_context=user_context,
         user_message=user_message,
-        output_key="personalized_results"
+        output_key="personalized_results",
+        user_id=user_id
     )
     
+    if deadline:
+        scout_agent = with_deadline(scout_agent, deadline)
+        personalized_agent = with_deadline(personalized_agent, deadline)
+    
     # 2. Create ParallelAgent with both agents
     parallel_agent = ParallelAgent(
         name="ParallelSearchAgent",
@@ -90,11 +103,13 @@ def create_orchestrator_agent(
     
     merger_agent = LlmAgent(
         name="MergerAgent",
-        model="gemini-2.5-flash",
+        model=get_model("MergerAgent"),
         instruction=formatted_prompt,
         description="Combines search results and returns final playlist",
         tools=[return_playlist_to_queue]
     )
+    if deadline:
+        merger_agent = with_deadline(merger_agent, deadline)
     
     # 4. Create SequentialAgent that executes parallel searches → merger
     orchestrator = SequentialAgent(
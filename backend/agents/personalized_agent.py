@@ -1,17 +1,62 @@
 # agents/personalized_agent.py
 """
 PersonalizedAgent: Searches for music in the user's personal library.
+
+The library is pre-filtered by audio-feature distance to the requested
+mood and injected into the prompt with short track handles to keep it
+small; the agent's answer is mapped back to Spotify URIs before it
+reaches the session state and the MergerAgent.
 """
+import logging
+
 from google.adk.agents import LlmAgent
+from google.genai import types
 
 from agents.prompts import PERSONALIZED_PROMPT
-from agents.context_formatter import format_for_personalized_agent
+from agents.context_formatter import (
+    DEFAULT_LIBRARY_TOKEN_BUDGET,
+    build_personalized_library,
+    resolve_track_handles
+)
+from agents.library_prefilter import prefilter_user_context
+from agents.model_backend import get_model
+
+logger = logging.getLogger(__name__)
+
+
+def _make_handle_resolver(handles: dict):
+    """
+    Builds an after_model_callback that replaces track handles in the
+    model response with their Spotify URIs.
+
+    Args:
+        handles: dict mapping handle -> URI
+
+    Returns:
+        Callback for LlmAgent.after_model_callback
+    """
+    def resolve_handles(callback_context, llm_response):
+        content = llm_response.content
+        if not content or not content.parts:
+            return None
+        text = "".join(part.text for part in content.parts if part.text)
+        if not text:
+            return None
+        llm_response.content = types.Content(
+            role=content.role,
+            parts=[types.Part(text=resolve_track_handles(text, handles))]
+        )
+        return llm_response
+
+    return resolve_handles
 
 
 def create_personalized_agent(
     user_context: dict,
     user_message: str,
-    output_key: str = None
+    output_key: str = None,
+    token_budget: int = DEFAULT_LIBRARY_TOKEN_BUDGET,
+    user_id: str = None
 ) -> LlmAgent:
     """
     Factory function that creates a PersonalizedAgent with the user's
@@ -21,27 +66,43 @@ def create_personalized_agent(
         user_context: User context (top_tracks, playlists, etc.)
         user_message: User's request/message
         output_key: Key to store the result in session.state
+        token_budget: Maximum estimated tokens for the library section
+        user_id: Spotify user ID, used to store the enriched library
     
     Returns:
         LlmAgent configured with user library
     """
-    # Format user library using centralized formatter
-    user_library_str = format_for_personalized_agent(user_context)
+    # Keep only the library tracks closest to the requested mood
+    user_context = prefilter_user_context(
+        user_context,
+        user_message,
+        user_id=user_id
+    )
+
+    # Format user library using centralized formatter (deduplicated,
+    # ranked and truncated to the token budget)
+    library = build_personalized_library(user_context, token_budget=token_budget)
+    logger.debug(
+        "PersonalizedAgent library: %s tokens, %s tracks (%s dropped), sections: %s",
+        library["total_tokens"], library["included_tracks"],
+        library["dropped_tracks"], library["section_tokens"]
+    )
     
     # Format prompt with user library and message
     formatted_prompt = PERSONALIZED_PROMPT.format(
         user_message=user_message,
-        user_library=user_library_str
+        user_library=library["text"]
     )
 
     # Create agent WITHOUT tools (context is already in prompt)
     personalized_agent = LlmAgent(
         name="PersonalizedAgent",
-        model="gemini-2.5-flash",
+        model=get_model("PersonalizedAgent"),
         instruction=formatted_prompt,
         description="Searches user's music collection from their library.",
         tools=[],  # No tools, context in prompt
-        output_key=output_key
+        output_key=output_key,
+        after_model_callback=_make_handle_resolver(library["handles"])
     )
 
     return personalized_agent
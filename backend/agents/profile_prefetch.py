@@ -0,0 +1,207 @@
+# agents/profile_prefetch.py
+"""
+ProfilePrefetcher: Warms the user context right after login.
+
+get_user_context makes ~14 Spotify calls (playlists, playlist tracks,
+top tracks/artists, recently played), and without a prefetch they all run
+inside the user's first /chat. The OAuth callback instead starts a
+background fetch: it builds the processed profile and the message-
+independent prompt section (the MergerAgent profile summary) while the
+user is still looking at the UI.
+
+The first /chat then either finds the result ready or, if the prefetch
+is still running, waits for it instead of starting a second fetch.
+Entries expire after PREFETCH_TTL_SECONDS. Later chats get the profile
+from the vibe session (agents/vibe_session.py).
+
+Once the profile is ready, the prefetch also starts an incremental sync
+of the user's library store (saved tracks and playlists, see
+spotify_service.sync_user_library) on a separate executor, at most once
+per LIBRARY_SYNC_INTERVAL_SECONDS per user. Library searches
+(search_liked_songs) then find the tracks added since the last login.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.context_formatter import format_for_merger_agent
+from tracing import metrics
+
+# How long a prefetched profile is used
+PREFETCH_TTL_SECONDS = int(os.getenv("PROFILE_PREFETCH_TTL_SECONDS", "900"))
+
+# Longest time /chat waits for a prefetch that is still running
+PREFETCH_WAIT_SECONDS = float(os.getenv("PROFILE_PREFETCH_WAIT_SECONDS", "10"))
+
+# Concurrent background fetches (each one is a chain of Spotify calls)
+PREFETCH_WORKERS = int(os.getenv("PROFILE_PREFETCH_WORKERS", "4"))
+
+# Concurrent background library syncs started at login (0 disables them)
+LIBRARY_SYNC_WORKERS = int(os.getenv("LIBRARY_SYNC_WORKERS", "1"))
+
+# Shortest time between two login syncs of the same user's library
+LIBRARY_SYNC_INTERVAL_SECONDS = int(os.getenv("LIBRARY_SYNC_INTERVAL_SECONDS", "3600"))
+
+metrics.describe(
+    "vibe_profile_prefetch_total", "counter",
+    "Background user context fetches started at login, by result"
+)
+metrics.describe(
+    "vibe_profile_prefetch_lookups_total", "counter",
+    "Prefetched profile lookups from /chat (ready, waited, miss)"
+)
+metrics.describe(
+    "vibe_library_sync_total", "counter",
+    "Incremental library syncs started at login, by result"
+)
+
+
+class ProfilePrefetcher:
+    """Background user context fetches keyed by access token and user ID."""
+
+    def __init__(
+        self,
+        ttl_seconds: int = PREFETCH_TTL_SECONDS,
+        workers: int = PREFETCH_WORKERS,
+        sync_workers: int = LIBRARY_SYNC_WORKERS,
+        sync_interval_seconds: int = LIBRARY_SYNC_INTERVAL_SECONDS
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.sync_interval_seconds = sync_interval_seconds
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="profile-prefetch"
+        )
+        # Library syncs run apart so a long first sync never delays a prefetch
+        self._sync_executor = ThreadPoolExecutor(
+            max_workers=sync_workers, thread_name_prefix="library-sync"
+        ) if sync_workers > 0 else None
+        self._lock = threading.Lock()
+        # access_token -> Future of a running fetch
+        self._in_flight = {}
+        # user_id -> {"user_profile", "user_profile_str", "fetched_at"}
+        self._ready = {}
+        # user_id -> time its last library sync started
+        self._sync_started = {}
+
+    def _prune(self):
+        now = time.time()
+        with self._lock:
+            for user_id in [
+                u for u, entry in self._ready.items()
+                if now - entry["fetched_at"] > self.ttl_seconds
+            ]:
+                del self._ready[user_id]
+
+    def start(self, token_info: dict):
+        """
+        Starts fetching the user's context in the background.
+
+        Args:
+            token_info: Token of the user who just logged in
+        """
+        access_token = (token_info or {}).get("access_token")
+        if not access_token:
+            return
+        self._prune()
+        with self._lock:
+            if access_token in self._in_flight:
+                return
+            future = self._executor.submit(self._fetch, token_info)
+            self._in_flight[access_token] = future
+        future.add_done_callback(lambda _: self._in_flight.pop(access_token, None))
+
+    def _fetch(self, token_info: dict) -> dict | None:
+        from spotify_service import get_user_context, get_user_id
+
+        start = time.perf_counter()
+        try:
+            user_id = get_user_id(token_info)
+            user_profile = get_user_context(token_info)
+        except Exception as e:
+            print(f"Warning: Profile prefetch failed: {e}")
+            metrics.inc("vibe_profile_prefetch_total", result="error")
+            return None
+        if "error" in user_profile:
+            print(f"Warning: Profile prefetch failed: {user_profile['error']}")
+            metrics.inc("vibe_profile_prefetch_total", result="error")
+            return None
+
+        entry = {
+            "user_profile": user_profile,
+            "user_profile_str": format_for_merger_agent(user_profile),
+            "fetched_at": time.time(),
+        }
+        with self._lock:
+            self._ready[user_id] = entry
+        metrics.inc("vibe_profile_prefetch_total", result="success")
+        print(f"--- Prefetched profile of {user_id} in {time.perf_counter() - start:.2f}s ---")
+        self._start_library_sync(token_info, user_id)
+        return entry
+
+    def _start_library_sync(self, token_info: dict, user_id: str):
+        """Starts an incremental library sync unless one started recently."""
+        if self._sync_executor is None:
+            return
+        now = time.time()
+        with self._lock:
+            if now - self._sync_started.get(user_id, 0) < self.sync_interval_seconds:
+                return
+            self._sync_started[user_id] = now
+        self._sync_executor.submit(self._sync_library, token_info, user_id)
+
+    def _sync_library(self, token_info: dict, user_id: str):
+        from spotify_service import sync_user_library
+
+        result = sync_user_library(token_info, user_id=user_id)
+        if "error" in result:
+            print(f"Warning: Library sync of {user_id} failed: {result['error']}")
+            metrics.inc("vibe_library_sync_total", result="error")
+            # Let the next login retry
+            with self._lock:
+                self._sync_started.pop(user_id, None)
+            return
+        metrics.inc("vibe_library_sync_total", result="success")
+
+    async def get(
+        self,
+        user_id: str,
+        token_info: dict,
+        max_wait: float = PREFETCH_WAIT_SECONDS
+    ) -> dict | None:
+        """
+        Returns the prefetched context, waiting for a running prefetch.
+
+        Args:
+            user_id: Spotify user ID
+            token_info: Token of the request (identifies a running prefetch)
+            max_wait: Longest time to wait for a running prefetch
+
+        Returns:
+            {"user_profile", "user_profile_str", "fetched_at"} or None
+        """
+        future = self._in_flight.get((token_info or {}).get("access_token"))
+        waited = False
+        if future is not None and not future.done():
+            waited = True
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), max_wait)
+            except asyncio.TimeoutError:
+                pass
+
+        with self._lock:
+            entry = self._ready.get(user_id)
+        if entry is None or time.time() - entry["fetched_at"] > self.ttl_seconds:
+            metrics.inc("vibe_profile_prefetch_lookups_total", result="miss")
+            return None
+        metrics.inc("vibe_profile_prefetch_lookups_total", result="waited" if waited else "ready")
+        return entry
+
+    def stats(self) -> dict:
+        self._prune()
+        return {"in_flight": len(self._in_flight), "ready": len(self._ready)}
+
+
+# Shared prefetcher for /callback and /chat
+profile_prefetcher = ProfilePrefetcher()
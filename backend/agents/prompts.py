@@ -30,7 +30,8 @@ You can search using any combination of the following audio features:
 **Instructions:**
 1.  **Analyze the Vibe:** Carefully read the user's request to understand the desired mood, genre, and feeling.
 2.  **Translate to Features:** Think about which audio features are most important for that vibe. For example, a "high-energy workout" might focus on high energy and tempo, while a "chill study session" would have low energy and high acousticness.
-3.  **Search Database:** Call the `search_local_db_by_mood` function with ALL parameters. You MUST provide ranges for all audio features (energy, valence, danceability, acousticness, tempo).
+3.  **Search Database:** Call the `search_local_db_by_mood` function with ALL audio feature parameters. You MUST provide ranges for all audio features (energy, valence, danceability, acousticness, tempo).
+    If the user names a genre or style (e.g. "rock", "reggaeton", "lo-fi"), also pass it as `genre` (comma-separated for several). Leave `genre` out when no genre is mentioned.
 4.  **Provide Options:** Always request a `limit` of 20 songs to give the `MergerAgent` plenty of good options to choose from.
 
 **CRITICAL - Output Format:**
@@ -47,10 +48,13 @@ spotify:track:xxxxxxxxxxxxxxxxxxxxx
 If the user asks for "sad, slow, acoustic music", you might call the tool like this:
 `search_local_db_by_mood(energy_min=0, energy_max=0.4, valence_min=0, valence_max=0.3, danceability_min=0, danceability_max=0.5, acousticness_min=0.7, acousticness_max=1, tempo_min=60, tempo_max=90, limit=20)`
 
+For "energetic rock to work out", add the genre:
+`search_local_db_by_mood(energy_min=0.7, energy_max=1, valence_min=0.4, valence_max=1, danceability_min=0.4, danceability_max=1, acousticness_min=0, acousticness_max=0.3, tempo_min=120, tempo_max=170, limit=20, genre="rock")`
+
 Then return ONLY the URIs from the results.
 
 **Remember:**
-- You MUST use ALL parameters (no optional parameters)
+- You MUST use ALL audio feature parameters; `genre` is the only optional one
 - Always set `limit=20`
 - Return ONLY URIs in your final response
 """
@@ -76,13 +80,14 @@ Select songs from the user's library that match their request.
    (The MergerAgent will decide how many to use in the final playlist)
 
 **Output Format:**
-Return ONLY Spotify URIs, one per line:
-spotify:track:xxxxxxxxxxxxxxxxxxxxx
-spotify:track:xxxxxxxxxxxxxxxxxxxxx
+Each track in the library has a short handle in brackets, e.g. [t12].
+Return ONLY the handles of the selected tracks, one per line:
+t12
+t3
 ...
 
-DO NOT use tools. DO NOT explain. ONLY URIs.
-Target: Up to 20 URIs that match the vibe.
+DO NOT use tools. DO NOT explain. ONLY handles.
+Target: Up to 20 handles that match the vibe.
 """
 
 
@@ -0,0 +1,119 @@
+# agents/request_coalescer.py
+"""
+RequestCoalescer: Single-flight execution of identical requests.
+
+Double-clicks on a mood button and frontend retries often send the same
+request twice within seconds. Running both would mean two pipelines (LLM
+calls), two profile fetches and every track queued twice. Requests with
+the same key share one execution instead:
+
+    - while the first request is running, duplicates wait for its result
+    - for retention_seconds after it finished, duplicates get the stored
+      result right away
+
+Only results accepted by retain_if are kept, so a failed request can be
+retried immediately. Exceptions are shared with the waiting duplicates
+but never retained. When the running request is cancelled (its client
+disconnected), one of the waiting duplicates runs it again instead.
+"""
+import asyncio
+import os
+import re
+import time
+from typing import Awaitable, Callable
+
+from tracing import metrics
+
+DEFAULT_RETENTION_SECONDS = float(os.getenv("CHAT_COALESCE_RETENTION_SECONDS", "15"))
+
+metrics.describe(
+    "vibe_coalesced_requests_total", "counter",
+    "Duplicate requests served from an in-flight or recent identical request"
+)
+
+
+# Result handed to the waiters of a cancelled request
+_ABANDONED = object()
+
+
+def normalize_request(message: str) -> str:
+    """
+    Request text for coalescing keys: lowercased, whitespace collapsed.
+
+    Word order and every word are kept, so only literal repeats match
+    ("rock not pop" and "pop not rock" are different requests).
+    """
+    return re.sub(r"\s+", " ", (message or "").strip().lower())
+
+
+class RequestCoalescer:
+    """Shares the result of in-flight and recent requests with the same key."""
+
+    def __init__(
+        self,
+        retention_seconds: float = DEFAULT_RETENTION_SECONDS,
+        retain_if: Callable[[object], bool] = None
+    ):
+        self.retention_seconds = retention_seconds
+        self.retain_if = retain_if or (lambda result: True)
+        self._in_flight = {}
+        self._recent = {}
+
+    def _prune(self):
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in self._recent.items() if expires_at <= now]:
+            del self._recent[key]
+
+    async def run(self, key, factory: Callable[[], Awaitable]) -> tuple:
+        """
+        Runs factory() unless an identical request is running or recent.
+
+        Args:
+            key: Hashable request key (e.g. user ID + normalize_request(message))
+            factory: Coroutine function producing the result
+
+        Returns:
+            (result, coalesced) where coalesced is True when the result
+            came from another request
+        """
+        while True:
+            self._prune()
+            recent = self._recent.get(key)
+            if recent:
+                metrics.inc("vibe_coalesced_requests_total", kind="recent")
+                return recent[1], True
+
+            in_flight = self._in_flight.get(key)
+            if not in_flight:
+                break
+            result = await asyncio.shield(in_flight)
+            if result is _ABANDONED:
+                # The first waiter to resume becomes the new runner
+                continue
+            metrics.inc("vibe_coalesced_requests_total", kind="in_flight")
+            return result, True
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await factory()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                # Only this request is cancelled, not its duplicates
+                future.set_result(_ABANDONED)
+            else:
+                future.set_exception(e)
+                # Mark retrieved so an unawaited future does not log an error
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if self.retention_seconds > 0 and self.retain_if(result):
+                self._recent[key] = (time.monotonic() + self.retention_seconds, result)
+            return result, False
+        finally:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        self._prune()
+        return {"in_flight": len(self._in_flight), "recent": len(self._recent)}
@@ -2,12 +2,28 @@
 """
 ScoutAgent: Searches for new music in the local database (8M+ songs).
 Includes the search_local_db_by_mood tool used exclusively by this agent.
+
+The feature ranges the agent picks are remembered in the shared
+translation cache; a repeated vibe skips the LLM and searches directly.
+The arguments of the search that ran are also stored in session.state
+(SEARCH_ARGS_KEY), they become the target of the user's vibe session.
 """
+import logging
+from typing import Optional
+
 from google.adk.agents import LlmAgent
 from google.adk.tools import FunctionTool as Tool
+from google.genai import types
 
+from agents.model_backend import get_model
 from agents.prompts import SCOUT_PROMPT
-from data_spotify.database_service import search_all_songs
+from agents.translation_cache import translation_cache
+from data_spotify.database_service import search_catalog
+
+logger = logging.getLogger(__name__)
+
+# session.state key with the search_local_db_by_mood arguments of this run
+SEARCH_ARGS_KEY = "scout_search_args"
 
 
 @Tool
@@ -22,11 +38,12 @@ def search_local_db_by_mood(
     acousticness_max: float,
     tempo_min: float,
     tempo_max: float,
-    limit: int
+    limit: int,
+    genre: Optional[str] = None
 ) -> dict:
     """
     Searches the local song database using audio feature ranges.
-    ALL parameters are REQUIRED - you must specify ranges for all audio features.
+    ALL audio feature parameters and limit are REQUIRED; genre is optional.
 
     Args:
         energy_min: Minimum energy (0-1). High = loud, fast, noisy. REQUIRED.
@@ -40,9 +57,13 @@ def search_local_db_by_mood(
         tempo_min: Minimum tempo in BPM. REQUIRED.
         tempo_max: Maximum tempo in BPM. REQUIRED.
         limit: Number of songs to return. REQUIRED.
+        genre: Optional genre filter, only when the user asks for a genre
+            (e.g. "rock", "reggaeton", "jazz, bossa nova"). Leave empty otherwise.
 
     Returns:
-        dict with list of found songs
+        dict with the list of found songs ("results", one per track, with
+        all its artists) and how many were skipped to keep artists varied
+        ("dropped_by_artist_cap")
     """
     # Build mood_params dict - all parameters are now required
     mood_params = {
@@ -53,8 +74,50 @@ def search_local_db_by_mood(
         'tempo': {'min': tempo_min, 'max': tempo_max}
     }
     
-    results = search_all_songs(mood_params, None, limit)
-    return {"results": results}
+    # One result per track, at most CATALOG_MAX_PER_ARTIST per artist
+    return search_catalog(mood_params, genre or None, limit)
+
+
+def _format_uris(results: list) -> str:
+    """Formats search results as the ScoutAgent's output (one URI per line)."""
+    return "\n".join(song["uri"] for song in results if song.get("uri"))
+
+
+def _make_cache_callbacks(user_message: str, output_key: str = None):
+    """
+    Builds the callbacks that read from and write to the translation cache.
+
+    Args:
+        user_message: User's request/message
+        output_key: Key to store the result in session.state
+
+    Returns:
+        Tuple of (before_agent_callback, after_tool_callback)
+    """
+    def use_cached_translation(callback_context):
+        params = translation_cache.get(user_message)
+        if not params:
+            return None
+
+        logger.debug("Mood translation cache hit: %s", params)
+        results = search_local_db_by_mood.func(**params)["results"]
+        uris = _format_uris(results)
+        if not uris:
+            # Stale translation for the current catalog, let the LLM decide
+            return None
+
+        if output_key:
+            callback_context.state[output_key] = uris
+        callback_context.state[SEARCH_ARGS_KEY] = dict(params)
+        return types.Content(role="model", parts=[types.Part(text=uris)])
+
+    def remember_translation(tool, args, tool_context, tool_response):
+        if tool.name == search_local_db_by_mood.name and tool_response.get("results"):
+            translation_cache.put(user_message, args)
+            tool_context.state[SEARCH_ARGS_KEY] = dict(args)
+        return None
+
+    return use_cached_translation, remember_translation
 
 
 def create_scout_agent(user_message: str, output_key: str = None) -> LlmAgent:
@@ -69,11 +132,17 @@ def create_scout_agent(user_message: str, output_key: str = None) -> LlmAgent:
         LlmAgent configured for database search
     """
     formatted_prompt = SCOUT_PROMPT.format(user_message=user_message)
+    use_cached_translation, remember_translation = _make_cache_callbacks(
+        user_message,
+        output_key
+    )
     return LlmAgent(
         name="ScoutAgent",
-        model="gemini-2.5-flash",
+        model=get_model("ScoutAgent"),
         instruction=formatted_prompt,
         description="Researches new music from the database.",
         tools=[search_local_db_by_mood],
-        output_key=output_key
+        output_key=output_key,
+        before_agent_callback=use_cached_translation,
+        after_tool_callback=remember_translation
     )
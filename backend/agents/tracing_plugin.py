@@ -0,0 +1,69 @@
+# agents/tracing_plugin.py
+"""
+TracingPlugin: Records a span for every LLM turn and tool call of every
+agent in the pipeline, with token counts from the model's usage metadata.
+
+Registered once on the ADK App, so individual agents do not need their
+own timing callbacks. All callbacks return None and never alter the run.
+"""
+from google.adk.plugins.base_plugin import BasePlugin
+
+from tracing import begin_span, end_span
+
+
+class TracingPlugin(BasePlugin):
+    """ADK plugin that feeds agent activity into the request trace."""
+
+    def __init__(self):
+        super().__init__(name="tracing")
+        self._open_spans = {}
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        key = ("llm", callback_context.invocation_id, callback_context.agent_name)
+        self._open_spans[key] = begin_span(
+            "llm_turn",
+            agent=callback_context.agent_name
+        )
+        return None
+
+    async def after_model_callback(self, *, callback_context, llm_response):
+        key = ("llm", callback_context.invocation_id, callback_context.agent_name)
+        span = self._open_spans.pop(key, None)
+        if span is None:
+            return None
+        usage = llm_response.usage_metadata
+        if usage:
+            span.set(
+                prompt_tokens=usage.prompt_token_count or 0,
+                output_tokens=usage.candidates_token_count or 0
+            )
+        end_span(span)
+        return None
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error):
+        key = ("llm", callback_context.invocation_id, callback_context.agent_name)
+        span = self._open_spans.pop(key, None)
+        if span is not None:
+            end_span(span, error=error)
+        return None
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context):
+        key = ("tool", tool_context.function_call_id)
+        self._open_spans[key] = begin_span(
+            "tool_call",
+            agent=tool_context.agent_name,
+            tool=tool.name
+        )
+        return None
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result):
+        span = self._open_spans.pop(("tool", tool_context.function_call_id), None)
+        if span is not None:
+            end_span(span)
+        return None
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error):
+        span = self._open_spans.pop(("tool", tool_context.function_call_id), None)
+        if span is not None:
+            end_span(span, error=error)
+        return None
@@ -0,0 +1,181 @@
+# agents/translation_cache.py
+"""
+MoodTranslationCache: Remembers the audio-feature ranges the ScoutAgent
+chose for a request, so common vibes ("chill study music", "gym hype")
+skip the LLM translation step on the next request from any user.
+
+Only the tool arguments are cached. The database search always runs
+fresh, so a cache hit still returns current results.
+
+Requests are keyed on a normalized form of the message: lower-cased,
+stop words stripped, tokens de-duplicated and sorted.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Filler words in the languages our users write in (English and Spanish)
+STOP_WORDS = frozenset({
+    # English
+    "a", "an", "and", "any", "are", "be", "can", "for", "give", "i", "im",
+    "in", "is", "it", "me", "my", "of", "on", "or", "play", "please",
+    "put", "some", "something", "song", "songs", "that", "the", "this",
+    "to", "want", "while", "with", "you",
+    # Spanish
+    "algo", "canciones", "como", "con", "de", "del", "dame", "el", "en",
+    "es", "la", "las", "lo", "los", "me", "mi", "para", "pon", "por",
+    "que", "quiero", "un", "una", "unas", "unos", "y",
+})
+
+DEFAULT_TTL_SECONDS = int(os.getenv("MOOD_CACHE_TTL_SECONDS", "21600"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("MOOD_CACHE_MAX_ENTRIES", "1000"))
+
+
+def normalize_message(message: str) -> str:
+    """
+    Normalizes a user message into a cache key.
+
+    Args:
+        message: Raw user message
+
+    Returns:
+        Space-separated, sorted, de-duplicated tokens without stop words
+    """
+    tokens = re.findall(r"\w+", (message or "").lower())
+    return " ".join(sorted({t for t in tokens if t not in STOP_WORDS}))
+
+
+class MoodTranslationCache:
+    """
+    Thread-safe LRU cache of ScoutAgent tool arguments with a TTL.
+
+    Each entry keeps hit statistics so we can see which vibes are worth
+    caching and how often the cache saves an LLM turn.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, message: str) -> dict | None:
+        """
+        Looks up the cached tool arguments for a message.
+
+        Args:
+            message: Raw user message
+
+        Returns:
+            Copy of the cached tool arguments, or None on a miss
+        """
+        key = normalize_message(message)
+        if not key:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry["created_at"] > self.ttl_seconds:
+                del self._entries[key]
+                self._expirations += 1
+                entry = None
+
+            if not entry:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            entry["hits"] += 1
+            entry["last_hit_at"] = time.time()
+            self._hits += 1
+            return dict(entry["params"])
+
+    def peek(self, message: str) -> dict | None:
+        """
+        Like get(), but without touching statistics or LRU order.
+
+        Args:
+            message: Raw user message
+
+        Returns:
+            Copy of the cached tool arguments, or None
+        """
+        key = normalize_message(message)
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry or time.time() - entry["created_at"] > self.ttl_seconds:
+                return None
+            return dict(entry["params"])
+
+    def put(self, message: str, params: dict):
+        """
+        Stores the tool arguments the ScoutAgent chose for a message.
+
+        Args:
+            message: Raw user message
+            params: Arguments passed to search_local_db_by_mood
+        """
+        key = normalize_message(message)
+        if not key or not params:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            self._entries[key] = {
+                "params": dict(params),
+                "created_at": time.time(),
+                "hits": previous["hits"] if previous else 0,
+                "last_hit_at": previous["last_hit_at"] if previous else None,
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        """Drops every cached translation (statistics are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns cache-wide statistics and the most used entries.
+
+        Returns:
+            dict with size, hits, misses, hit_rate, evictions,
+            expirations and top_entries
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            top_entries = sorted(
+                self._entries.items(),
+                key=lambda item: item[1]["hits"],
+                reverse=True
+            )[:10]
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "top_entries": [
+                    {"key": key, "hits": entry["hits"]}
+                    for key, entry in top_entries
+                ],
+            }
+
+
+# Process-wide cache shared by every ScoutAgent instance
+translation_cache = MoodTranslationCache()
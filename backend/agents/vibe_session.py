@@ -0,0 +1,319 @@
+# agents/vibe_session.py
+"""
+Per-user "keep the vibe going" sessions.
+
+After each playlist the user's session remembers the mood target (the
+feature ranges), the URIs already queued and the processed Spotify
+profile. It is kept in memory and persisted in the user library store.
+
+A follow-up such as "more like this" or "a bit more energetic" is then
+answered without the agent pipeline and without refetching the profile:
+the previous target is shifted, the user's library and the catalog are
+searched directly, and tracks already queued are excluded. That costs
+two database queries instead of three LLM calls plus ~14 Spotify calls.
+Any other message runs the full pipeline as before, reusing the stored
+profile while it is fresh.
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+from agents.translation_cache import normalize_message
+from data_spotify.database_service import search_closest_songs, search_liked_songs
+
+logger = logging.getLogger(__name__)
+
+# A follow-up must come within this time of the previous playlist
+VIBE_SESSION_TTL_SECONDS = int(os.getenv("VIBE_SESSION_TTL_SECONDS", "3600"))
+
+# How long a stored processed profile is reused instead of refetched
+PROFILE_REUSE_SECONDS = int(os.getenv("VIBE_PROFILE_REUSE_SECONDS", "900"))
+
+# Most recent queued URIs remembered per user (for duplicate exclusion)
+MAX_REMEMBERED_URIS = 500
+
+# Size of one adjustment step ("more energetic"); tempo steps are in BPM
+ADJUSTMENT_STEP = 0.15
+TEMPO_STEP = 15.0
+
+FEATURE_LIMITS = {"tempo": (40.0, 220.0)}
+
+# Normalized messages that just ask for more of the same
+CONTINUATIONS = {
+    normalize_message(phrase) for phrase in (
+        "more", "more like this", "more of this", "more of that", "keep going",
+        "keep the vibe going", "same vibe", "again", "another one", "other songs",
+        "más", "mas", "más así", "mas asi", "más como esto", "otra", "otras",
+        "sigue", "seguir", "lo mismo", "mismo estilo",
+    )
+}
+
+# Words that turn the following feature keyword into a comparison with
+# the previous playlist ("more energetic", "menos triste"), with its sign
+COMPARATIVE_CUES = {"more": 1, "less": -1, "más": 1, "mas": 1, "menos": -1}
+
+# Intensity modifiers (multiply the step). They only modify a comparison:
+# "a lot of happy songs" is a new request, not a follow-up
+INTENSITY = {
+    "bit": 0.5, "little": 0.5, "slightly": 0.5, "poco": 0.5,
+    "much": 1.5, "way": 1.5, "lot": 1.5, "mucho": 1.5,
+}
+
+# Words allowed around a bare "more" ("a bit more of this please")
+_FILLER = {"like", "this", "that", "same", "vibe", "please", "así", "asi", "esto", "favor"}
+
+# Keyword -> (feature, direction)
+ADJUSTMENT_KEYWORDS = {
+    **dict.fromkeys(
+        ("energetic", "energy", "upbeat", "intense", "harder", "louder",
+         "energia", "energía", "energico", "enérgico", "movida", "intenso"),
+        ("energy", 1)
+    ),
+    **dict.fromkeys(
+        ("calmer", "calm", "softer", "chill", "chiller", "mellow", "relaxed",
+         "tranquilo", "tranquila", "suave", "relajado"),
+        ("energy", -1)
+    ),
+    **dict.fromkeys(
+        ("happier", "happy", "cheerful", "brighter", "alegre", "feliz"),
+        ("valence", 1)
+    ),
+    **dict.fromkeys(
+        ("sadder", "sad", "darker", "melancholic", "triste", "oscuro"),
+        ("valence", -1)
+    ),
+    **dict.fromkeys(("faster", "fast", "quicker", "rápido", "rapido"), ("tempo", 1)),
+    **dict.fromkeys(("slower", "slow", "lento"), ("tempo", -1)),
+    **dict.fromkeys(
+        ("danceable", "dancier", "groovier", "bailable", "bailar"),
+        ("danceability", 1)
+    ),
+    **dict.fromkeys(
+        ("acoustic", "unplugged", "acústico", "acustico"), ("acousticness", 1)
+    ),
+    **dict.fromkeys(
+        ("electronic", "electrónico", "electronico"), ("acousticness", -1)
+    ),
+}
+
+# Comparatives already carry the "relative" meaning without "more"
+_COMPARATIVES = {
+    word for word in ADJUSTMENT_KEYWORDS if word.endswith("er") and word not in ("upbeat",)
+}
+
+
+def parse_follow_up(message: str) -> dict | None:
+    """
+    Recognizes follow-up requests and the adjustment they ask for.
+
+    Args:
+        message: User's request/message
+
+    Returns:
+        {} for "more of the same", {feature: delta} for adjustments like
+        "a bit more energetic" (tempo deltas in BPM), or None when the
+        message is a new request
+    """
+    if normalize_message(message) in CONTINUATIONS:
+        return {}
+
+    tokens = re.findall(r"\w+", (message or "").lower())
+    if not tokens or len(tokens) > 8:
+        return None
+
+    adjustments = {}
+    intensity = 1.0
+    sign = None
+    for token in tokens:
+        if token in INTENSITY:
+            intensity = INTENSITY[token]
+        elif token in COMPARATIVE_CUES:
+            sign = COMPARATIVE_CUES[token]
+        elif token in ADJUSTMENT_KEYWORDS:
+            # A bare feature word ("happy songs") describes a new mood
+            if sign is None and token not in _COMPARATIVES:
+                continue
+            feature, direction = ADJUSTMENT_KEYWORDS[token]
+            if token not in _COMPARATIVES:
+                # "less sad and energetic": the cue applies to both words
+                direction *= sign
+            step = TEMPO_STEP if feature == "tempo" else ADJUSTMENT_STEP
+            adjustments[feature] = adjustments.get(feature, 0.0) + direction * step * intensity
+            intensity = 1.0
+
+    if not adjustments:
+        # "a bit more of this please" and the like
+        if not any(COMPARATIVE_CUES.get(token) == 1 for token in tokens):
+            return None
+        known = set(COMPARATIVE_CUES) | set(INTENSITY) | _FILLER
+        return {} if all(token in known or len(token) <= 2 for token in tokens) else None
+    return adjustments
+
+
+def adjust_mood_params(mood_params: dict, adjustments: dict) -> dict:
+    """
+    Shifts feature ranges by the requested deltas.
+
+    Args:
+        mood_params: Previous target (same format as search_all_songs)
+        adjustments: {feature: delta} from parse_follow_up
+
+    Returns:
+        New mood_params with every range clamped to the feature limits
+    """
+    adjusted = {name: dict(value) for name, value in mood_params.items() if isinstance(value, dict)}
+    for feature, delta in adjustments.items():
+        low_limit, high_limit = FEATURE_LIMITS.get(feature, (0.0, 1.0))
+        half_width = 25.0 if feature == "tempo" else 0.2
+        default_centre = 110.0 if feature == "tempo" else 0.5
+        current = adjusted.get(feature) or {
+            "min": default_centre - half_width, "max": default_centre + half_width
+        }
+        low = current.get("min", current.get("max")) + delta
+        high = current.get("max", current.get("min")) + delta
+        adjusted[feature] = {
+            "min": round(min(max(low, low_limit), high_limit), 3),
+            "max": round(min(max(high, low_limit), high_limit), 3),
+        }
+    return adjusted
+
+
+def continue_vibe(session: dict, adjustments: dict, limit: int = 20) -> dict:
+    """
+    Builds a follow-up playlist from the session's target, no LLM involved.
+
+    Library matches and the catalog tracks closest to the target are
+    interleaved (library first), skipping every URI the session already
+    queued. Ranking the catalog by distance rather than filtering it by
+    the ranges keeps a target shifted to the edge of a feature ("much
+    more energetic") from running out of tracks.
+
+    Args:
+        session: Session from VibeSessionStore.get()
+        adjustments: {feature: delta} from parse_follow_up
+        limit: Number of tracks
+
+    Returns:
+        dict in the return_playlist_to_queue format, plus "mood_params"
+        and "follow_up"
+    """
+    mood_params = adjust_mood_params(session["mood_params"], adjustments)
+    already_queued = set(session.get("queued_uris") or [])
+
+    library = search_liked_songs(session["user_id"], mood_params, limit * 2)
+    catalog = search_closest_songs(mood_params, limit + len(already_queued) + limit)
+
+    playlist = []
+    seen = set(already_queued)
+    for i in range(max(len(library), len(catalog))):
+        for songs in (library, catalog):
+            if i < len(songs) and songs[i]["uri"] not in seen:
+                seen.add(songs[i]["uri"])
+                playlist.append(songs[i]["uri"])
+    playlist = playlist[:limit]
+
+    logger.debug("Vibe follow-up %s: %d new tracks", adjustments or "same vibe", len(playlist))
+    return {
+        "status": "success" if playlist else "error",
+        "playlist": playlist,
+        "total_tracks": len(playlist),
+        "message": f"Playlist created with {len(playlist)} songs",
+        "mood_params": mood_params,
+        "follow_up": True,
+    }
+
+
+class VibeSessionStore:
+    """
+    Vibe sessions kept in the persistent user library store.
+
+    The store is the source of truth, shared by every worker process: each
+    read is a primary key lookup and each write merges with the stored row.
+    The process-local copy is only served while the store is unreachable.
+    """
+
+    def __init__(self, ttl_seconds: int = VIBE_SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> dict | None:
+        """Returns the user's session if it was updated within the TTL."""
+        from data_spotify import user_library_store
+        try:
+            session = user_library_store.get_vibe_session(user_id)
+        except Exception as e:
+            print(f"Warning: Could not load vibe session for {user_id}: {e}")
+            with self._lock:
+                session = self._sessions.get(user_id)
+        if session is None:
+            return None
+        if time.time() - (session.get("updated_at") or 0) > self.ttl_seconds:
+            return None
+        return session
+
+    def fresh_profile(self, user_id: str) -> dict | None:
+        """Returns the stored processed profile if it can still be reused."""
+        session = self.get(user_id)
+        if not session or not session.get("user_profile"):
+            return None
+        if time.time() - (session.get("profile_fetched_at") or 0) > PROFILE_REUSE_SECONDS:
+            return None
+        return session["user_profile"]
+
+    def record(
+        self,
+        user_id: str,
+        message: str,
+        mood_params: dict | None,
+        queued_uris: list,
+        user_profile: dict = None
+    ) -> dict:
+        """
+        Updates a user's session after a playlist was queued.
+
+        Args:
+            user_id: Spotify user ID
+            message: Request that produced the playlist
+            mood_params: Feature target of the playlist (None when it is
+                         unknown, so no follow-up reuses a stale target)
+            queued_uris: URIs added to the queue (merged with the URIs
+                         the session already queued)
+            user_profile: Newly fetched processed profile (None keeps the
+                          stored one)
+
+        Returns:
+            The updated session
+        """
+        now = time.time()
+        session = {
+            "user_id": user_id,
+            "message": message,
+            "mood_params": mood_params,
+            "queued_uris": list(queued_uris),
+            "user_profile": user_profile,
+            "profile_fetched_at": now if user_profile else None,
+            "updated_at": now,
+        }
+
+        from data_spotify import user_library_store
+        try:
+            session = user_library_store.save_vibe_session(session, max_uris=MAX_REMEMBERED_URIS)
+        except Exception as e:
+            print(f"Warning: Could not persist vibe session for {user_id}: {e}")
+            with self._lock:
+                previous = self._sessions.get(user_id) or {}
+            remembered = list(dict.fromkeys((previous.get("queued_uris") or []) + list(queued_uris)))
+            session["queued_uris"] = remembered[-MAX_REMEMBERED_URIS:]
+            if user_profile is None:
+                session["user_profile"] = previous.get("user_profile")
+                session["profile_fetched_at"] = previous.get("profile_fetched_at")
+        with self._lock:
+            self._sessions[user_id] = session
+        return session
+
+
+# Shared session store for the /chat endpoint
+vibe_sessions = VibeSessionStore()
@@ -0,0 +1,144 @@
+"""
+Scaling of the sharded catalog scan from 1 to N worker processes.
+
+Builds a synthetic catalog and its feature artifact, then runs the same
+mood queries through data_spotify.catalog_scan.ShardedScanner with an
+increasing number of processes (1 = scan in this process). The
+workloads are:
+
+    selective   narrow mood ranges, popularity order: few rows match,
+                so the scan goes past the first shard
+    distance    every row scored by mood distance (search_closest_songs)
+    broad       wide ranges, popularity order: the first shard fills
+                the limit, so the pool is rarely used
+
+For each process count it reports latency percentiles, throughput and
+speedup over one process. Results are checked against the one-process
+scan.
+
+Usage (from backend/):
+    python -m benchmarks.bench_catalog_scan --catalog-size 2000000 \\
+        --processes 1,2,4,8 --queries 30 --output bench_catalog_scan.json
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_pipeline import summarize
+
+UNIT_FEATURES = ["energy", "valence", "danceability", "acousticness"]
+
+
+def make_queries(kind: str, count: int, seed: int = 7) -> list:
+    """Random mood_params for a workload."""
+    rng = random.Random(seed)
+    width = {"selective": 0.08, "distance": 0.2, "broad": 0.5}[kind]
+    queries = []
+    for _ in range(count):
+        mood_params = {}
+        for feature in rng.sample(UNIT_FEATURES, 3 if kind == "selective" else 2):
+            low = rng.uniform(0, 1 - width)
+            mood_params[feature] = {"min": round(low, 3), "max": round(low + width, 3)}
+        if kind == "selective":
+            low = rng.uniform(70, 150)
+            mood_params["tempo"] = {"min": round(low, 1), "max": round(low + 10, 1)}
+        queries.append(mood_params)
+    return queries
+
+
+def run_workload(scanner, queries: list, kind: str, limit: int, concurrency: int) -> tuple:
+    """Runs the queries; returns (durations in ms, results, wall seconds)."""
+    from data_spotify.database_service import FEATURE_SCALES
+
+    rank_by = "mood" if kind == "distance" else "popularity"
+
+    def one(mood_params):
+        start = time.perf_counter()
+        rows = scanner.scan(mood_params, limit, rank_by=rank_by, scales=FEATURE_SCALES)
+        return (time.perf_counter() - start) * 1000, rows
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(one, queries))
+    wall = time.perf_counter() - start
+    return [duration for duration, _ in outcomes], [rows for _, rows in outcomes], wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--catalog-size", type=int, default=1_000_000)
+    parser.add_argument("--processes", default=None,
+                        help='Comma-separated process counts (default "1,2,...,CPUs")')
+    parser.add_argument("--queries", type=int, default=20, help="Queries per workload")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Queries issued at the same time")
+    parser.add_argument("--workloads", default="selective,distance,broad")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="vibe-scan-")
+    db_file = os.path.join(workdir, "catalog.duckdb")
+    artifact_file = os.path.join(workdir, "catalog_features.bin")
+
+    from benchmarks.synthetic_data import build_synthetic_catalog
+    from data_spotify.catalog_scan import ShardedScanner
+    from data_spotify.feature_artifact import FeatureArtifact, build_artifact
+
+    build_synthetic_catalog(db_file, args.catalog_size)
+    build_artifact(db_file, artifact_file)
+    artifact = FeatureArtifact(artifact_file)
+
+    cpus = os.cpu_count() or 1
+    counts = (
+        [int(count) for count in args.processes.split(",")] if args.processes
+        else sorted({1, *range(2, cpus + 1, 2), cpus})
+    )
+
+    report = {
+        "catalog_rows": artifact.rows,
+        "cpus": cpus,
+        "limit": args.limit,
+        "concurrency": args.concurrency,
+        "workloads": {},
+    }
+    for kind in args.workloads.split(","):
+        queries = make_queries(kind, args.queries)
+        baseline_results = baseline_qps = None
+        runs = {}
+        for processes in counts:
+            scanner = ShardedScanner(artifact, processes=processes)
+            scanner.start()
+            run_workload(scanner, queries[:2], kind, args.limit, 1)  # warm caches
+            fanouts = scanner.fanouts
+            durations, results, wall = run_workload(
+                scanner, queries, kind, args.limit, args.concurrency
+            )
+            fanouts = scanner.fanouts - fanouts
+            scanner.close()
+
+            qps = len(queries) / wall
+            if baseline_results is None:
+                baseline_results, baseline_qps = results, qps
+            runs[str(processes)] = {
+                **summarize(durations),
+                "queries_per_second": round(qps, 2),
+                "speedup": round(qps / baseline_qps, 2),
+                "fanouts": fanouts,
+                "matches_single_process": results == baseline_results,
+            }
+        report["workloads"][kind] = runs
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
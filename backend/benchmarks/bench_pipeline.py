@@ -0,0 +1,212 @@
+"""
+End-to-end benchmark of run_agent_with_context with no network.
+
+The ADK agents run on the scripted LLM backend (agents/model_backend.py)
+against a synthetic catalog, so the numbers reflect our own pipeline:
+prompt building, library pre-filtering, ADK orchestration, tools and
+database queries. LLM latency is injected and reported separately.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pipeline --requests 50 --concurrency 10 \\
+        --llm-latency lognormal:800:0.4 --output bench_pipeline.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(values: list) -> dict:
+    """Mean and percentiles (milliseconds) of a list of durations."""
+    return {
+        "count": len(values),
+        "mean_ms": round(statistics.fmean(values), 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+    }
+
+
+def interval_union_ms(spans: list) -> float:
+    """Total time covered by a set of (possibly overlapping) spans."""
+    intervals = sorted(
+        (span["start_ms"], span["start_ms"] + span["duration_ms"]) for span in spans
+    )
+    total = 0.0
+    current_start = current_end = None
+    for start, end in intervals:
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+def configure_environment(args, workdir: str):
+    """Points the app at the scripted LLM and synthetic stores (before imports)."""
+    os.environ["AGENT_MODEL_BACKEND"] = "scripted"
+    os.environ["SCRIPTED_LLM_LATENCY"] = args.llm_latency
+    os.environ["SPOTIFY_DB_FILE"] = os.path.join(workdir, "catalog.duckdb")
+    os.environ["USER_LIBRARY_DB_FILE"] = os.path.join(workdir, "user_library.duckdb")
+    os.environ.setdefault("AGENT_DEBUG_SAMPLE_RATE", "0")
+
+
+async def run_one(run_agent_with_context, start_trace, context: dict, user_id: str,
+                  message: str) -> dict:
+    """Runs one pipeline request and returns its timing breakdown."""
+    with start_trace() as trace:
+        start = time.perf_counter()
+        result = await run_agent_with_context(
+            user_message=message,
+            spotify_context=context,
+            user_id=user_id
+        )
+        total_ms = (time.perf_counter() - start) * 1000
+        trace_data = trace.to_dict()
+
+    llm_spans = [s for s in trace_data["spans"] if s["name"] == "llm_turn"]
+    llm_wall_ms = interval_union_ms(llm_spans)
+    return {
+        "ok": result.get("status") == "success",
+        "total_ms": total_ms,
+        "llm_wall_ms": llm_wall_ms,
+        "overhead_ms": max(total_ms - llm_wall_ms, 0.0),
+        "spans": trace_data["spans"],
+        "tokens": sum(
+            s.get("prompt_tokens", 0) + s.get("output_tokens", 0) for s in llm_spans
+        ),
+    }
+
+
+async def run_benchmark(args) -> dict:
+    from agents.agent_manager import run_agent_with_context
+    from benchmarks.synthetic_data import synthetic_queue, synthetic_user_context
+    from tracing import start_trace
+
+    messages = [
+        "chill study music", "gym hype", "sad acoustic songs",
+        "happy party music", "focus music for coding",
+    ]
+    contexts = [
+        {
+            "user_profile": synthetic_user_context(args.catalog_size, seed=user),
+            "queue": synthetic_queue(),
+        }
+        for user in range(args.users)
+    ]
+
+    # Warm-up (imports, DuckDB caches, first ADK run)
+    await run_one(run_agent_with_context, start_trace, contexts[0], "user_0", messages[0])
+
+    # Throughput phase
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(i: int):
+        async with semaphore:
+            user = i % args.users
+            return await run_one(
+                run_agent_with_context, start_trace, contexts[user],
+                f"user_{user}", messages[i % len(messages)]
+            )
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(bounded(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    stage_durations = {}
+    for result in results:
+        for span in result["spans"]:
+            key = span["name"] if span["name"] != "db_query" else f"db_query:{span.get('query')}"
+            stage_durations.setdefault(key, []).append(span["duration_ms"])
+
+    # Memory phase: sequential requests under tracemalloc
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    peaks = []
+    for i in range(args.memory_requests):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        await run_one(
+            run_agent_with_context, start_trace, contexts[i % args.users],
+            f"user_{i % args.users}", messages[i % len(messages)]
+        )
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "config": vars(args),
+        "throughput_rps": round(args.requests / elapsed, 2),
+        "success_rate": sum(r["ok"] for r in results) / len(results),
+        "latency": summarize([r["total_ms"] for r in results]),
+        "llm_wall": summarize([r["llm_wall_ms"] for r in results]),
+        "pipeline_overhead": summarize([r["overhead_ms"] for r in results]),
+        "stages": {name: summarize(values) for name, values in sorted(stage_durations.items())},
+        "tokens_per_request": statistics.fmean(r["tokens"] for r in results),
+        "memory": {
+            "peak_kib_per_request": round(statistics.fmean(peaks) / 1024, 1) if peaks else 0,
+            "retained_kib_per_request": round(
+                (retained - baseline) / 1024 / max(args.memory_requests, 1), 1
+            ),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--catalog-size", type=int, default=50_000)
+    parser.add_argument("--llm-latency", default="fixed:0",
+                        help='e.g. "fixed:0", "lognormal:800:0.4"')
+    parser.add_argument("--memory-requests", type=int, default=10)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="vibe-bench-")
+    configure_environment(args, workdir)
+
+    from benchmarks.synthetic_data import build_synthetic_catalog
+    build_synthetic_catalog(os.environ["SPOTIFY_DB_FILE"], args.catalog_size)
+
+    # Keep the pipeline's progress prints out of the report
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        report = asyncio.run(run_benchmark(args))
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Cold-start benchmark: import time of the app and time to /ready.
+
+Every run uses a fresh interpreter, like a new container instance:
+
+    import      wall time of `import main`, plus the slowest modules
+                from `python -X importtime`
+    deferred    import time of the heavy dependencies that main no
+                longer imports at module load
+    startup     a uvicorn subprocess: time until it answers GET / and
+                until GET /ready turns 200 (with its warm-up steps)
+
+The app runs on the scripted LLM backend against a synthetic catalog.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup --runs 5 --output bench_startup.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+# Dependencies loaded on first use or by the warm-up (see warmup.py)
+DEFERRED_MODULES = [
+    "google.adk.agents", "google.genai.types", "spotipy", "duckdb", "pandas"
+]
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def timed_import(module: str, env: dict) -> tuple:
+    """
+    Imports a module in a fresh interpreter.
+
+    Returns:
+        (wall time in ms, list of (module, self_us, cumulative_us, depth))
+    """
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print((time.perf_counter() - start) * 1000)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env, capture_output=True, text=True, check=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return float(result.stdout.strip().splitlines()[-1]), modules
+
+
+def import_report(runs: int, env: dict, top: int) -> dict:
+    """Median `import main` time and its slowest direct imports."""
+    times, modules = [], []
+    for _ in range(runs):
+        wall_ms, modules = timed_import("main", env)
+        times.append(wall_ms)
+
+    # Cumulative time of main's own imports (depth 1 below main)
+    direct = sorted(
+        (m for m in modules if m[3] == 1), key=lambda m: m[2], reverse=True
+    )[:top]
+    # Self time of every module, grouped by top-level package
+    packages = {}
+    for name, self_us, _, _ in modules:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+    return {
+        "runs": runs,
+        "median_ms": round(statistics.median(times), 1),
+        "min_ms": round(min(times), 1),
+        "max_ms": round(max(times), 1),
+        "slowest_direct_imports_ms": {
+            name: round(cumulative_us / 1000, 1) for name, _, cumulative_us, _ in direct
+        },
+        "heaviest_packages_ms": {
+            package: round(self_us / 1000, 1) for package, self_us in heaviest
+        },
+    }
+
+
+def deferred_report(env: dict) -> dict:
+    """Standalone import time of each deferred dependency."""
+    return {
+        module: round(timed_import(module, env)[0], 1) for module in DEFERRED_MODULES
+    }
+
+
+def _get(url: str) -> tuple:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def startup_run(port: int, env: dict, timeout: float) -> dict:
+    """Starts uvicorn and times GET / (listening) and GET /ready (warm)."""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    listening_ms = ready_ms = None
+    steps = {}
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                status, body = _get(f"http://127.0.0.1:{port}/ready")
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if listening_ms is None:
+                listening_ms = elapsed_ms
+            if status == 200:
+                ready_ms = elapsed_ms
+                steps = {
+                    name: step["duration_ms"]
+                    for name, step in json.loads(body)["steps"].items()
+                }
+                break
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return {"listening_ms": listening_ms, "ready_ms": ready_ms, "steps_ms": steps}
+
+
+def startup_report(runs: int, port: int, env: dict, timeout: float) -> dict:
+    results = [startup_run(port, env, timeout) for _ in range(runs)]
+    listening = [r["listening_ms"] for r in results if r["listening_ms"] is not None]
+    ready = [r["ready_ms"] for r in results if r["ready_ms"] is not None]
+    return {
+        "runs": runs,
+        "failed_runs": runs - len(ready),
+        "listening_median_ms": round(statistics.median(listening), 1) if listening else None,
+        "ready_median_ms": round(statistics.median(ready), 1) if ready else None,
+        "warmup_steps_ms": results[-1]["steps_ms"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--catalog-size", type=int, default=50_000)
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--top", type=int, default=10,
+                        help="Number of slowest imports to report")
+    parser.add_argument("--timeout", type=float, default=60.0,
+                        help="Longest time to wait for /ready per run")
+    parser.add_argument("--skip-deferred", action="store_true",
+                        help="Do not time the deferred dependencies")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    from benchmarks.bench_pipeline import configure_environment
+    from benchmarks.synthetic_data import build_synthetic_catalog
+
+    workdir = tempfile.mkdtemp(prefix="vibe-startup-")
+    args.llm_latency = "fixed:0"
+    configure_environment(args, workdir)
+    build_synthetic_catalog(os.environ["SPOTIFY_DB_FILE"], args.catalog_size)
+    env = dict(os.environ, PYTHONPATH=os.getcwd(), WARMUP_MODE="background")
+
+    report = {"import": import_report(args.runs, env, args.top)}
+    if not args.skip_deferred:
+        report["deferred_imports_ms"] = deferred_report(env)
+    report["startup"] = startup_report(args.runs, args.port, env, args.timeout)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Minimal Redis-compatible server for testing the shared cache offline.
+
+Speaks enough of the Redis protocol (RESP2) for shared_cache.RedisBackend
+and redis-py: PING, GET, SET (EX/PX/NX/XX), DEL, EXISTS, DBSIZE, FLUSHDB
+and CLIENT/SELECT/ECHO. Data lives in memory with lazy expiry. Every
+worker process pointed at it shares the same cache, like a real Redis.
+
+Usage (from backend/):
+    python -m benchmarks.fake_redis --port 6390
+
+Then run the backend with:
+    CACHE_BACKEND=redis CACHE_REDIS_URL=redis://127.0.0.1:6390/0
+"""
+import argparse
+import asyncio
+import time
+
+
+class FakeRedis:
+    """In-memory key space plus the command implementations."""
+
+    def __init__(self):
+        self.data = {}
+        self.commands = 0
+
+    def _alive(self, key: bytes) -> bool:
+        entry = self.data.get(key)
+        if entry is None:
+            return False
+        if entry[1] is not None and entry[1] <= time.time():
+            del self.data[key]
+            return False
+        return True
+
+    def execute(self, args: list):
+        """Runs one command; returns a Python value or an Exception."""
+        self.commands += 1
+        name = args[0].upper()
+        if name == b"PING":
+            return b"PONG" if len(args) == 1 else args[1]
+        if name == b"ECHO":
+            return args[1]
+        if name in (b"CLIENT", b"SELECT"):
+            return "OK"
+        if name == b"GET":
+            return self.data[args[1]][0] if self._alive(args[1]) else None
+        if name == b"SET":
+            key, value, expires_at = args[1], args[2], None
+            options = [arg.upper() for arg in args[3:]]
+            for i, option in enumerate(options):
+                if option == b"EX":
+                    expires_at = time.time() + float(args[4 + i])
+                elif option == b"PX":
+                    expires_at = time.time() + float(args[4 + i]) / 1000
+            if (b"NX" in options and self._alive(key)) or (b"XX" in options and not self._alive(key)):
+                return None
+            self.data[key] = (value, expires_at)
+            return "OK"
+        if name == b"DEL":
+            return sum(1 for key in args[1:] if self._alive(key) and self.data.pop(key))
+        if name == b"EXISTS":
+            return sum(1 for key in args[1:] if self._alive(key))
+        if name == b"DBSIZE":
+            return sum(1 for key in list(self.data) if self._alive(key))
+        if name == b"FLUSHDB":
+            self.data.clear()
+            return "OK"
+        return Exception(f"ERR unknown command '{name.decode(errors='replace')}'")
+
+
+def encode(value) -> bytes:
+    """Encodes a reply in RESP2."""
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, Exception):
+        return f"-{value}\r\n".encode()
+    if isinstance(value, str):
+        return f"+{value}\r\n".encode()
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    return b"$" + str(len(value)).encode() + b"\r\n" + value + b"\r\n"
+
+
+async def read_command(reader: asyncio.StreamReader) -> list | None:
+    """Reads one RESP array of bulk strings (or an inline command)."""
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()
+    args = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+def create_server(store: FakeRedis, host: str, port: int):
+    async def handle(reader, writer):
+        try:
+            while (args := await read_command(reader)) is not None:
+                if args:
+                    writer.write(encode(store.execute(args)))
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return asyncio.start_server(handle, host, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+
+    async def serve():
+        server = await create_server(FakeRedis(), args.host, args.port)
+        print(f"Fake Redis listening on {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,740 @@
+"""
+Fake Spotify Web API and Accounts server for offline benchmarks.
+
+Implements the endpoints spotify_service.py uses (me, playlists, playlist
+tracks, saved tracks, top items, recently played, queue, player and
+tracks), with deterministic synthetic libraries whose tracks exist in the
+synthetic catalog of benchmarks/synthetic_data.py. Latency, 429s and
+server errors can be injected at startup or changed at runtime.
+
+Usage (from backend/):
+    python -m benchmarks.fake_spotify --port 8090 --catalog-size 50000 \\
+        --saved-tracks 2000 --latency lognormal:80:0.5 --rate-limit 0.01
+
+Then point the backend at it:
+    SPOTIFY_API_BASE_URL=http://127.0.0.1:8090/v1/
+    SPOTIFY_ACCOUNTS_URL=http://127.0.0.1:8090
+
+Any bearer token is accepted. "fake-token-<user_id>" (what /api/token
+issues) maps to <user_id>; any other token is used as the user ID, so
+load tests can simply send "fake-token-user_1", "fake-token-user_2", ...
+
+Control endpoints (not part of the Spotify API):
+    GET  /_fake/stats    requests per route and status
+    POST /_fake/config   update fault injection, e.g. {"error_rate": 0.1}
+    POST /_fake/reset    forget all users and stats
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, RedirectResponse
+
+from agents.model_backend import sample_latency
+from benchmarks.synthetic_data import GENRES, synthetic_track_id
+
+# Fields of FakeSpotifyConfig that can be changed through /_fake/config
+RUNTIME_SETTINGS = ("latency", "rate_limit", "retry_after", "error_rate", "error_status")
+
+
+class FakeSpotifyConfig:
+    """Library sizes and fault injection settings of the fake server."""
+
+    def __init__(
+        self,
+        catalog_size: int = 50_000,
+        saved_tracks: int = 500,
+        playlists: int = 20,
+        playlist_tracks: int = 50,
+        latency: str = "fixed:0",
+        rate_limit: float = 0.0,
+        retry_after: int = 1,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int = 0
+    ):
+        """
+        Args:
+            catalog_size: Tracks in the synthetic catalog (IDs 0..N-1)
+            saved_tracks: Saved (liked) tracks per user
+            playlists: Playlists per user
+            playlist_tracks: Tracks per playlist
+            latency: Latency spec per request (see sample_latency)
+            rate_limit: Probability of answering 429 with Retry-After
+            retry_after: Retry-After seconds sent with injected 429s
+            error_rate: Probability of answering error_status
+            error_status: Status code of injected errors
+            seed: Base seed of the synthetic libraries
+        """
+        self.catalog_size = catalog_size
+        self.n_artists = max(catalog_size // 10, 1)
+        self.saved_tracks = saved_tracks
+        self.playlists = playlists
+        self.playlist_tracks = playlist_tracks
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+class FakeUser:
+    """Synthetic library and player state of one user."""
+
+    def __init__(self, user_id: str, config: FakeSpotifyConfig):
+        self.user_id = user_id
+        self.config = config
+        rng = random.Random(zlib.crc32(user_id.encode()) + config.seed)
+
+        def sample(k: int) -> list:
+            return [rng.randrange(config.catalog_size) for _ in range(k)]
+
+        now = datetime.now(timezone.utc)
+        # Saved tracks, newest first, one every ~6 hours
+        self.saved = [
+            (index, _iso(now - timedelta(hours=6 * i)))
+            for i, index in enumerate(sample(config.saved_tracks))
+        ]
+        # Playlist IDs must be base62 for spotipy to accept them
+        self.playlist_prefix = f"{zlib.crc32(user_id.encode()):08x}pl"
+        self.playlists = {}
+        for i in range(config.playlists):
+            playlist_id = f"{self.playlist_prefix}{i}"
+            self.playlists[playlist_id] = {
+                "id": playlist_id,
+                "name": f"Playlist {i}",
+                "owner": user_id,
+                "public": False,
+                "snapshot_id": uuid.uuid4().hex,
+                "tracks": [
+                    (index, _iso(now - timedelta(days=i, minutes=j)))
+                    for j, index in enumerate(sample(config.playlist_tracks))
+                ],
+            }
+        self.top_tracks = sample(50)
+        self.top_artists = [rng.randrange(config.n_artists) for _ in range(50)]
+        self.recently_played = [
+            (index, _iso(now - timedelta(minutes=4 * i)))
+            for i, index in enumerate(sample(50))
+        ]
+
+        # Player: playing the first top track on a single device
+        self.device = {
+            "id": f"device_{user_id}", "name": "Fake Web Player",
+            "type": "Computer", "is_active": True, "volume_percent": 60,
+        }
+        self.current = self.top_tracks[0]
+        self.queue = []
+        self.context = []
+        self.history = []
+        self.is_playing = True
+        self.started_at = time.time()
+        self.paused_progress_ms = 0
+
+    def progress_ms(self) -> int:
+        if not self.is_playing:
+            return self.paused_progress_ms
+        return int((time.time() - self.started_at) * 1000)
+
+    def play(self, index: int, context: list = None):
+        if self.current is not None:
+            self.history.append(self.current)
+        self.current = index
+        if context is not None:
+            self.context = context
+        self.is_playing = True
+        self.started_at = time.time()
+        self.paused_progress_ms = 0
+
+    def skip(self):
+        """Plays the next queued (then context) track, or stops."""
+        if self.queue:
+            self.play(self.queue.pop(0))
+        elif self.context:
+            self.play(self.context.pop(0))
+        else:
+            if self.current is not None:
+                self.history.append(self.current)
+            self.current = None
+            self.is_playing = False
+
+    def advance(self):
+        """Moves past tracks that finished playing since the last request."""
+        while self.is_playing and self.current is not None:
+            duration = track_duration_ms(self.current)
+            elapsed = self.progress_ms()
+            if elapsed < duration:
+                break
+            finished_at = self.started_at + duration / 1000
+            self.skip()
+            self.started_at = finished_at
+
+
+def _iso(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def track_duration_ms(index: int) -> int:
+    return 120_000 + (index * 7919) % 180_000
+
+
+def track_object(index: int, config: FakeSpotifyConfig) -> dict:
+    """Full track object for catalog row `index` (same names as the catalog)."""
+    track_id = synthetic_track_id(index)
+    artist = index % config.n_artists
+    album_id = f"album{index // 12}"
+    return {
+        "id": track_id,
+        "uri": f"spotify:track:{track_id}",
+        "name": f"Track {index}",
+        "type": "track",
+        "is_local": False,
+        "duration_ms": track_duration_ms(index),
+        "popularity": index % 100,
+        "explicit": False,
+        "artists": [artist_object(artist, simplified=True)],
+        "album": {
+            "id": album_id,
+            "uri": f"spotify:album:{album_id}",
+            "name": f"Album {index // 12}",
+            "images": [
+                {"url": f"https://picsum.photos/seed/{album_id}/{size}",
+                 "height": size, "width": size}
+                for size in (640, 300, 64)
+            ],
+        },
+    }
+
+
+def artist_object(artist: int, simplified: bool = False) -> dict:
+    """Artist object with the genres of the synthetic r_artist_genre table."""
+    artist_id = f"artist_{artist}"
+    artist_dict = {
+        "id": artist_id,
+        "uri": f"spotify:artist:{artist_id}",
+        "name": f"Artist {artist}",
+        "type": "artist",
+    }
+    if simplified:
+        return artist_dict
+    genres = [GENRES[artist % len(GENRES)]]
+    if artist % 3 == 0:
+        genres.append(GENRES[(artist * 3 + 1) % len(GENRES)])
+    return {**artist_dict, "genres": genres, "popularity": artist % 100}
+
+
+def _spotify_error(status: int, message: str, headers: dict = None) -> JSONResponse:
+    """Error body in the Spotify Web API format."""
+    return JSONResponse(
+        {"error": {"status": status, "message": message}},
+        status_code=status,
+        headers=headers
+    )
+
+
+def _paged(request: Request, items: list, total: int, limit: int, offset: int) -> dict:
+    """Spotify paging object with absolute next/previous URLs."""
+    def page_url(new_offset: int) -> str:
+        params = dict(request.query_params)
+        params.update(offset=new_offset, limit=limit)
+        return f"{request.url.scheme}://{request.url.netloc}{request.url.path}?{urlencode(params)}"
+
+    return {
+        "href": str(request.url),
+        "items": items,
+        "limit": limit,
+        "offset": offset,
+        "total": total,
+        "next": page_url(offset + limit) if offset + limit < total else None,
+        "previous": page_url(max(offset - limit, 0)) if offset > 0 else None,
+    }
+
+
+def _page_params(request: Request, default_limit: int = 20, max_limit: int = 50) -> tuple:
+    limit = min(int(request.query_params.get("limit", default_limit)), max_limit)
+    offset = int(request.query_params.get("offset", 0))
+    return limit, offset
+
+
+def create_app(config: FakeSpotifyConfig = None) -> FastAPI:
+    """
+    Builds the fake Spotify server.
+
+    Args:
+        config: Library sizes and fault injection settings
+
+    Returns:
+        FastAPI app (serve with uvicorn or use with TestClient)
+    """
+    config = config or FakeSpotifyConfig()
+    app = FastAPI(title="Fake Spotify")
+    users = {}
+    stats = {"requests": {}, "injected": {"latency_s": 0.0, "429": 0, "error": 0}}
+    track_index = {}
+    playlist_owners = {}
+    login_counter = {"next": 0}
+
+    def lookup_track(track_id_or_uri: str) -> int | None:
+        """Catalog row of a track ID or URI (None if unknown)."""
+        if not track_index:
+            track_index.update(
+                (synthetic_track_id(i), i) for i in range(config.catalog_size)
+            )
+        return track_index.get(track_id_or_uri.split(":")[-1])
+
+    def get_user(request: Request) -> FakeUser | None:
+        auth = request.headers.get("Authorization", "")
+        if not auth.startswith("Bearer ") or len(auth) <= len("Bearer "):
+            return None
+        user_id = auth[len("Bearer "):].removeprefix("fake-token-")
+        user = users.get(user_id)
+        if user is None:
+            user = users[user_id] = FakeUser(user_id, config)
+            playlist_owners[user.playlist_prefix] = user
+        user.advance()
+        return user
+
+    def track(index: int) -> dict:
+        return track_object(index, config)
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        if request.url.path.startswith("/_fake"):
+            return await call_next(request)
+
+        delay = sample_latency(config.latency)
+        stats["injected"]["latency_s"] += delay
+        await asyncio.sleep(delay)
+
+        roll = random.random()
+        if roll < config.rate_limit:
+            stats["injected"]["429"] += 1
+            response = _spotify_error(
+                429, "API rate limit exceeded",
+                headers={"Retry-After": str(config.retry_after)}
+            )
+        elif roll < config.rate_limit + config.error_rate:
+            stats["injected"]["error"] += 1
+            response = _spotify_error(config.error_status, "Injected server error")
+        else:
+            response = await call_next(request)
+
+        route = request.scope.get("route")
+        key = f"{request.method} {route.path if route else request.url.path} {response.status_code}"
+        stats["requests"][key] = stats["requests"].get(key, 0) + 1
+        return response
+
+    # --- Control endpoints ---
+
+    @app.get("/_fake/stats")
+    def fake_stats():
+        return {"config": config.to_dict(), "users": len(users), **stats}
+
+    @app.post("/_fake/config")
+    async def fake_config(request: Request):
+        updates = await request.json()
+        for key, value in updates.items():
+            if key in RUNTIME_SETTINGS:
+                setattr(config, key, value)
+        return config.to_dict()
+
+    @app.post("/_fake/reset")
+    def fake_reset():
+        users.clear()
+        stats["requests"].clear()
+        stats["injected"].update({"latency_s": 0.0, "429": 0, "error": 0})
+        return {"message": "Fake Spotify state reset."}
+
+    # --- Accounts service ---
+
+    @app.get("/authorize")
+    def authorize(request: Request):
+        params = request.query_params
+        login_counter["next"] += 1
+        query = {"code": f"fake-code-user_{login_counter['next']}"}
+        if params.get("state"):
+            query["state"] = params["state"]
+        return RedirectResponse(f"{params.get('redirect_uri')}?{urlencode(query)}")
+
+    @app.post("/api/token")
+    async def token(request: Request):
+        form = await request.form()
+        if form.get("grant_type") == "refresh_token":
+            user_id = str(form.get("refresh_token", "")).removeprefix("fake-refresh-")
+        else:
+            user_id = str(form.get("code", "")).removeprefix("fake-code-")
+        if not user_id:
+            return JSONResponse({"error": "invalid_grant"}, status_code=400)
+        return {
+            "access_token": f"fake-token-{user_id}",
+            "token_type": "Bearer",
+            "expires_in": 3600,
+            "refresh_token": f"fake-refresh-{user_id}",
+            "scope": form.get("scope", ""),
+        }
+
+    # --- Web API ---
+
+    @app.get("/v1/me")
+    @app.get("/v1/me/")
+    def me(request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        return {
+            "id": user.user_id,
+            "display_name": user.user_id.replace("_", " ").title(),
+            "email": f"{user.user_id}@example.com",
+            "country": "ES",
+            "product": "premium",
+            "uri": f"spotify:user:{user.user_id}",
+        }
+
+    @app.get("/v1/me/playlists")
+    def my_playlists(request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        limit, offset = _page_params(request)
+        playlists = list(user.playlists.values())
+        items = [
+            {
+                "id": p["id"],
+                "uri": f"spotify:playlist:{p['id']}",
+                "name": p["name"],
+                "snapshot_id": p["snapshot_id"],
+                "public": p["public"],
+                "collaborative": False,
+                "owner": {"id": p["owner"], "display_name": p["owner"]},
+                "images": [],
+                "tracks": {
+                    "href": f"{request.base_url}v1/playlists/{p['id']}/tracks",
+                    "total": len(p["tracks"]),
+                },
+            }
+            for p in playlists[offset:offset + limit]
+        ]
+        return _paged(request, items, len(playlists), limit, offset)
+
+    @app.get("/v1/playlists/{playlist_id}/tracks")
+    @app.get("/v1/playlists/{playlist_id}/items")
+    def playlist_tracks(playlist_id: str, request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        owner = playlist_owners.get(playlist_id.rpartition("pl")[0] + "pl", user)
+        playlist = owner.playlists.get(playlist_id)
+        if playlist is None:
+            return _spotify_error(404, "Resource not found")
+        limit, offset = _page_params(request, default_limit=100, max_limit=100)
+        items = [
+            {"added_at": added_at, "track": track(index)}
+            for index, added_at in playlist["tracks"][offset:offset + limit]
+        ]
+        return _paged(request, items, len(playlist["tracks"]), limit, offset)
+
+    @app.post("/v1/playlists/{playlist_id}/tracks")
+    @app.post("/v1/playlists/{playlist_id}/items")
+    async def add_playlist_tracks(playlist_id: str, request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        playlist = user.playlists.get(playlist_id)
+        if playlist is None:
+            return _spotify_error(404, "Resource not found")
+        body = await request.json() if await request.body() else []
+        uris = body.get("uris", []) if isinstance(body, dict) else body
+        added_at = _iso(datetime.now(timezone.utc))
+        for uri in uris:
+            index = lookup_track(uri)
+            if index is None:
+                return _spotify_error(400, f"Invalid track uri: {uri}")
+            playlist["tracks"].append((index, added_at))
+        playlist["snapshot_id"] = uuid.uuid4().hex
+        return JSONResponse({"snapshot_id": playlist["snapshot_id"]}, status_code=201)
+
+    @app.post("/v1/users/{owner_id}/playlists")
+    @app.post("/v1/me/playlists")
+    async def create_playlist(request: Request, owner_id: str = None):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        body = await request.json()
+        playlist_id = f"{user.playlist_prefix}{len(user.playlists)}"
+        user.playlists[playlist_id] = {
+            "id": playlist_id,
+            "name": body.get("name", "New Playlist"),
+            "owner": user.user_id,
+            "public": body.get("public", True),
+            "snapshot_id": uuid.uuid4().hex,
+            "tracks": [],
+        }
+        return JSONResponse(
+            {"id": playlist_id, "uri": f"spotify:playlist:{playlist_id}",
+             "name": user.playlists[playlist_id]["name"]},
+            status_code=201
+        )
+
+    @app.get("/v1/me/tracks")
+    def saved_tracks(request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        limit, offset = _page_params(request)
+        items = [
+            {"added_at": added_at, "track": track(index)}
+            for index, added_at in user.saved[offset:offset + limit]
+        ]
+        return _paged(request, items, len(user.saved), limit, offset)
+
+    @app.put("/v1/me/tracks")
+    @app.put("/v1/me/library")
+    async def save_tracks(request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        params = request.query_params
+        ids = (params.get("ids") or params.get("uris") or "").split(",")
+        if await request.body():
+            ids += (await request.json()).get("ids", [])
+        added_at = _iso(datetime.now(timezone.utc))
+        for track_id in filter(None, ids):
+            index = lookup_track(track_id)
+            if index is None:
+                return _spotify_error(400, f"Invalid id: {track_id}")
+            user.saved.insert(0, (index, added_at))
+        return Response(status_code=200)
+
+    @app.get("/v1/me/top/{item_type}")
+    def top_items(item_type: str, request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        limit, offset = _page_params(request)
+        if item_type == "tracks":
+            items = [track(i) for i in user.top_tracks[offset:offset + limit]]
+            total = len(user.top_tracks)
+        elif item_type == "artists":
+            items = [artist_object(a) for a in user.top_artists[offset:offset + limit]]
+            total = len(user.top_artists)
+        else:
+            return _spotify_error(400, f"Unsupported type: {item_type}")
+        return _paged(request, items, total, limit, offset)
+
+    @app.get("/v1/me/player/recently-played")
+    def recently_played(request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        limit, _ = _page_params(request)
+        items = [
+            {"played_at": played_at, "track": track(index), "context": None}
+            for index, played_at in user.recently_played[:limit]
+        ]
+        return {"items": items, "limit": limit, "next": None, "cursors": None,
+                "href": str(request.url)}
+
+    @app.get("/v1/me/player")
+    def current_playback(request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        if user.current is None:
+            return Response(status_code=204)
+        return {
+            "device": user.device,
+            "shuffle_state": False,
+            "repeat_state": "off",
+            "timestamp": int(time.time() * 1000),
+            "progress_ms": user.progress_ms(),
+            "is_playing": user.is_playing,
+            "item": track(user.current),
+            "currently_playing_type": "track",
+            "context": None,
+        }
+
+    @app.put("/v1/me/player")
+    async def transfer(request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        body = await request.json()
+        device_ids = body.get("device_ids") or []
+        if device_ids:
+            user.device = {**user.device, "id": device_ids[0]}
+        if body.get("play") and user.current is not None and not user.is_playing:
+            user.is_playing = True
+            user.started_at = time.time() - user.paused_progress_ms / 1000
+        return Response(status_code=204)
+
+    @app.put("/v1/me/player/play")
+    async def play(request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        body = await request.json() if await request.body() else {}
+        offset = body.get("offset") or {}
+
+        if body.get("uris"):
+            indexes = [lookup_track(uri) for uri in body["uris"]]
+            if None in indexes:
+                return _spotify_error(400, "Invalid track uri")
+        elif body.get("context_uri"):
+            playlist = user.playlists.get(body["context_uri"].split(":")[-1])
+            if playlist is None:
+                return _spotify_error(404, "Context not found")
+            indexes = [index for index, _ in playlist["tracks"]]
+        else:
+            # Resume
+            if user.current is not None and not user.is_playing:
+                user.is_playing = True
+                user.started_at = time.time() - user.paused_progress_ms / 1000
+            return Response(status_code=204)
+
+        start = offset.get("position", 0)
+        if offset.get("uri"):
+            start = next(
+                (i for i, index in enumerate(indexes) if index == lookup_track(offset["uri"])),
+                0
+            )
+        if not indexes[start:]:
+            return _spotify_error(400, "Offset out of range")
+        user.play(indexes[start], context=indexes[start + 1:])
+        return Response(status_code=204)
+
+    @app.put("/v1/me/player/pause")
+    def pause(request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        if not user.is_playing:
+            return _spotify_error(403, "Player command failed: Restriction violated")
+        user.paused_progress_ms = user.progress_ms()
+        user.is_playing = False
+        return Response(status_code=204)
+
+    @app.post("/v1/me/player/next")
+    def next_track(request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        user.skip()
+        return Response(status_code=204)
+
+    @app.post("/v1/me/player/previous")
+    def previous_track(request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        if user.history:
+            if user.current is not None:
+                user.context.insert(0, user.current)
+            user.current = None
+            user.play(user.history.pop())
+        return Response(status_code=204)
+
+    @app.get("/v1/me/player/queue")
+    def get_queue(request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        upcoming = (user.queue + user.context)[:20]
+        return {
+            "currently_playing": track(user.current) if user.current is not None else None,
+            "queue": [track(index) for index in upcoming],
+        }
+
+    @app.post("/v1/me/player/queue")
+    def add_to_queue(request: Request):
+        user = get_user(request)
+        if user is None:
+            return _spotify_error(401, "No token provided")
+        index = lookup_track(request.query_params.get("uri", ""))
+        if index is None:
+            return _spotify_error(400, "Invalid track uri")
+        if user.current is None:
+            user.play(index)
+        else:
+            user.queue.append(index)
+        return Response(status_code=204)
+
+    @app.get("/v1/tracks/{track_id}")
+    def get_track(track_id: str, request: Request):
+        if get_user(request) is None:
+            return _spotify_error(401, "No token provided")
+        index = lookup_track(track_id)
+        if index is None:
+            return _spotify_error(404, "Non existing id")
+        return track(index)
+
+    @app.get("/v1/tracks")
+    def get_tracks(request: Request):
+        if get_user(request) is None:
+            return _spotify_error(401, "No token provided")
+        ids = request.query_params.get("ids", "").split(",")
+        return {"tracks": [
+            track(index) if (index := lookup_track(track_id)) is not None else None
+            for track_id in ids
+        ]}
+
+    @app.get("/v1/search")
+    def search(request: Request):
+        if get_user(request) is None:
+            return _spotify_error(401, "No token provided")
+        limit, offset = _page_params(request, default_limit=10)
+        query = request.query_params.get("q", "")
+        # Deterministic results per query
+        rng = random.Random(zlib.crc32(query.encode()))
+        indexes = [rng.randrange(config.catalog_size) for _ in range(100)]
+        items = [track(index) for index in indexes[offset:offset + limit]]
+        return {"tracks": _paged(request, items, len(indexes), limit, offset)}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--catalog-size", type=int, default=50_000)
+    parser.add_argument("--saved-tracks", type=int, default=500)
+    parser.add_argument("--playlists", type=int, default=20)
+    parser.add_argument("--playlist-tracks", type=int, default=50)
+    parser.add_argument("--latency", default="fixed:0",
+                        help='Per-request latency, e.g. "lognormal:80:0.5"')
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="Probability of a 429 response")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Probability of an injected server error")
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    config = FakeSpotifyConfig(
+        catalog_size=args.catalog_size,
+        saved_tracks=args.saved_tracks,
+        playlists=args.playlists,
+        playlist_tracks=args.playlist_tracks,
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+        error_status=args.error_status
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Load test of the HTTP API with concurrent synthetic users.
+
+By default everything runs in this process, with no credentials and no
+network: the fake Spotify server (benchmarks/fake_spotify.py), the backend
+(main:app) on the scripted LLM backend with a synthetic catalog, and the
+load generator. Each server has its own event loop thread, so a probe
+task inside the backend loop measures its event-loop lag while the load
+runs.
+
+Every synthetic user loops over a weighted mix of /chat,
+/spotify/queue, /spotify/current_playback and player controls (skip,
+previous, pause, play_from_queue) with random think time. Runs are
+reproducible for a given --seed.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --users 50 --duration 60 \\
+        --llm-latency lognormal:800:0.4 --spotify-latency lognormal:80:0.5 \\
+        --output load_test.json
+
+    # Against an already running backend (no event-loop lag probe)
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --users 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+from benchmarks.bench_pipeline import percentile, summarize
+
+FAKE_SPOTIFY_PORT = 8090
+BACKEND_PORT = 8000
+
+# (name, method, path, json body) of every action a synthetic user can take
+ACTIONS = {
+    "chat": ("POST", "/chat", None),
+    "queue": ("GET", "/spotify/queue", None),
+    "current_playback": ("GET", "/spotify/current_playback", None),
+    "skip": ("POST", "/spotify/skip", None),
+    "previous": ("POST", "/spotify/previous", None),
+    "pause": ("POST", "/spotify/pause", None),
+    "play_from_queue": ("POST", "/spotify/play_from_queue", {"index": 0}),
+}
+
+# Relative frequency of each action (the player page polls a lot more
+# than users chat)
+DEFAULT_WEIGHTS = {
+    "chat": 1,
+    "queue": 6,
+    "current_playback": 12,
+    "skip": 1,
+    "previous": 0.5,
+    "pause": 0.5,
+    "play_from_queue": 0.5,
+}
+
+CHAT_MESSAGES = [
+    "chill study music", "gym hype", "sad acoustic songs",
+    "happy party music", "focus music for coding", "música para bailar",
+    "rainy day jazz", "road trip rock",
+]
+
+
+class EventLoopLagProbe:
+    """
+    Measures how late a periodic sleep wakes up inside an event loop.
+
+    The lag is the time the loop was busy with other work (e.g. blocking
+    calls in async handlers) when the probe should have run.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.lags_ms = []
+        self._stopped = False
+
+    async def run(self):
+        while not self._stopped:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags_ms.append(
+                max((time.perf_counter() - start - self.interval) * 1000, 0.0)
+            )
+
+    def stop(self):
+        self._stopped = True
+
+    def summary(self) -> dict:
+        return {
+            "samples": len(self.lags_ms),
+            "p50_ms": round(percentile(self.lags_ms, 50), 2),
+            "p95_ms": round(percentile(self.lags_ms, 95), 2),
+            "p99_ms": round(percentile(self.lags_ms, 99), 2),
+            "max_ms": round(max(self.lags_ms, default=0.0), 2),
+        }
+
+
+class ServerThread:
+    """Runs an ASGI app with uvicorn on its own event loop thread."""
+
+    def __init__(self, app, port: int):
+        import uvicorn
+
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+        )
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_until_complete, args=(self.server.serve(),), daemon=True
+        )
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def start_local_stack(args, workdir: str) -> tuple:
+    """
+    Starts the fake Spotify server and the backend in this process.
+
+    Returns:
+        (backend base URL, backend ServerThread, fake Spotify ServerThread)
+    """
+    from benchmarks.bench_pipeline import configure_environment
+    from benchmarks.fake_spotify import FakeSpotifyConfig, create_app
+    from benchmarks.synthetic_data import build_synthetic_catalog
+
+    configure_environment(args, workdir)
+    os.environ["SPOTIFY_API_BASE_URL"] = f"http://127.0.0.1:{FAKE_SPOTIFY_PORT}/v1/"
+    os.environ["SPOTIFY_ACCOUNTS_URL"] = f"http://127.0.0.1:{FAKE_SPOTIFY_PORT}"
+    build_synthetic_catalog(os.environ["SPOTIFY_DB_FILE"], args.catalog_size)
+
+    fake_spotify = ServerThread(
+        create_app(FakeSpotifyConfig(
+            catalog_size=args.catalog_size,
+            latency=args.spotify_latency,
+            rate_limit=args.spotify_rate_limit,
+            error_rate=args.spotify_error_rate
+        )),
+        FAKE_SPOTIFY_PORT
+    )
+    fake_spotify.start()
+
+    from main import app
+    backend = ServerThread(app, BACKEND_PORT)
+    backend.start()
+    return f"http://127.0.0.1:{BACKEND_PORT}", backend, fake_spotify
+
+
+async def synthetic_user(client: httpx.AsyncClient, user: int, args, deadline: float,
+                         results: list):
+    """One synthetic user: weighted random actions with think time until deadline."""
+    rng = random.Random(args.seed * 100_003 + user)
+    headers = {"Authorization": f"Bearer fake-token-loaduser_{user}"}
+    names = list(args.weights)
+    weights = [args.weights[name] for name in names]
+
+    # Stagger start so users do not fire in lockstep
+    await asyncio.sleep(rng.uniform(0, args.think_time))
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        method, path, body = ACTIONS[name]
+        if name == "chat":
+            body = {"message": rng.choice(CHAT_MESSAGES)}
+
+        start = time.perf_counter()
+        status, app_error = 0, False
+        try:
+            response = await client.request(method, path, json=body, headers=headers)
+            status = response.status_code
+            try:
+                payload = response.json()
+                app_error = isinstance(payload, dict) and bool(payload.get("error"))
+            except ValueError:
+                pass
+        except httpx.HTTPError:
+            pass
+        results.append({
+            "action": name,
+            "start": start,
+            "latency_ms": (time.perf_counter() - start) * 1000,
+            "status": status,
+            "app_error": app_error,
+        })
+        await asyncio.sleep(rng.expovariate(1 / args.think_time) if args.think_time else 0)
+
+
+async def generate_load(base_url: str, args) -> tuple:
+    """Runs all synthetic users and returns (results, elapsed seconds)."""
+    results = []
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    timeout = httpx.Timeout(args.request_timeout)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(
+            synthetic_user(client, user, args, deadline, results)
+            for user in range(args.users)
+        ))
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def build_report(args, results: list, elapsed: float, event_loop_lag: dict | None) -> dict:
+    """Aggregates raw results into the per-endpoint JSON report."""
+    endpoints = {}
+    for name in sorted({r["action"] for r in results}):
+        rows = [r for r in results if r["action"] == name]
+        http_errors = sum(1 for r in rows if r["status"] == 0 or r["status"] >= 400)
+        app_errors = sum(1 for r in rows if r["app_error"])
+        endpoints[name] = {
+            **summarize([r["latency_ms"] for r in rows]),
+            "throughput_rps": round(len(rows) / elapsed, 2),
+            "http_error_rate": round(http_errors / len(rows), 4),
+            "app_error_rate": round(app_errors / len(rows), 4),
+            "status_codes": {
+                str(status): sum(1 for r in rows if r["status"] == status)
+                for status in sorted({r["status"] for r in rows})
+            },
+        }
+
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    return {
+        "config": config,
+        "duration_s": round(elapsed, 2),
+        "requests": len(results),
+        "throughput_rps": round(len(results) / elapsed, 2),
+        "latency": summarize([r["latency_ms"] for r in results]),
+        "error_rate": round(
+            sum(1 for r in results if r["status"] == 0 or r["status"] >= 400 or r["app_error"])
+            / max(len(results), 1), 4
+        ),
+        "endpoints": endpoints,
+        "event_loop_lag": event_loop_lag,
+    }
+
+
+def parse_weights(spec: str) -> dict:
+    """Parses "chat=1,queue=6,..." on top of DEFAULT_WEIGHTS."""
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in filter(None, (spec or "").split(",")):
+        name, value = item.split("=")
+        if name not in ACTIONS:
+            raise ValueError(f"Unknown action: {name}")
+        weights[name] = float(value)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="Load an already running backend instead of a local stack")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--think-time", type=float, default=1.0,
+                        help="Mean seconds between a user's requests")
+    parser.add_argument("--weights", type=parse_weights, default=dict(DEFAULT_WEIGHTS),
+                        help='Action weights, e.g. "chat=2,pause=0"')
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--catalog-size", type=int, default=50_000)
+    parser.add_argument("--llm-latency", default="lognormal:800:0.4")
+    parser.add_argument("--spotify-latency", default="lognormal:80:0.5")
+    parser.add_argument("--spotify-rate-limit", type=float, default=0.0)
+    parser.add_argument("--spotify-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    backend = fake_spotify = probe = None
+    if args.url:
+        base_url = args.url
+    else:
+        workdir = tempfile.mkdtemp(prefix="vibe-load-")
+        # Keep the backend's progress prints out of the report
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+        base_url, backend, fake_spotify = start_local_stack(args, workdir)
+        probe = EventLoopLagProbe()
+        asyncio.run_coroutine_threadsafe(probe.run(), backend.loop)
+
+    try:
+        results, elapsed = asyncio.run(generate_load(base_url, args))
+    finally:
+        if probe:
+            probe.stop()
+        for server in (backend, fake_spotify):
+            if server:
+                server.stop()
+        if not args.url:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    report = build_report(args, results, elapsed, probe.summary() if probe else None)
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Synthetic data for offline benchmarks and load tests.
+
+Builds a small catalog with the same tables and (untyped) columns as the
+Kaggle 8M-track dataset, plus user contexts whose tracks exist in that
+catalog, so every stage of the pipeline has realistic work to do without
+the real dataset or the Spotify API.
+"""
+import random
+import string
+
+import duckdb
+import pandas as pd
+
+GENRES = [
+    "pop", "rock", "indie", "hip hop", "latin", "reggaeton", "jazz",
+    "classical", "electronic", "house", "techno", "lo-fi", "folk", "metal",
+    "r&b", "soul", "ambient", "punk", "country", "blues",
+]
+
+
+def synthetic_track_id(index: int) -> str:
+    """Deterministic 22-character Spotify-like ID for a catalog row."""
+    rng = random.Random(index)
+    return "".join(rng.choices(string.ascii_letters + string.digits, k=22))
+
+
+def build_synthetic_catalog(
+    db_file: str,
+    n_tracks: int = 50_000,
+    n_artists: int = None,
+    seed: int = 42
+):
+    """
+    Writes a DuckDB catalog with the Kaggle dataset's schema.
+
+    Args:
+        db_file: Output database file (overwritten tables)
+        n_tracks: Number of tracks
+        n_artists: Number of artists (defaults to n_tracks / 10)
+        seed: Random seed (same seed, same catalog)
+    """
+    n_artists = n_artists or max(n_tracks // 10, 1)
+    conn = duckdb.connect(db_file)
+    try:
+        conn.execute(f"SELECT setseed({(seed % 1000) / 1000})")
+        for table in ("tracks", "audio_features", "artists", "r_track_artist",
+                      "genres", "r_artist_genre"):
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+        ids = pd.DataFrame({
+            "idx": range(n_tracks),
+            "id": [synthetic_track_id(i) for i in range(n_tracks)],
+        })
+        conn.register("ids_df", ids)
+        conn.execute("CREATE TEMP TABLE ids AS SELECT * FROM ids_df")
+        conn.unregister("ids_df")
+
+        conn.execute("""
+            CREATE TABLE tracks AS
+            SELECT
+                id,
+                'Track ' || idx AS name,
+                'af_' || idx AS audio_feature_id,
+                CAST(CAST(random() * 100 AS INT) AS VARCHAR) AS popularity,
+                CAST(120000 + CAST(random() * 180000 AS INT) AS VARCHAR) AS duration
+            FROM ids
+        """)
+        conn.execute("""
+            CREATE TABLE audio_features AS
+            SELECT
+                'af_' || idx AS id,
+                CAST(random() AS VARCHAR) AS energy,
+                CAST(random() AS VARCHAR) AS valence,
+                CAST(random() AS VARCHAR) AS danceability,
+                CAST(random() AS VARCHAR) AS acousticness,
+                CAST(random() * random() AS VARCHAR) AS instrumentalness,
+                CAST(random() * 0.3 AS VARCHAR) AS speechiness,
+                CAST(60 + random() * 120 AS VARCHAR) AS tempo,
+                CAST(-30 + random() * 28 AS VARCHAR) AS loudness
+            FROM ids
+        """)
+        conn.execute(f"""
+            CREATE TABLE artists AS
+            SELECT 'artist_' || i AS id, 'Artist ' || i AS name
+            FROM range({n_artists}) t(i)
+        """)
+        # Every track has a main artist; ~10% have a featured artist too
+        conn.execute(f"""
+            CREATE TABLE r_track_artist AS
+            SELECT id AS track_id, 'artist_' || (idx % {n_artists}) AS artist_id
+            FROM ids
+            UNION ALL
+            SELECT id, 'artist_' || ((idx * 7 + 3) % {n_artists})
+            FROM ids WHERE idx % 10 = 0
+        """)
+        conn.execute("CREATE TABLE genres (id VARCHAR)")
+        conn.executemany("INSERT INTO genres VALUES (?)", [[g] for g in GENRES])
+        conn.execute(f"""
+            CREATE TABLE r_artist_genre AS
+            SELECT
+                list_extract(?, CAST(i % {len(GENRES)} AS INT) + 1) AS genre_id,
+                'artist_' || i AS artist_id
+            FROM range({n_artists}) t(i)
+            UNION ALL
+            SELECT
+                list_extract(?, CAST((i * 3 + 1) % {len(GENRES)} AS INT) + 1),
+                'artist_' || i
+            FROM range({n_artists}) t(i) WHERE i % 3 = 0
+        """, [GENRES, GENRES])
+    finally:
+        conn.close()
+
+
+def synthetic_user_context(
+    catalog_size: int,
+    n_playlists: int = 10,
+    tracks_per_playlist: int = 30,
+    seed: int = 0
+) -> dict:
+    """
+    Builds a processed user context (as returned by get_user_context)
+    whose tracks exist in a synthetic catalog of catalog_size tracks.
+
+    Args:
+        catalog_size: Number of tracks in the synthetic catalog
+        n_playlists: Number of playlists
+        tracks_per_playlist: Tracks per playlist
+        seed: Random seed (e.g. one per synthetic user)
+
+    Returns:
+        dict with top_tracks, top_artists, recently_played, playlists
+        and top_genres
+    """
+    rng = random.Random(seed)
+
+    def track(index: int) -> dict:
+        return {
+            "name": f"Track {index}",
+            "artist": f"Artist {index % max(catalog_size // 10, 1)}",
+            "uri": f"spotify:track:{synthetic_track_id(index)}",
+        }
+
+    def sample(k: int) -> list:
+        return [track(rng.randrange(catalog_size)) for _ in range(k)]
+
+    return {
+        "top_tracks": sample(20),
+        "recently_played": sample(20),
+        "top_artists": [
+            {"name": f"Artist {rng.randrange(1000)}", "genres": rng.sample(GENRES, 2)}
+            for _ in range(20)
+        ],
+        "playlists": [
+            {
+                "name": f"Playlist {i}",
+                "id": f"playlist_{seed}_{i}",
+                "total_tracks": tracks_per_playlist,
+                "public": False,
+                "owner": f"user_{seed}",
+                "tracks": sample(tracks_per_playlist),
+            }
+            for i in range(n_playlists)
+        ],
+        "top_genres": rng.sample(GENRES, 5),
+    }
+
+
+def synthetic_queue(n_tracks: int = 5) -> dict:
+    """Builds a Spotify queue response with n_tracks upcoming tracks."""
+    items = [
+        {"name": f"Queued {i}", "uri": f"spotify:track:{synthetic_track_id(i)}",
+         "artists": [{"name": f"Artist {i}"}]}
+        for i in range(n_tracks + 1)
+    ]
+    return {"currently_playing": items[0], "queue": items[1:]}
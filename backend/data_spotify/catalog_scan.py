@@ -0,0 +1,191 @@
+"""
+Sharded, multi-process scan of the catalog's feature artifact.
+
+One core scanning millions of rows limits the heavier catalog queries:
+ranking every track by mood distance, or a narrow mood range that only
+matches a few tracks. The artifact (feature_artifact.py) is split into
+row-range shards, and a process pool scans them in parallel. Every
+worker maps the same file, so shards are shared through the page cache
+rather than copied. Each worker returns its shard's top-K rows, and the
+results are merged here.
+
+Rows are stored by popularity, so for popularity-ordered searches the
+first shard is scanned in this process first. Most mood ranges fill the
+limit there and never reach the pool; only selective queries fan out to
+the remaining shards. Distance-ranked searches (vibe follow-ups) always
+scan every shard.
+
+The pool is started by the first search that fans out, in the
+background: that search and any other until the workers are up scan in
+the calling process. A worker that never fans out never spawns
+processes.
+
+Configuration (environment):
+    CATALOG_SCAN_PROCESSES   worker processes (default min(4, CPUs);
+                             1 scans in the calling process)
+    CATALOG_SCAN_SHARDS      shards per scan (default 2 per process)
+"""
+import heapq
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from data_spotify.feature_artifact import FeatureArtifact
+
+CATALOG_SCAN_PROCESSES = int(os.getenv(
+    "CATALOG_SCAN_PROCESSES", str(min(4, os.cpu_count() or 1))
+))
+CATALOG_SCAN_SHARDS = int(os.getenv("CATALOG_SCAN_SHARDS", "0")) or None
+
+# Artifact mapped by each worker process
+_worker_artifact = None
+
+
+def _init_worker(path: str):
+    global _worker_artifact
+    _worker_artifact = FeatureArtifact(path)
+
+
+def _scan_shard(mood_params: dict, limit: int, start: int, stop: int,
+                rank_by: str, scales: dict) -> list:
+    return _worker_artifact.scan(mood_params, limit, start, stop, rank_by, scales)
+
+
+class ShardedScanner:
+    """Parallel top-K searches over row-range shards of an artifact."""
+
+    def __init__(
+        self,
+        artifact: FeatureArtifact,
+        processes: int = CATALOG_SCAN_PROCESSES,
+        shards: int = CATALOG_SCAN_SHARDS
+    ):
+        """
+        Args:
+            artifact: Artifact mapped in this process
+            processes: Worker processes (1 scans in this process)
+            shards: Number of row ranges (defaults to 2 per process)
+        """
+        self.artifact = artifact
+        self.processes = max(processes, 1)
+        shards = shards or self.processes * 2
+        size = -(-artifact.rows // shards) if artifact.rows else 1
+        self.shards = [
+            (start, min(start + size, artifact.rows))
+            for start in range(0, artifact.rows, size)
+        ]
+        self._pool = None
+        self._lock = threading.Lock()
+        self._starter = None
+        self._ready = False
+        self._closed = False
+        self.fanouts = 0
+        self.local_scans = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("scanner is closed")
+            if self._pool is None:
+                # spawn: never fork a process running the server's threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.artifact.path,)
+                )
+            return self._pool
+
+    def start(self):
+        """Starts the worker processes and maps the artifact in each one."""
+        if self.processes > 1:
+            pool = self._get_pool()
+            for future in [pool.submit(len, ()) for _ in range(self.processes)]:
+                future.result()
+        self._ready = True
+
+    def _start_in_background(self):
+        try:
+            self.start()
+        except Exception as e:
+            print(f"Warning: Catalog scan workers did not start, scanning in-process: {e}")
+
+    def _ready_pool(self) -> ProcessPoolExecutor | None:
+        """The started pool, or None while it starts (the first call starts it)."""
+        if self._ready:
+            return self._pool
+        with self._lock:
+            if self._starter is None:
+                self._starter = threading.Thread(
+                    target=self._start_in_background, name="catalog-scan-start", daemon=True
+                )
+                self._starter.start()
+        return None
+
+    def scan(self, mood_params: dict, limit: int, rank_by: str = "popularity",
+             scales: dict = None, candidates=None) -> list:
+        """
+        Best rows of the whole artifact.
+
+        Args:
+            mood_params: Same format as database_service.search_all_songs
+            limit: Maximum number of rows
+            rank_by: "popularity" or "mood" (see FeatureArtifact.scan)
+            scales: Feature scales for "mood" (FEATURE_SCALES)
+            candidates: Sorted rows to restrict the scan to (a genre
+                posting list); scanned in this process, since they are
+                a fraction of the catalog
+
+        Returns:
+            List of artifact rows, best first
+        """
+        if self.processes == 1 or len(self.shards) == 1 or candidates is not None:
+            self.local_scans += 1
+            return [row for _, row in self.artifact.scan(
+                mood_params, limit, rank_by=rank_by, scales=scales, candidates=candidates
+            )]
+
+        shards = self.shards
+        found = []
+        if rank_by == "popularity":
+            # The first shard holds the most popular rows; if it fills the
+            # limit, the other shards cannot contribute
+            start, stop = shards[0]
+            found = self.artifact.scan(mood_params, limit, start, stop, rank_by, scales)
+            if len(found) >= limit:
+                self.local_scans += 1
+                return [row for _, row in found]
+            shards = shards[1:]
+
+        pool = self._ready_pool()
+        if pool is None:
+            # Workers are still starting: scan the other shards here
+            self.local_scans += 1
+            rest = self.artifact.scan(mood_params, limit, shards[0][0], shards[-1][1], rank_by, scales)
+            return [row for _, row in heapq.merge(found, rest)][:limit]
+
+        self.fanouts += 1
+        futures = [
+            pool.submit(_scan_shard, mood_params, limit, start, stop, rank_by, scales)
+            for start, stop in shards
+        ]
+        results = [found] + [future.result() for future in futures]
+        # Every shard returns its rows best first; merge by sort key
+        return [row for _, row in heapq.merge(*results)][:limit]
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+            self._ready = False
+            self._closed = True
+
+    def stats(self) -> dict:
+        return {
+            "processes": self.processes,
+            "shards": len(self.shards),
+            "local_scans": self.local_scans,
+            "fanouts": self.fanouts,
+        }
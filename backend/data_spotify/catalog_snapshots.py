@@ -0,0 +1,393 @@
+"""
+Versioned, hot-swappable catalog snapshots.
+
+A snapshot is an immutable directory holding one version of the catalog
+and everything derived from it, plus a manifest with checksums:
+
+    catalog/
+        CURRENT                        name of the active snapshot
+        snapshots/<version>/
+            spotify.sqlite             the catalog database
+            catalog_features.bin       feature artifact (feature_artifact.py)
+            genre_index.bin            genre posting lists (genre_index.py)
+            manifest.json              version, files (size + sha256), rows
+
+Publishing copies (or moves) a new database into a staging directory,
+builds its artifact, writes the manifest, and renames the directory into
+place. CURRENT is then replaced atomically (os.replace). Nothing is
+modified in place, so queries that are still running keep reading the
+old snapshot's files.
+
+Workers notice the new CURRENT on their own (database_service.get_catalog)
+and warm the new snapshot before switching to it. Caches and indexes
+derived from the catalog are keyed on the snapshot version, so they
+invalidate themselves. Older snapshots are pruned, keeping
+CATALOG_SNAPSHOTS_KEEP of them for rollback (`activate <version>`).
+
+Usage (from backend/):
+    python -m data_spotify.catalog_snapshots publish --db /path/to/spotify.sqlite
+    python -m data_spotify.catalog_snapshots list
+    python -m data_spotify.catalog_snapshots verify [<version>]
+    python -m data_spotify.catalog_snapshots activate <version>
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+CATALOG_SNAPSHOT_DIR = os.getenv(
+    "CATALOG_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(__file__), "catalog")
+)
+
+# Snapshots kept on disk (the active one included) for rollback
+CATALOG_SNAPSHOTS_KEEP = int(os.getenv("CATALOG_SNAPSHOTS_KEEP", "3"))
+
+DB_FILE_NAME = "spotify.sqlite"
+ARTIFACT_FILE_NAME = "catalog_features.bin"
+GENRE_INDEX_FILE_NAME = "genre_index.bin"
+MANIFEST_FILE_NAME = "manifest.json"
+
+
+def _snapshots_dir(root: str) -> str:
+    return os.path.join(root, "snapshots")
+
+
+def snapshot_path(version: str, root: str = CATALOG_SNAPSHOT_DIR) -> str:
+    return os.path.join(_snapshots_dir(root), version)
+
+
+def file_checksum(path: str) -> str:
+    """sha256 of a file, read in 8 MB chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(version: str, root: str = CATALOG_SNAPSHOT_DIR) -> dict:
+    with open(os.path.join(snapshot_path(version, root), MANIFEST_FILE_NAME)) as f:
+        return json.load(f)
+
+
+def current_version(root: str = CATALOG_SNAPSHOT_DIR) -> str | None:
+    """Name of the active snapshot, or None when none was published."""
+    try:
+        with open(os.path.join(root, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def list_snapshots(root: str = CATALOG_SNAPSHOT_DIR) -> list:
+    """Published snapshot versions, oldest first."""
+    try:
+        names = os.listdir(_snapshots_dir(root))
+    except FileNotFoundError:
+        return []
+    return sorted(
+        name for name in names
+        if os.path.exists(os.path.join(_snapshots_dir(root), name, MANIFEST_FILE_NAME))
+    )
+
+
+def verify_snapshot(version: str, root: str = CATALOG_SNAPSHOT_DIR, checksums: bool = True) -> list:
+    """
+    Checks a snapshot's files against its manifest.
+
+    Args:
+        version: Snapshot version
+        root: Snapshot directory
+        checksums: Also compare sha256 (reads every file); else sizes only
+
+    Returns:
+        List of problems (empty when the snapshot is intact)
+    """
+    problems = []
+    path = snapshot_path(version, root)
+    try:
+        manifest = read_manifest(version, root)
+    except (OSError, ValueError) as e:
+        return [f"manifest: {e}"]
+    for name, meta in manifest["files"].items():
+        file_path = os.path.join(path, name)
+        if not os.path.exists(file_path):
+            problems.append(f"{name}: missing")
+        elif os.path.getsize(file_path) != meta["size"]:
+            problems.append(f"{name}: size {os.path.getsize(file_path)} != {meta['size']}")
+        elif checksums and file_checksum(file_path) != meta["sha256"]:
+            problems.append(f"{name}: checksum mismatch")
+    return problems
+
+
+def activate(version: str, root: str = CATALOG_SNAPSHOT_DIR):
+    """Atomically points CURRENT at a published snapshot."""
+    if version not in list_snapshots(root):
+        raise ValueError(f"Unknown catalog snapshot: {version}")
+    tmp_path = os.path.join(root, f".CURRENT.{os.getpid()}")
+    with open(tmp_path, "w") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(root, "CURRENT"))
+    print(f"--- Catalog snapshot {version} is now current ---")
+
+
+def prune(root: str = CATALOG_SNAPSHOT_DIR, keep: int = CATALOG_SNAPSHOTS_KEEP) -> list:
+    """Deletes the oldest snapshots beyond `keep` (never the current one)."""
+    current = current_version(root)
+    removable = [version for version in list_snapshots(root) if version != current]
+    removed = removable[:max(len(removable) - (keep - 1), 0)]
+    for version in removed:
+        shutil.rmtree(snapshot_path(version, root), ignore_errors=True)
+        print(f"--- Pruned catalog snapshot {version} ---")
+    return removed
+
+
+def publish_snapshot(
+    db_path: str,
+    version: str = None,
+    move: bool = False,
+    make_current: bool = True,
+    root: str = CATALOG_SNAPSHOT_DIR,
+    source: str = None,
+    details: dict = None
+) -> dict:
+    """
+    Publishes a catalog database as a new snapshot.
+
+    Args:
+        db_path: Catalog database to publish
+        version: Snapshot name (defaults to a UTC timestamp)
+        move: Move db_path instead of copying it
+        make_current: Activate the snapshot once it is complete
+        root: Snapshot directory
+        source: Free-form origin recorded in the manifest
+        details: Extra manifest fields (e.g. the ingest report)
+
+    Returns:
+        The snapshot's manifest
+    """
+    from data_spotify.feature_artifact import FeatureArtifact, build_artifact
+    from data_spotify.genre_index import build_genre_index
+
+    version = version or time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    final_path = snapshot_path(version, root)
+    if os.path.exists(final_path):
+        raise ValueError(f"Catalog snapshot {version} already exists")
+
+    staging = os.path.join(_snapshots_dir(root), f".staging-{version}")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        db_file = os.path.join(staging, DB_FILE_NAME)
+        (shutil.move if move else shutil.copy2)(db_path, db_file)
+        header = build_artifact(db_file, os.path.join(staging, ARTIFACT_FILE_NAME))
+        build_genre_index(
+            db_file, FeatureArtifact(os.path.join(staging, ARTIFACT_FILE_NAME)),
+            os.path.join(staging, GENRE_INDEX_FILE_NAME)
+        )
+
+        files = {}
+        for name in (DB_FILE_NAME, ARTIFACT_FILE_NAME, GENRE_INDEX_FILE_NAME):
+            file_path = os.path.join(staging, name)
+            files[name] = {"size": os.path.getsize(file_path), "sha256": file_checksum(file_path)}
+        manifest = {
+            "version": version,
+            "created_at": time.time(),
+            "source": source or os.path.abspath(db_path),
+            "rows": header["rows"],
+            "files": files,
+            **(details or {}),
+        }
+        with open(os.path.join(staging, MANIFEST_FILE_NAME), "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(staging, final_path)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    print(f"--- Published catalog snapshot {version} ({manifest['rows']} rows) ---")
+    if make_current:
+        activate(version, root)
+        prune(root)
+    return manifest
+
+
+class Catalog:
+    """
+    One immutable version of the catalog and everything derived from it.
+
+    Queries hold a Catalog for their whole duration (see
+    database_service.using_catalog), so a switch never changes the files
+    under a running query. A retired Catalog releases its worker
+    processes once its last query finishes.
+    """
+
+    def __init__(self, version: str, db_file: str, artifact_file: str):
+        self.version = version
+        self.db_file = db_file
+        self.artifact_file = artifact_file
+        self._lock = threading.Lock()
+        self._artifact = None
+        self._artifact_checked = False
+        self._scanner = None
+        self._derived = {}
+        # name -> lock held while that index is built
+        self._derived_locks = {}
+        self._in_use = 0
+        self._retired = False
+
+    def artifact(self):
+        """The snapshot's feature artifact, or None to query the database."""
+        if self._artifact_checked:
+            return self._artifact
+        with self._lock:
+            if not self._artifact_checked:
+                if os.path.exists(self.artifact_file):
+                    from data_spotify.feature_artifact import FeatureArtifact
+                    try:
+                        artifact = FeatureArtifact(self.artifact_file)
+                        if artifact.matches_source(self.db_file):
+                            self._artifact = artifact
+                            print(f"--- Using feature artifact {self.artifact_file} "
+                                  f"({artifact.rows} rows) ---")
+                        else:
+                            print(f"Warning: {self.artifact_file} was built from another "
+                                  f"catalog version; querying {self.db_file} instead")
+                    except Exception as e:
+                        print(f"Warning: Could not open feature artifact: {e}")
+                self._artifact_checked = True
+        return self._artifact
+
+    def scanner(self):
+        """Sharded scanner of the artifact (see catalog_scan.py), or None."""
+        artifact = self.artifact()
+        if artifact is None:
+            return None
+        with self._lock:
+            if self._scanner is None:
+                from data_spotify.catalog_scan import ShardedScanner
+                self._scanner = ShardedScanner(artifact)
+        return self._scanner
+
+    def derived(self, name: str, build):
+        """
+        An index derived from this version, built once on first use.
+
+        Concurrent callers of the same index wait for the first build
+        instead of running their own; other indexes are not blocked.
+
+        Args:
+            name: Index name
+            build: Function building the index from this Catalog
+        """
+        with self._lock:
+            if name in self._derived:
+                return self._derived[name]
+            build_lock = self._derived_locks.setdefault(name, threading.Lock())
+        with build_lock:
+            with self._lock:
+                if name in self._derived:
+                    return self._derived[name]
+            value = build(self)
+            with self._lock:
+                self._derived[name] = value
+            return value
+
+    def forget(self, name: str):
+        """Drops a derived index so that the next derived() call builds it again."""
+        with self._lock:
+            self._derived.pop(name, None)
+
+    def prepare(self):
+        """
+        Maps the artifact. The scanner's worker processes start with the
+        first search that fans out.
+        """
+        self.scanner()
+
+    def acquire(self):
+        with self._lock:
+            self._in_use += 1
+
+    def release(self):
+        with self._lock:
+            self._in_use -= 1
+            idle = self._retired and self._in_use == 0
+        if idle:
+            self._close()
+
+    def retire(self):
+        """Marks the version as replaced; closes it once no query uses it."""
+        with self._lock:
+            self._retired = True
+            idle = self._in_use == 0
+        if idle:
+            self._close()
+
+    def _close(self):
+        with self._lock:
+            scanner, self._scanner = self._scanner, None
+        if scanner is not None:
+            scanner.close()
+
+    def stats(self) -> dict:
+        artifact = self._artifact
+        return {
+            "version": self.version,
+            "db_file": self.db_file,
+            "artifact": artifact.stats() if artifact else None,
+            "scanner": self._scanner.stats() if self._scanner else None,
+            "derived": sorted(self._derived),
+            "in_use": self._in_use,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--root", default=CATALOG_SNAPSHOT_DIR, help="Snapshot directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    publish = commands.add_parser("publish", help="Publish a catalog database")
+    publish.add_argument("--db", required=True, help="Catalog database file")
+    publish.add_argument("--version", help="Snapshot name (default: UTC timestamp)")
+    publish.add_argument("--move", action="store_true", help="Move the file instead of copying it")
+    publish.add_argument("--no-activate", action="store_true", help="Publish without making it current")
+
+    commands.add_parser("list", help="List snapshots")
+    verify = commands.add_parser("verify", help="Check a snapshot's checksums")
+    verify.add_argument("version", nargs="?", help="Snapshot (default: current)")
+    activate_parser = commands.add_parser("activate", help="Make a snapshot current")
+    activate_parser.add_argument("version")
+
+    args = parser.parse_args()
+    if args.command == "publish":
+        publish_snapshot(
+            args.db, version=args.version, move=args.move,
+            make_current=not args.no_activate, root=args.root
+        )
+    elif args.command == "list":
+        current = current_version(args.root)
+        for version in list_snapshots(args.root):
+            manifest = read_manifest(version, args.root)
+            marker = "*" if version == current else " "
+            print(f"{marker} {version}  {manifest['rows']} rows  {manifest['source']}")
+    elif args.command == "verify":
+        version = args.version or current_version(args.root)
+        if version is None:
+            print("No catalog snapshot is current")
+            raise SystemExit(1)
+        problems = verify_snapshot(version, args.root)
+        print(f"{version}: {'OK' if not problems else '; '.join(problems)}")
+        raise SystemExit(1 if problems else 0)
+    elif args.command == "activate":
+        activate(args.version, args.root)
+
+
+if __name__ == "__main__":
+    main()
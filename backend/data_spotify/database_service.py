@@ -1,111 +1,769 @@
-import duckdb
 import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 
-# Define the path to the database file
-DB_FILE = os.path.join(os.path.dirname(__file__), "spotify.sqlite")
+from data_spotify import catalog_snapshots
+from data_spotify.catalog_snapshots import Catalog
+from shared_cache import get_cache
+from tracing import metrics, span
 
-def get_db_connection():
+# Define the path to the database file (overridable for benchmarks/tests)
+DB_FILE = os.getenv(
+    "SPOTIFY_DB_FILE",
+    os.path.join(os.path.dirname(__file__), "spotify.sqlite")
+)
+
+# Feature mapping: name -> SQL column
+FEATURE_COLUMNS = {
+    'energy': 'af.energy',
+    'valence': 'af.valence',
+    'danceability': 'af.danceability',
+    'acousticness': 'af.acousticness',
+    'instrumentalness': 'af.instrumentalness',
+    'speechiness': 'af.speechiness',
+    'tempo': 'af.tempo',
+    'loudness': 'af.loudness'
+}
+
+# Value range of each feature, used to normalize distances
+FEATURE_SCALES = {
+    'energy': 1.0,
+    'valence': 1.0,
+    'danceability': 1.0,
+    'acousticness': 1.0,
+    'instrumentalness': 1.0,
+    'speechiness': 1.0,
+    'tempo': 200.0,
+    'loudness': 60.0
+}
+
+# Memory-mapped feature artifact of the catalog, built offline with
+# `python -m data_spotify.feature_artifact` (see feature_artifact.py).
+# When present and built from DB_FILE, searches and feature lookups read
+# it instead of querying the database.
+CATALOG_ARTIFACT_FILE = os.getenv(
+    "CATALOG_ARTIFACT_FILE",
+    os.path.join(os.path.dirname(__file__), "catalog_features.bin")
+)
+
+# Once a snapshot is published (see catalog_snapshots.py), workers serve
+# the one named in catalog/CURRENT and check it for changes every
+# CATALOG_POLL_SECONDS (with jitter, so workers do not all switch at
+# once). Setting SPOTIFY_DB_FILE pins DB_FILE / CATALOG_ARTIFACT_FILE.
+USE_CATALOG_SNAPSHOTS = "SPOTIFY_DB_FILE" not in os.environ
+CATALOG_POLL_SECONDS = float(os.getenv("CATALOG_POLL_SECONDS", "10"))
+
+# Recent searches replayed on a new catalog version before switching to
+# it, so its cache entries exist when it starts serving
+CATALOG_PREWARM_SEARCHES = int(os.getenv("CATALOG_PREWARM_SEARCHES", "50"))
+
+metrics.describe(
+    "vibe_catalog_switches_total", "counter",
+    "Switches of this process to a new catalog version"
+)
+
+# Tracks per artist in a catalog search result (0 disables the cap), so
+# one artist cannot fill a playlist
+CATALOG_MAX_PER_ARTIST = int(os.getenv("CATALOG_MAX_PER_ARTIST", "2"))
+
+# Candidate rows examined at most by an artist-capped artifact search,
+# for when few artists match and the cap cannot fill the limit
+CATALOG_TOPK_MAX_CANDIDATES = int(os.getenv("CATALOG_TOPK_MAX_CANDIDATES", "20000"))
+
+metrics.describe(
+    "vibe_search_artist_cap_dropped_total", "counter",
+    "Catalog search candidates skipped by the per-artist cap"
+)
+
+_catalog = None
+_catalog_lock = threading.Lock()
+_next_catalog_check = 0.0
+_switching_to = None
+_rejected_version = None
+# Recent search arguments, replayed on a new catalog version to warm it.
+# Written by requests, read by the catalog-switch thread.
+_recent_searches = OrderedDict()
+_recent_searches_lock = threading.Lock()
+
+# Catalog search results, shared by all workers (see shared_cache.py).
+# Keys include the catalog version, so a new version starts fresh.
+_search_results = get_cache(
+    "catalog_search", int(os.getenv("CATALOG_SEARCH_CACHE_SECONDS", "600"))
+)
+
+def _latest_catalog_location() -> tuple:
+    """(version, db_file, artifact_file) of the catalog to serve."""
+    if USE_CATALOG_SNAPSHOTS:
+        version = catalog_snapshots.current_version()
+        if version:
+            path = catalog_snapshots.snapshot_path(version)
+            return (
+                version,
+                os.path.join(path, catalog_snapshots.DB_FILE_NAME),
+                os.path.join(path, catalog_snapshots.ARTIFACT_FILE_NAME),
+            )
+    # Unversioned file: its size and mtime stand in for a version
+    try:
+        stat = os.stat(DB_FILE)
+        version = f"file-{stat.st_size}-{int(stat.st_mtime)}"
+    except OSError:
+        version = "file-missing"
+    return version, DB_FILE, CATALOG_ARTIFACT_FILE
+
+def get_catalog() -> Catalog:
+    """
+    Returns the catalog version this process serves.
+
+    When a new version is published, it is prepared in a background
+    thread (artifact mapped, genre index opened, recent searches
+    replayed) and swapped in; queries keep using the current version
+    meanwhile.
+    """
+    global _catalog, _next_catalog_check, _switching_to
+    now = time.monotonic()
+    if _catalog is not None and now < _next_catalog_check:
+        return _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = Catalog(*_latest_catalog_location())
+        elif _switching_to is None:
+            location = _latest_catalog_location()
+            if location[0] not in (_catalog.version, _rejected_version):
+                _switching_to = location[0]
+                threading.Thread(
+                    target=_switch_catalog, args=(location,),
+                    name="catalog-switch", daemon=True
+                ).start()
+        _next_catalog_check = now + CATALOG_POLL_SECONDS * random.uniform(0.75, 1.25)
+        return _catalog
+
+def _switch_catalog(location: tuple):
+    """Prepares a new catalog version, then makes it current."""
+    global _catalog, _switching_to, _rejected_version
+    version = location[0]
+    if not version.startswith("file-"):
+        try:
+            problems = catalog_snapshots.verify_snapshot(version, checksums=False)
+        except Exception as e:
+            problems = [str(e)]
+        if problems:
+            print(f"Warning: Not switching to catalog {version}: {'; '.join(problems)}")
+            with _catalog_lock:
+                _rejected_version, _switching_to = version, None
+            return
+
+    catalog = Catalog(*location)
+    try:
+        catalog.prepare()
+        ensure_genre_index(catalog)
+        with _recent_searches_lock:
+            recent = list(_recent_searches.values())
+        for mood_params, genre, limit, max_per_artist in recent:
+            _search_catalog(catalog, mood_params, genre, limit, max_per_artist)
+    except Exception as e:
+        # A cold catalog is still a good one: switch anyway
+        print(f"Warning: Could not prewarm catalog {version}: {e}")
+
+    with _catalog_lock:
+        previous, _catalog = _catalog, catalog
+        _switching_to = None
+    # Queries still running on the previous version finish on it
+    previous.retire()
+    metrics.inc("vibe_catalog_switches_total")
+    print(f"--- Switched catalog {previous.version} -> {version} ---")
+
+@contextmanager
+def using_catalog():
+    """Holds the current catalog version for the duration of a query."""
+    get_catalog()
+    with _catalog_lock:
+        catalog = _catalog
+        catalog.acquire()
+    try:
+        yield catalog
+    finally:
+        catalog.release()
+
+def get_db_connection(catalog: Catalog = None):
     """Establishes a connection to the DuckDB database."""
-    return duckdb.connect(database=DB_FILE, read_only=True) # Read-only for querying
+    # Imported on first use to keep the app's import time down
+    import duckdb
 
-def search_all_songs(mood_params: dict, genre: str = None, limit: int = 20):
+    db_file = (catalog or get_catalog()).db_file
+    return duckdb.connect(database=db_file, read_only=True) # Read-only for querying
+
+def get_feature_artifact():
+    """Returns the current catalog's feature artifact, or None to query the database."""
+    return get_catalog().artifact()
+
+def get_genre_index(catalog: Catalog = None):
     """
-    Searches the main tracks table for songs matching given audio features.
-    This is the tool for the ScoutAgent.
-    
+    Genre index of a catalog version (see genre_index.py), or None.
+
+    Never built here: published snapshots ship one, and for an
+    unversioned catalog the warm-up thread builds it (ensure_genre_index).
+    While it is missing or stale, and without an artifact, genre searches
+    join r_artist_genre instead.
+    """
+    return (catalog or get_catalog()).derived("genre_index", _open_genre_index)
+
+def ensure_genre_index(catalog: Catalog = None):
+    """
+    Builds a catalog version's genre index if it is missing or stale.
+
+    Slow (one pass over r_artist_genre): only called off the request path,
+    from the warm-up and catalog switch threads.
+
+    Returns:
+        The opened GenreIndex, or None without a feature artifact
+    """
+    catalog = catalog or get_catalog()
+    index = get_genre_index(catalog)
+    artifact = catalog.artifact()
+    if index is not None or artifact is None:
+        return index
+    from data_spotify.genre_index import build_genre_index
+
+    path = _genre_index_path(catalog)
+    try:
+        print(f"--- Building genre index {path} ---")
+        build_genre_index(catalog.db_file, artifact, path)
+    except Exception as e:
+        print(f"Warning: Could not build genre index: {e}")
+        return None
+    catalog.forget("genre_index")
+    return get_genre_index(catalog)
+
+def _genre_index_path(catalog: Catalog) -> str:
+    return os.path.join(
+        os.path.dirname(catalog.artifact_file), catalog_snapshots.GENRE_INDEX_FILE_NAME
+    )
+
+def _open_genre_index(catalog: Catalog):
+    artifact = catalog.artifact()
+    if artifact is None:
+        return None
+    from data_spotify.genre_index import GenreIndex
+
+    path = _genre_index_path(catalog)
+    if not os.path.exists(path):
+        return None
+    try:
+        index = GenreIndex(path)
+    except Exception as e:
+        print(f"Warning: Could not open genre index: {e}")
+        return None
+    return index if index.matches_artifact(artifact) else None
+
+def get_genre_names(catalog: Catalog = None) -> set:
+    """Genre names of a catalog version (normalized like genre_index)."""
+    def load(catalog: Catalog) -> set:
+        conn = get_db_connection(catalog)
+        try:
+            return {
+                row[0] for row in conn.execute(
+                    "SELECT DISTINCT lower(trim(CAST(genre_id AS VARCHAR))) FROM r_artist_genre"
+                ).fetchall() if row[0]
+            }
+        finally:
+            conn.close()
+
+    return (catalog or get_catalog()).derived("genre_names", load)
+
+def build_feature_filters(
+    mood_params: dict,
+    columns: dict = None,
+    untyped: bool = True
+) -> tuple:
+    """
+    Builds SQL WHERE clauses for audio feature ranges.
+
+    Shared by the catalog search and the user library store so both
+    interpret mood_params the same way.
+
     Args:
         mood_params: Dict with audio features. Each feature can be:
                     - dict with 'min' and/or 'max': {"min": 0.7, "max": 1.0}
                     - float: treated as minimum value (backward compatible)
-        genre: Optional genre filter
-        limit: Maximum number of results
-    """
-    conn = get_db_connection()
-    
-    # Base query (construct uri from track_id since uri column doesn't exist)
-    query = """
-        SELECT 
-            CAST(t.id AS VARCHAR) as track_id,
-            CAST(t.name AS VARCHAR) as track_name,
-            CAST(a.name AS VARCHAR) as artist_name,
-            'spotify:track:' || CAST(t.id AS VARCHAR) as uri
-        FROM tracks t
-        JOIN r_track_artist rta ON t.id = rta.track_id
-        JOIN artists a ON rta.artist_id = a.id
-        JOIN audio_features af ON t.audio_feature_id = af.id
-    """
+        columns: Feature name -> SQL column (defaults to FEATURE_COLUMNS)
+        untyped: Cast columns to FLOAT first (the catalog stores
+                 untyped SQLite values)
 
+    Returns:
+        Tuple of (list of SQL clauses, list of parameters)
+    """
     where_clauses = []
     params = []
 
-    # Feature mapping: name -> SQL column
-    feature_columns = {
-        'energy': 'af.energy',
-        'valence': 'af.valence',
-        'danceability': 'af.danceability',
-        'acousticness': 'af.acousticness',
-        'instrumentalness': 'af.instrumentalness',
-        'speechiness': 'af.speechiness',
-        'tempo': 'af.tempo',
-        'loudness': 'af.loudness'
-    }
-
-    for feature_name, column in feature_columns.items():
+    for feature_name, column in (columns or FEATURE_COLUMNS).items():
         if feature_name in mood_params:
             feature_value = mood_params[feature_name]
+            expression = (
+                f"CAST({column} AS VARCHAR)::FLOAT" if untyped else column
+            )
             
             # Handle dict with min/max
             if isinstance(feature_value, dict):
                 if 'min' in feature_value and 'max' in feature_value:
-                    where_clauses.append(
-                        f"CAST({column} AS VARCHAR)::FLOAT BETWEEN ? AND ?"
-                    )
+                    where_clauses.append(f"{expression} BETWEEN ? AND ?")
                     params.append(feature_value['min'])
                     params.append(feature_value['max'])
                 elif 'min' in feature_value:
-                    where_clauses.append(
-                        f"CAST({column} AS VARCHAR)::FLOAT >= ?"
-                    )
+                    where_clauses.append(f"{expression} >= ?")
                     params.append(feature_value['min'])
                 elif 'max' in feature_value:
-                    where_clauses.append(
-                        f"CAST({column} AS VARCHAR)::FLOAT <= ?"
-                    )
+                    where_clauses.append(f"{expression} <= ?")
                     params.append(feature_value['max'])
             
             # Handle backward compatibility (float = minimum)
             elif isinstance(feature_value, (int, float)):
-                where_clauses.append(f"CAST({column} AS VARCHAR)::FLOAT > ?")
+                where_clauses.append(f"{expression} > ?")
                 params.append(feature_value)
+
+    return where_clauses, params
+
+
+def search_catalog(
+    mood_params: dict,
+    genre: str = None,
+    limit: int = 20,
+    max_per_artist: int = CATALOG_MAX_PER_ARTIST
+) -> dict:
+    """
+    Searches the catalog: one result per track, at most `max_per_artist`
+    tracks per artist.
+
+    The catalog has one row per (track, artist) pair; rows of the same
+    track are merged and their artists aggregated. The artist cap is
+    applied while selecting the top `limit` tracks: a track is skipped
+    when, for any of its artists, `max_per_artist` better matching
+    tracks of that artist came before it. The artifact path streams
+    candidates in order; the SQL path ranks them with a window function.
+
+    Args:
+        mood_params: Same format as search_all_songs
+        genre: Optional genre filter (see search_all_songs)
+        limit: Maximum number of tracks
+        max_per_artist: Tracks per artist (0 disables the cap)
+
+    Returns:
+        dict with "results" (song dicts: track_id, track_name,
+        artist_name with every artist comma-separated, artists, uri;
+        best first) and "dropped_by_artist_cap" (candidates skipped)
+    """
+    # Remembered so a new catalog version can be warmed with them
+    key = repr((mood_params, genre, limit, max_per_artist))
+    with _recent_searches_lock:
+        _recent_searches[key] = (mood_params, genre, limit, max_per_artist)
+        _recent_searches.move_to_end(key)
+        while len(_recent_searches) > CATALOG_PREWARM_SEARCHES:
+            _recent_searches.popitem(last=False)
+
+    with using_catalog() as catalog:
+        return _search_catalog(catalog, mood_params, genre, limit, max_per_artist)
+
+def search_all_songs(mood_params: dict, genre: str = None, limit: int = 20):
+    """
+    Searches the main tracks table for songs matching given audio features.
+    This is the tool for the ScoutAgent.
     
-    if where_clauses:
-        query += " WHERE " + " AND ".join(where_clauses)
+    Args:
+        mood_params: Dict with audio features. Each feature can be:
+                    - dict with 'min' and/or 'max': {"min": 0.7, "max": 1.0}
+                    - float: treated as minimum value (backward compatible)
+        genre: Optional genre filter: one or more comma-separated genres
+               ("rock" also matches "indie rock", "hard rock", ...)
+        limit: Maximum number of results
 
-    query += f" ORDER BY CAST(t.popularity AS VARCHAR)::INT DESC LIMIT {limit}"
+    Returns:
+        List of song dicts, one per track, at most CATALOG_MAX_PER_ARTIST
+        per artist (see search_catalog)
+    """
+    return search_catalog(mood_params, genre, limit)["results"]
+
+def _artifact_top_k(
+    scanner,
+    mood_params: dict,
+    limit: int,
+    max_per_artist: int,
+    rank_by: str = "popularity",
+    scales: dict = None,
+    candidates=None
+) -> dict:
+    """
+    Distinct, artist-capped top tracks from the artifact.
+
+    Candidate rows are consumed in rank order; when the cap or duplicate
+    rows leave fewer than `limit` tracks, the scan is repeated with four
+    times as many candidates (up to CATALOG_TOPK_MAX_CANDIDATES).
+    """
+    artifact = scanner.artifact
+    fetch = limit * 2 + 16
+    while True:
+        rows = scanner.scan(mood_params, fetch, rank_by=rank_by, scales=scales, candidates=candidates)
+        results, dropped = [], 0
+        seen, per_artist = set(), {}
+        for row in rows:
+            track_id = artifact.text("track_id", row)
+            if track_id in seen:
+                continue
+            seen.add(track_id)
+            song = artifact.track(row)
+            capped = max_per_artist and any(
+                per_artist.get(artist, 0) >= max_per_artist for artist in song["artists"]
+            )
+            for artist in song["artists"]:
+                per_artist[artist] = per_artist.get(artist, 0) + 1
+            if capped:
+                dropped += 1
+                continue
+            results.append(song)
+            if len(results) == limit:
+                return {"results": results, "dropped_by_artist_cap": dropped}
+        if len(rows) < fetch or fetch >= CATALOG_TOPK_MAX_CANDIDATES:
+            return {"results": results, "dropped_by_artist_cap": dropped}
+        fetch = min(fetch * 4, CATALOG_TOPK_MAX_CANDIDATES)
+
+def _search_catalog(
+    catalog: Catalog,
+    mood_params: dict,
+    genre: str,
+    limit: int,
+    max_per_artist: int
+) -> dict:
+    cache_key = (catalog.version, mood_params, genre, limit, max_per_artist)
+    cached = _search_results.get(cache_key)
+    if cached is not None:
+        return cached
+
+    scanner = catalog.scanner()
+    genre_index = get_genre_index(catalog) if scanner is not None and genre else None
+    if scanner is not None and (not genre or genre_index is not None):
+        candidates = None
+        if genre:
+            # Genre posting list, intersected with the mood ranges by the scan
+            candidates = genre_index.rows(genre, scanner.artifact.rows)
+            if candidates is None:
+                print(f"Warning: Unknown genre '{genre}', searching every genre")
+        with span("artifact_scan", query="search_all_songs", genre=genre) as scan_span:
+            result = _artifact_top_k(scanner, mood_params, limit, max_per_artist, candidates=candidates)
+            scan_span.set(rows=len(result["results"]), dropped=result["dropped_by_artist_cap"])
+        _record_artist_cap(result)
+        _search_results.set(cache_key, result)
+        return result
+
+    where_clauses, params = build_feature_filters(mood_params)
+    if genre:
+        from data_spotify.genre_index import resolve_genres
+
+        genres = resolve_genres(get_genre_names(catalog), genre)
+        if genres:
+            placeholders = ", ".join("?" for _ in genres)
+            where_clauses.append(f"""t.id IN (
+                SELECT g_rta.track_id FROM r_track_artist g_rta
+                JOIN r_artist_genre rag ON rag.artist_id = g_rta.artist_id
+                WHERE lower(trim(CAST(rag.genre_id AS VARCHAR))) IN ({placeholders}))""")
+            params += genres
+        else:
+            print(f"Warning: Unknown genre '{genre}', searching every genre")
+    where = " WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+
+    conn = get_db_connection(catalog)
+    
+    # One row per (track, artist) pair, merged into tracks. A track is kept
+    # when it ranks within max_per_artist for each of its artists, and
+    # tracks are returned until `limit` of them are kept.
+    query = f"""
+        WITH matches AS (
+            SELECT
+                CAST(t.id AS VARCHAR) AS track_id,
+                CAST(t.name AS VARCHAR) AS track_name,
+                CAST(a.name AS VARCHAR) AS artist_name,
+                COALESCE(TRY_CAST(CAST(t.popularity AS VARCHAR) AS INT), -1) AS popularity
+            FROM tracks t
+            JOIN r_track_artist rta ON t.id = rta.track_id
+            JOIN artists a ON rta.artist_id = a.id
+            JOIN audio_features af ON t.audio_feature_id = af.id{where}
+        ),
+        ranked AS (
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY artist_name ORDER BY popularity DESC, track_id
+            ) AS artist_rank
+            FROM matches
+        ),
+        merged AS (
+            SELECT
+                track_id,
+                any_value(track_name) AS track_name,
+                max(popularity) AS popularity,
+                list(artist_name ORDER BY artist_name) AS artists,
+                ? = 0 OR max(artist_rank) <= ? AS kept
+            FROM ranked
+            GROUP BY track_id
+        ),
+        ordered AS (
+            SELECT *, COALESCE(SUM(kept::INT) OVER (
+                ORDER BY popularity DESC, track_id
+                ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+            ), 0) AS kept_before
+            FROM merged
+        )
+        SELECT track_id, track_name, artists, kept
+        FROM ordered
+        WHERE kept_before < ?
+        ORDER BY popularity DESC, track_id
+    """
+    params += [max_per_artist, max_per_artist, limit]
 
     print(f"--- DATABASE QUERY ---\n{query}\nParams: {params}\n---------------------")
 
     try:
-        results = conn.execute(query, params).fetchdf()
-        return results.to_dict('records')
+        with span("db_query", query="search_all_songs") as query_span:
+            candidates = conn.execute(query, params).fetchall()
+            query_span.set(rows=len(candidates))
+        results = [
+            {
+                "track_id": track_id,
+                "track_name": track_name,
+                "artist_name": ", ".join(artists),
+                "artists": list(artists),
+                "uri": f"spotify:track:{track_id}",
+            }
+            for track_id, track_name, artists, kept in candidates if kept
+        ]
+        result = {
+            "results": results,
+            "dropped_by_artist_cap": sum(1 for *_, kept in candidates if not kept),
+        }
+        _record_artist_cap(result)
+        _search_results.set(cache_key, result)
+        return result
     except Exception as e:
         print(f"Error querying database: {e}")
-        return []
+        return {"results": [], "dropped_by_artist_cap": 0}
     finally:
         conn.close()
 
-# --- Placeholder for user-specific table functions ---
+def _record_artist_cap(result: dict):
+    if result["dropped_by_artist_cap"]:
+        metrics.inc("vibe_search_artist_cap_dropped_total", result["dropped_by_artist_cap"])
+
+def search_closest_songs(
+    mood_params: dict,
+    limit: int = 20,
+    max_per_artist: int = CATALOG_MAX_PER_ARTIST
+) -> list:
+    """
+    Catalog songs closest to a mood, ranked by mood_distance.
+
+    Unlike search_all_songs, songs slightly outside the ranges still
+    qualify, so there are always `limit` results. This scores every
+    track, so it runs on the sharded scanner; without a feature artifact
+    it falls back to search_all_songs.
+
+    Args:
+        mood_params: Same format as search_all_songs
+        limit: Maximum number of results
+        max_per_artist: Tracks per artist (0 disables the cap)
+
+    Returns:
+        List of song dicts (as search_catalog), best first
+    """
+    with using_catalog() as catalog:
+        scanner = catalog.scanner()
+        if scanner is None:
+            return _search_catalog(catalog, mood_params, None, limit, max_per_artist)["results"]
+
+        cache_key = (catalog.version, "closest", mood_params, limit, max_per_artist)
+        cached = _search_results.get(cache_key)
+        if cached is not None:
+            return cached
+
+        with span("artifact_scan", query="search_closest_songs") as scan_span:
+            result = _artifact_top_k(
+                scanner, mood_params, limit, max_per_artist, rank_by="mood", scales=FEATURE_SCALES
+            )
+            scan_span.set(rows=len(result["results"]), dropped=result["dropped_by_artist_cap"])
+        _record_artist_cap(result)
+        _search_results.set(cache_key, result["results"])
+        return result["results"]
+
+def get_audio_features_by_track_ids(track_ids: list) -> dict:
+    """
+    Looks up audio features for a list of Spotify track IDs.
+
+    Uses a binary search in the feature artifact when there is one, else
+    a primary-key IN lookup on the tracks table. Both stay fast for the
+    few hundred tracks of a user library.
+
+    Args:
+        track_ids: Spotify track IDs (without the spotify:track: prefix)
+
+    Returns:
+        dict mapping track_id -> dict of feature values
+    """
+    track_ids = list(dict.fromkeys(tid for tid in track_ids if tid))
+    if not track_ids:
+        return {}
+
+    with using_catalog() as catalog:
+        return _get_audio_features(catalog, track_ids)
+
+def _get_audio_features(catalog: Catalog, track_ids: list) -> dict:
+    artifact = catalog.artifact()
+    if artifact is not None:
+        with span("artifact_lookup", query="audio_features_lookup") as lookup_span:
+            features = artifact.features_by_track_ids(track_ids)
+            lookup_span.set(rows=len(features))
+        return features
+
+    feature_select = ",\n            ".join(
+        f"CAST({column} AS VARCHAR)::FLOAT as {name}"
+        for name, column in FEATURE_COLUMNS.items()
+    )
+    placeholders = ", ".join("?" for _ in track_ids)
+    query = f"""
+        SELECT
+            CAST(t.id AS VARCHAR) as track_id,
+            {feature_select}
+        FROM tracks t
+        JOIN audio_features af ON t.audio_feature_id = af.id
+        WHERE t.id IN ({placeholders})
+    """
+
+    try:
+        conn = get_db_connection(catalog)
+    except Exception as e:
+        print(f"Error connecting to database: {e}")
+        return {}
+
+    try:
+        with span("db_query", query="audio_features_lookup") as query_span:
+            rows = conn.execute(query, track_ids).fetchall()
+            query_span.set(rows=len(rows))
+        columns = ["track_id"] + list(FEATURE_COLUMNS)
+        return {
+            row[0]: dict(zip(columns[1:], row[1:]))
+            for row in rows
+        }
+    except Exception as e:
+        print(f"Error looking up audio features: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def enrich_songs_with_features(songs: list) -> list:
+    """
+    Adds audio features to songs that have a Spotify URI.
+
+    Args:
+        songs: List of song dicts with at least 'uri'
+
+    Returns:
+        New list of song dicts with a 'features' key (None when the
+        track is not in the local catalog)
+    """
+    track_ids = [song.get("uri", "").split(":")[-1] for song in songs]
+    features = get_audio_features_by_track_ids(track_ids)
+    return [
+        {**song, "features": features.get(track_id)}
+        for song, track_id in zip(songs, track_ids)
+    ]
+
+
+def mood_distance(features: dict, mood_params: dict) -> float:
+    """
+    Normalized distance between a song's features and a mood.
+
+    Each feature contributes its distance to the requested range (zero
+    when inside it) plus a small pull towards the range centre, scaled
+    by FEATURE_SCALES.
+
+    Args:
+        features: dict of feature values
+        mood_params: Same format as search_all_songs
+
+    Returns:
+        Distance (lower is a better match)
+    """
+    total = 0.0
+    for feature_name, feature_value in mood_params.items():
+        value = features.get(feature_name)
+        if value is None or feature_name not in FEATURE_SCALES:
+            continue
+        if isinstance(feature_value, dict):
+            low = feature_value.get("min", feature_value.get("max"))
+            high = feature_value.get("max", feature_value.get("min"))
+        else:
+            low, high = feature_value, feature_value
+        scale = FEATURE_SCALES[feature_name]
+        outside = max(low - value, 0.0, value - high) / scale
+        off_centre = abs(value - (low + high) / 2) / scale
+        total += outside ** 2 + 0.1 * off_centre ** 2
+    return total ** 0.5
+
+
+def rank_songs_by_mood(songs: list, mood_params: dict, limit: int = None) -> list:
+    """
+    Orders enriched songs by mood distance (best first).
+
+    Songs without features keep their original order after the scored
+    ones, so unknown tracks are deprioritized but not lost.
+
+    Args:
+        songs: Songs returned by enrich_songs_with_features
+        mood_params: Same format as search_all_songs
+        limit: Maximum number of songs to return
+
+    Returns:
+        List of song dicts with a 'mood_distance' key
+    """
+    scored = []
+    unscored = []
+    for song in songs:
+        if song.get("features"):
+            distance = mood_distance(song["features"], mood_params)
+            scored.append({**song, "mood_distance": distance})
+        else:
+            unscored.append({**song, "mood_distance": None})
+    scored.sort(key=lambda song: song["mood_distance"])
+    ranked = scored + unscored
+    return ranked[:limit] if limit else ranked
+
+
+# --- User library functions (backed by the persistent user library store) ---
+
+
+def create_or_update_user_table(user_id: str, songs_data: list, source: str = "saved"):
+    """
+    Upserts a user's library songs, enriched with catalog audio features.
+
+    Args:
+        user_id: Spotify user ID
+        songs_data: List of song dicts (name, artist, uri, optional added_at)
+        source: 'saved' or 'playlist:<playlist_id>'
+    """
+    from data_spotify import user_library_store
+    stored = user_library_store.upsert_user_tracks(user_id, source, songs_data)
+    print(f"--- Stored {stored} library songs for user {user_id} ({source}) ---")
 
-def create_or_update_user_table(user_id: str, songs_data: list):
-    """Creates or updates a user-specific table with their liked songs."""
-    # TODO: Implement the logic to write to a user-specific table.
-    # Connection needs to be read-write for this.
-    print(f"(Placeholder) Would create/update table for user {user_id} with {len(songs_data)} songs.")
-    pass
 
 def search_liked_songs(user_id: str, mood_params: dict, limit: int = 10):
-    """Searches the user-specific table. Tool for the PersonalizedAgent."""
-    # TODO: Implement query logic for the user-specific table.
-    print(f"(Placeholder) Would search liked songs for user {user_id} "
-          f"with mood {mood_params}, limit={limit}.")
-    return []
+    """
+    Searches a user's stored library by mood. Tool for the PersonalizedAgent.
+
+    Args:
+        user_id: Spotify user ID
+        mood_params: Same format as search_all_songs
+        limit: Maximum number of results
+
+    Returns:
+        List of song dicts ranked by mood distance (only songs with
+        known audio features)
+    """
+    from data_spotify import user_library_store
+    return user_library_store.search_user_tracks(user_id, mood_params, limit)
@@ -0,0 +1,492 @@
+"""
+Memory-mapped feature artifact of the catalog.
+
+The catalog search joins tracks, artists and audio features and casts
+untyped SQLite values on every query. This module precomputes that join
+once, offline, into a compact binary file. database_service opens it with
+mmap, so every worker process shares the same page-cache pages through
+zero-copy NumPy views: resident memory is paid once per host, and
+opening the file costs a header read.
+
+Layout (all columns 64-byte aligned, little-endian):
+
+    b"VIBEFEAT" | uint32 format version | uint32 header length | JSON header
+    energy ... speechiness   float16 (0-1 features)
+    tempo, loudness          float32
+    popularity               int8 (-1 when unknown)
+    <text>_offsets           uint64, rows + 1 offsets into <text>_data
+    <text>_data              UTF-8 bytes (text = track_id, track_name,
+                             artist_name)
+    track_id_sorted          fixed-width track IDs in sorted order
+    track_id_rows            uint32 row of each sorted track ID
+
+There is one row per (track, artist) pair, like the catalog search,
+ordered by popularity (descending), so a search is a scan that stops as
+soon as `limit` rows match. float16 keeps three significant digits, which is
+finer than the mood ranges the agents ask for.
+
+Build it after downloading or refreshing the catalog (from backend/):
+    python -m data_spotify.feature_artifact --db data_spotify/spotify.sqlite
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import struct
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+MAGIC = b"VIBEFEAT"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# Feature columns and their on-disk types (same names as FEATURE_COLUMNS)
+FEATURE_DTYPES = {
+    "energy": "<f2",
+    "valence": "<f2",
+    "danceability": "<f2",
+    "acousticness": "<f2",
+    "instrumentalness": "<f2",
+    "speechiness": "<f2",
+    "tempo": "<f4",
+    "loudness": "<f4",
+}
+TEXT_COLUMNS = ("track_id", "track_name", "artist_name")
+
+# Rows fetched from the catalog per chunk while building
+BUILD_CHUNK_ROWS = 500_000
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+# Rows tested per step of a search scan. Popularity-ordered scans start
+# small and double, since most mood ranges fill the limit early.
+SCAN_BLOCK_ROWS = 262_144
+SCAN_FIRST_BLOCK_ROWS = 16_384
+
+
+def source_signature(db_file: str) -> dict | None:
+    """Size and modification time of the catalog an artifact was built from."""
+    try:
+        stat = os.stat(db_file)
+    except OSError:
+        return None
+    return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def is_sqlite_file(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    except OSError:
+        return False
+
+
+def stream_catalog_rows(
+    db_file: str,
+    query: Callable[[str], str],
+    chunk_rows: int,
+    functions: dict = None
+):
+    """
+    Yields the rows of a catalog query in chunks.
+
+    SQLite catalogs (the Kaggle file, ingest snapshots) are read with the
+    sqlite3 module: DuckDB would need its sqlite extension, which it
+    downloads on first use, and builds must also work offline. Other
+    files are opened with DuckDB.
+
+    Args:
+        db_file: Catalog database
+        query: Builds the SQL for a dialect, "sqlite" or "duckdb"
+        chunk_rows: Rows per chunk
+        functions: SQL functions {name: callable} (SQLite only; under
+                   DuckDB the query must not use them)
+    """
+    if is_sqlite_file(db_file):
+        conn = sqlite3.connect(f"{Path(db_file).absolute().as_uri()}?mode=ro", uri=True)
+        for name, function in (functions or {}).items():
+            conn.create_function(name, 1, function, deterministic=True)
+        cursor = conn.execute(query("sqlite"))
+    else:
+        import duckdb
+
+        conn = duckdb.connect(database=db_file, read_only=True)
+        cursor = conn.execute(query("duckdb"))
+    try:
+        while True:
+            chunk = cursor.fetchmany(chunk_rows)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        conn.close()
+
+
+def _build_query(feature_columns: dict, dialect: str) -> str:
+    if dialect == "sqlite":
+        # Blank values become NULL, as TRY_CAST does under DuckDB
+        text_type, float_type = "TEXT", "REAL"
+        number = lambda column, sql_type: f"CAST(NULLIF(TRIM(CAST({column} AS TEXT)), '') AS {sql_type})"
+    else:
+        text_type, float_type = "VARCHAR", "FLOAT"
+        number = lambda column, sql_type: f"TRY_CAST(CAST({column} AS VARCHAR) AS {sql_type})"
+    features = ",\n            ".join(
+        f"{number(column, float_type)} AS {name}" for name, column in feature_columns.items()
+    )
+    return f"""
+        SELECT
+            CAST(t.id AS {text_type}) AS track_id,
+            CAST(t.name AS {text_type}) AS track_name,
+            CAST(a.name AS {text_type}) AS artist_name,
+            COALESCE({number('t.popularity', 'INT')}, -1) AS popularity,
+            {features}
+        FROM tracks t
+        JOIN r_track_artist rta ON t.id = rta.track_id
+        JOIN artists a ON rta.artist_id = a.id
+        JOIN audio_features af ON t.audio_feature_id = af.id
+        ORDER BY popularity DESC, track_id, artist_name
+    """
+
+
+def build_artifact(db_file: str, output: str) -> dict:
+    """
+    Writes the feature artifact of a catalog.
+
+    Columns are streamed to temporary files chunk by chunk and then
+    concatenated, so the builder never holds the whole catalog's
+    strings in memory. The output is replaced atomically.
+
+    Args:
+        db_file: Catalog database (the Kaggle SQLite file or DuckDB)
+        output: Artifact file to write
+
+    Returns:
+        The artifact header
+    """
+    from data_spotify.database_service import FEATURE_COLUMNS
+
+    start = time.perf_counter()
+    workdir = tempfile.mkdtemp(prefix="feature-artifact-", dir=os.path.dirname(os.path.abspath(output)))
+    parts = {name: open(os.path.join(workdir, name), "wb") for name in (
+        list(FEATURE_DTYPES) + ["popularity"]
+        + [f"{text}_offsets" for text in TEXT_COLUMNS]
+        + [f"{text}_data" for text in TEXT_COLUMNS]
+    )}
+    text_sizes = {text: 0 for text in TEXT_COLUMNS}
+    for text in TEXT_COLUMNS:
+        parts[f"{text}_offsets"].write(np.zeros(1, dtype="<u8").tobytes())
+    id_chunks = []
+    rows = 0
+
+    try:
+        chunks = stream_catalog_rows(
+            db_file, lambda dialect: _build_query(FEATURE_COLUMNS, dialect), BUILD_CHUNK_ROWS
+        )
+        for chunk in chunks:
+            columns = list(zip(*chunk))
+            track_ids, track_names, artist_names, popularity = columns[:4]
+
+            for text, values in zip(TEXT_COLUMNS, (track_ids, track_names, artist_names)):
+                encoded = [(value or "").encode() for value in values]
+                lengths = np.fromiter((len(value) for value in encoded), dtype="<u8", count=len(encoded))
+                offsets = text_sizes[text] + np.cumsum(lengths)
+                parts[f"{text}_offsets"].write(offsets.tobytes())
+                parts[f"{text}_data"].write(b"".join(encoded))
+                text_sizes[text] = int(offsets[-1])
+
+            parts["popularity"].write(np.clip(np.array(popularity, dtype=np.int16), -1, 127).astype("i1").tobytes())
+            for (name, dtype), values in zip(FEATURE_DTYPES.items(), columns[4:]):
+                array = np.array([np.nan if value is None else value for value in values], dtype=np.float32)
+                parts[name].write(array.astype(dtype).tobytes())
+
+            id_chunks.append(np.array([(value or "").encode() for value in track_ids], dtype="S"))
+            rows += len(chunk)
+            print(f"--- Feature artifact: {rows} rows read ---")
+    finally:
+        for part in parts.values():
+            part.close()
+
+    # Sorted track IDs for binary-search lookups by ID
+    ids = np.concatenate(id_chunks) if id_chunks else np.array([], dtype="S1")
+    id_rows = np.argsort(ids, kind="stable").astype("<u4")
+    ids_sorted = ids[id_rows]
+    ids_sorted.tofile(os.path.join(workdir, "track_id_sorted"))
+    id_rows.tofile(os.path.join(workdir, "track_id_rows"))
+
+    column_types = dict(FEATURE_DTYPES)
+    column_types["popularity"] = "i1"
+    for text in TEXT_COLUMNS:
+        column_types[f"{text}_offsets"] = "<u8"
+        column_types[f"{text}_data"] = "u1"
+    column_types["track_id_sorted"] = ids_sorted.dtype.str
+    column_types["track_id_rows"] = "<u4"
+
+    # Column offsets are relative to the end of the (padded) header
+    column_meta = {}
+    position = 0
+    for name, dtype in column_types.items():
+        size = os.path.getsize(os.path.join(workdir, name))
+        column_meta[name] = {"dtype": dtype, "offset": position, "bytes": size}
+        position += -(-size // ALIGNMENT) * ALIGNMENT
+
+    header = {
+        "rows": rows,
+        "columns": column_meta,
+        "source": source_signature(db_file),
+        "built_at": time.time(),
+    }
+    header_bytes = json.dumps(header).encode()
+    prefix_size = len(MAGIC) + 8 + len(header_bytes)
+    header_bytes += b" " * (-prefix_size % ALIGNMENT)
+
+    tmp_output = os.path.join(workdir, "artifact.bin")
+    with open(tmp_output, "wb") as out:
+        out.write(MAGIC + struct.pack("<II", FORMAT_VERSION, len(header_bytes)) + header_bytes)
+        for name, meta in column_meta.items():
+            with open(os.path.join(workdir, name), "rb") as part:
+                shutil.copyfileobj(part, out, 16 * 1024 * 1024)
+            out.write(b"\0" * (-meta["bytes"] % ALIGNMENT))
+    os.replace(tmp_output, output)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"--- Feature artifact: {rows} rows, {os.path.getsize(output) / 1e6:.1f} MB "
+          f"written to {output} in {time.perf_counter() - start:.1f}s ---")
+    return header
+
+
+class FeatureArtifact:
+    """Read-only, memory-mapped view of a feature artifact."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            prefix = f.read(len(MAGIC) + 8)
+            if prefix[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a feature artifact")
+            version, header_size = struct.unpack("<II", prefix[len(MAGIC):])
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported feature artifact version {version}")
+            self.header = json.loads(f.read(header_size))
+        self.rows = self.header["rows"]
+
+        # One shared mapping; every column is a zero-copy view into it
+        self._map = np.memmap(path, dtype="u1", mode="r")
+        base = len(prefix) + header_size
+        self.columns = {}
+        for name, meta in self.header["columns"].items():
+            start = base + meta["offset"]
+            self.columns[name] = self._map[start:start + meta["bytes"]].view(meta["dtype"])
+
+    def matches_source(self, db_file: str) -> bool:
+        """Whether the artifact was built from the current catalog file."""
+        current = source_signature(db_file)
+        return current is None or current == self.header.get("source")
+
+    def text(self, column: str, row: int) -> str:
+        offsets = self.columns[f"{column}_offsets"]
+        return bytes(self.columns[f"{column}_data"][offsets[row]:offsets[row + 1]]).decode()
+
+    def features(self, row: int) -> dict:
+        values = {name: float(self.columns[name][row]) for name in FEATURE_DTYPES}
+        return {name: None if np.isnan(value) else value for name, value in values.items()}
+
+    def _block_mask(self, mood_params: dict, rows):
+        """Rows (a slice or an index array) inside the mood ranges."""
+        size = rows.stop - rows.start if isinstance(rows, slice) else len(rows)
+        mask = np.ones(size, dtype=bool)
+        for name, value in mood_params.items():
+            if name not in FEATURE_DTYPES:
+                continue
+            column = self.columns[name][rows]
+            # Same semantics as build_feature_filters (NaN never matches)
+            if isinstance(value, dict):
+                if "min" in value:
+                    mask &= column >= value["min"]
+                if "max" in value:
+                    mask &= column <= value["max"]
+            elif isinstance(value, (int, float)):
+                mask &= column > value
+        return mask
+
+    def _block_distances(self, mood_params: dict, scales: dict, rows):
+        """Vectorized database_service.mood_distance over rows (slice or index array)."""
+        size = rows.stop - rows.start if isinstance(rows, slice) else len(rows)
+        total = np.zeros(size, dtype=np.float32)
+        for name, value in mood_params.items():
+            if name not in FEATURE_DTYPES or name not in scales:
+                continue
+            if isinstance(value, dict):
+                low = value.get("min", value.get("max"))
+                high = value.get("max", value.get("min"))
+            else:
+                low = high = value
+            column = self.columns[name][rows].astype(np.float32)
+            scale = scales[name]
+            outside = np.maximum(np.maximum(low - column, column - high), 0.0) / scale
+            off_centre = np.abs(column - (low + high) / 2) / scale
+            # A missing feature does not count, like in mood_distance
+            total += np.nan_to_num(outside ** 2 + 0.1 * off_centre ** 2)
+        return np.sqrt(total)
+
+    def scan(
+        self,
+        mood_params: dict,
+        limit: int,
+        start: int = 0,
+        stop: int = None,
+        rank_by: str = "popularity",
+        scales: dict = None,
+        candidates: np.ndarray = None
+    ) -> list:
+        """
+        Best rows of a row range (one shard of a sharded scan).
+
+        Args:
+            mood_params: Same format as database_service.search_all_songs
+            limit: Maximum number of rows
+            start, stop: Row range to scan (defaults to every row)
+            rank_by: "popularity" keeps the first rows inside the mood
+                ranges (rows are stored by popularity); "mood" ranks every
+                row by its distance to the ranges (mood_distance)
+            scales: Feature scales for "mood" (FEATURE_SCALES)
+            candidates: Sorted rows to consider (a genre posting list,
+                see genre_index.py); only those inside the range are tested
+
+        Returns:
+            List of (sort key, row), best first: the row itself for
+            "popularity", (distance, row) for "mood"
+        """
+        stop = self.rows if stop is None else min(stop, self.rows)
+        # Blocks are position ranges: rows themselves, or candidate indexes
+        if candidates is not None:
+            candidates = candidates[np.searchsorted(candidates, start):np.searchsorted(candidates, stop)]
+            first, last = 0, len(candidates)
+        else:
+            first, last = start, stop
+
+        def block_rows(block: int, block_stop: int):
+            return slice(block, block_stop) if candidates is None else candidates[block:block_stop]
+
+        def row_numbers(block: int, block_stop: int, positions: np.ndarray) -> np.ndarray:
+            return positions + block if candidates is None else candidates[block:block_stop][positions]
+
+        found = []
+        if rank_by == "popularity":
+            block, block_size = first, SCAN_FIRST_BLOCK_ROWS
+            while block < last and len(found) < limit:
+                block_stop = min(block + block_size, last)
+                positions = np.flatnonzero(self._block_mask(mood_params, block_rows(block, block_stop)))
+                found.extend(row_numbers(block, block_stop, positions[:limit - len(found)]).tolist())
+                block, block_size = block_stop, min(block_size * 2, SCAN_BLOCK_ROWS)
+            return [(row, row) for row in found]
+
+        # "mood": keep each block's best rows, then the best of those
+        distances, rows = [], []
+        for block in range(first, last, SCAN_BLOCK_ROWS):
+            block_stop = min(block + SCAN_BLOCK_ROWS, last)
+            block_distances = self._block_distances(mood_params, scales or {}, block_rows(block, block_stop))
+            best = np.argpartition(block_distances, limit)[:limit] if len(block_distances) > limit \
+                else np.arange(len(block_distances))
+            distances.append(block_distances[best])
+            rows.append(row_numbers(block, block_stop, best).astype(np.int64))
+        if not rows:
+            return []
+        distances, rows = np.concatenate(distances), np.concatenate(rows)
+        order = np.lexsort((rows, distances))[:limit]
+        return [((float(distances[i]), int(rows[i])), int(rows[i])) for i in order]
+
+    def search(
+        self,
+        mood_params: dict,
+        limit: int = 20,
+        rank_by: str = "popularity",
+        scales: dict = None
+    ) -> list:
+        """
+        Best rows of the whole catalog, in this process.
+
+        Args:
+            mood_params: Same format as database_service.search_all_songs
+            limit: Maximum number of results
+            rank_by: "popularity" or "mood" (see scan)
+            scales: Feature scales for "mood" (FEATURE_SCALES)
+
+        Returns:
+            List of dicts with track_id, track_name, artist_name and uri
+        """
+        return [self.row(row) for _, row in self.scan(mood_params, limit, rank_by=rank_by, scales=scales)]
+
+    def row(self, row: int) -> dict:
+        track_id = self.text("track_id", row)
+        return {
+            "track_id": track_id,
+            "track_name": self.text("track_name", row),
+            "artist_name": self.text("artist_name", row),
+            "uri": f"spotify:track:{track_id}",
+        }
+
+    def track_rows(self, track_id: str) -> np.ndarray:
+        """Every row of a track (one per artist), in row order."""
+        sorted_ids = self.columns["track_id_sorted"]
+        if len(track_id.encode()) > sorted_ids.dtype.itemsize:
+            return np.zeros(0, dtype=np.int64)
+        key = np.array(track_id.encode(), dtype=sorted_ids.dtype)
+        left, right = np.searchsorted(sorted_ids, key, "left"), np.searchsorted(sorted_ids, key, "right")
+        return np.sort(self.columns["track_id_rows"][left:right])
+
+    def track(self, row: int) -> dict:
+        """Like row(), for the whole track: every artist, in `artists`."""
+        song = self.row(row)
+        artists = [self.text("artist_name", other) for other in self.track_rows(song["track_id"])]
+        song["artists"] = artists or [song["artist_name"]]
+        song["artist_name"] = ", ".join(song["artists"])
+        return song
+
+    def rows_for_track_ids(self, track_ids: list) -> dict:
+        """Maps each known track ID to its first row (binary search)."""
+        sorted_ids = self.columns["track_id_sorted"]
+        if not track_ids or not len(sorted_ids):
+            return {}
+        # Longer IDs would be truncated to the column width and mismatch
+        track_ids = [t for t in track_ids if len(t.encode()) <= sorted_ids.dtype.itemsize]
+        keys = np.array([track_id.encode() for track_id in track_ids], dtype=sorted_ids.dtype)
+        positions = np.searchsorted(sorted_ids, keys)
+        found = {}
+        for track_id, key, position in zip(track_ids, keys, positions):
+            if position < len(sorted_ids) and sorted_ids[position] == key:
+                found[track_id] = int(self.columns["track_id_rows"][position])
+        return found
+
+    def features_by_track_ids(self, track_ids: list) -> dict:
+        """Same result as database_service.get_audio_features_by_track_ids."""
+        return {
+            track_id: self.features(row)
+            for track_id, row in self.rows_for_track_ids(track_ids).items()
+        }
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "rows": self.rows,
+            "bytes": int(self._map.size),
+            "source": self.header.get("source"),
+        }
+
+
+def main():
+    from data_spotify.database_service import CATALOG_ARTIFACT_FILE, DB_FILE
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--db", default=DB_FILE, help="Catalog database file")
+    parser.add_argument("--output", default=CATALOG_ARTIFACT_FILE, help="Artifact file to write")
+    args = parser.parse_args()
+    build_artifact(args.db, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Genre inverted index of the catalog: genre -> rows of the feature artifact.
+
+Genres belong to artists (r_artist_genre), so filtering the catalog search
+by genre in SQL means two more joins on a query that already has three.
+This index precomputes, for every genre, the sorted artifact rows of the
+tracks with an artist of that genre. A genre search intersects that
+posting list with the mood ranges by testing only those rows (see
+FeatureArtifact.scan), so a narrow genre costs a few thousand row tests
+instead of a catalog scan.
+
+Layout (little-endian, memory-mapped like the artifact):
+
+    b"VIBEGENR" | uint32 format version | uint32 header length | JSON header
+    postings     uint32 artifact rows, one sorted run per genre
+
+The header maps each genre to its (offset, count) run and records the
+artifact it was built for; an index for another artifact is rebuilt.
+Queries may name several genres ("rock, indie"); an unknown name matches
+every genre containing it ("rock" -> "indie rock", "hard rock", ...).
+The union of the runs uses pyroaring when installed, else NumPy.
+
+Build it after the artifact (publish_snapshot does both):
+    python -m data_spotify.genre_index --db data_spotify/spotify.sqlite
+"""
+import argparse
+import json
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from data_spotify.feature_artifact import stream_catalog_rows
+
+try:
+    import pyroaring
+except ImportError:  # Optional: unions fall back to a NumPy row mask
+    pyroaring = None
+
+MAGIC = b"VIBEGENR"
+FORMAT_VERSION = 1
+
+# (genre, track) pairs fetched from the catalog per chunk while building
+BUILD_CHUNK_ROWS = 500_000
+
+# Resolved genre queries kept per process
+QUERY_CACHE_SIZE = 256
+
+
+def normalize_genre(name: str) -> str:
+    return re.sub(r"\s+", " ", (name or "").strip().lower())
+
+
+def resolve_genres(names, query: str) -> list:
+    """
+    Genres a query refers to.
+
+    Args:
+        names: Known genre names (normalized)
+        query: One or more comma-separated genres
+    Returns:
+        Sorted matching names: exact matches, or every name containing
+        a term that matches nothing exactly
+    """
+    matched = set()
+    for term in (normalize_genre(part) for part in (query or "").split(",")):
+        if not term:
+            continue
+        if term in names:
+            matched.add(term)
+        else:
+            matched.update(name for name in names if term in name)
+    return sorted(matched)
+
+
+def _artifact_signature(artifact) -> dict:
+    return {"rows": artifact.rows, "built_at": artifact.header.get("built_at")}
+
+
+def _track_rows(artifact, track_ids: list) -> tuple:
+    """
+    Artifact rows of each track ID (every artist row of the track).
+
+    Returns:
+        (rows, counts): the rows, and how many belong to each track ID
+    """
+    sorted_ids = artifact.columns["track_id_sorted"]
+    keys = np.array(
+        [track_id.encode() if len(track_id.encode()) <= sorted_ids.dtype.itemsize else b""
+         for track_id in track_ids],
+        dtype=sorted_ids.dtype
+    )
+    left = np.searchsorted(sorted_ids, keys, side="left")
+    right = np.searchsorted(sorted_ids, keys, side="right")
+    counts = right - left
+    counts[keys == b""] = 0
+    total = int(counts.sum())
+    # Concatenation of every [left, right) range, vectorized
+    positions = np.repeat(left - (np.cumsum(counts) - counts), counts) + np.arange(total)
+    return artifact.columns["track_id_rows"][positions], counts
+
+
+def _pairs_query(dialect: str) -> str:
+    """Distinct (genre, track ID) pairs, ordered by normalized genre."""
+    if dialect == "sqlite":
+        # SQLite's lower() only folds ASCII: order by the Python
+        # normalization itself, so that each genre is one run
+        genre, text_type = "normalize_genre(rag.genre_id)", "TEXT"
+    else:
+        genre, text_type = "lower(trim(CAST(rag.genre_id AS VARCHAR)))", "VARCHAR"
+    return f"""
+        SELECT DISTINCT
+            {genre} AS genre,
+            CAST(rta.track_id AS {text_type}) AS track_id
+        FROM r_artist_genre rag
+        JOIN r_track_artist rta ON rag.artist_id = rta.artist_id
+        ORDER BY genre
+    """
+
+
+def build_genre_index(db_file: str, artifact, output: str) -> dict:
+    """
+    Writes the genre index of a catalog.
+
+    Pairs are streamed ordered by genre, so only the current genre's rows
+    are held in memory; runs go to a temporary file as they complete.
+
+    Args:
+        db_file: Catalog database the artifact was built from
+        artifact: Its FeatureArtifact
+        output: Index file to write (replaced atomically)
+
+    Returns:
+        The index header
+    """
+    start = time.perf_counter()
+    directory = os.path.dirname(os.path.abspath(output))
+    postings = tempfile.NamedTemporaryFile(dir=directory, prefix=".genre-postings-", delete=False)
+    genres = {}
+    offset = 0
+    current, current_rows = None, []
+
+    def flush():
+        nonlocal offset
+        if current is None or not current_rows:
+            return
+        rows = np.unique(np.concatenate(current_rows)).astype("<u4")
+        postings.write(rows.tobytes())
+        genres[current] = [offset, len(rows)]
+        offset += len(rows)
+
+    try:
+        chunks = stream_catalog_rows(
+            db_file, _pairs_query, BUILD_CHUNK_ROWS, {"normalize_genre": normalize_genre}
+        )
+        for chunk in chunks:
+            chunk_genres, track_ids = zip(*chunk)
+            rows, counts = _track_rows(artifact, [track_id or "" for track_id in track_ids])
+            row_genres = np.repeat(np.array(chunk_genres, dtype=object), counts)
+            # The chunk is ordered by genre: split it into runs
+            boundaries = np.flatnonzero(row_genres[1:] != row_genres[:-1]) + 1
+            for run_rows, run_genres in zip(np.split(rows, boundaries), np.split(row_genres, boundaries)):
+                if not len(run_rows):
+                    continue
+                genre = normalize_genre(run_genres[0])
+                if genre != current:
+                    flush()
+                    current, current_rows = genre, []
+                current_rows.append(run_rows)
+        flush()
+    finally:
+        postings.close()
+
+    header = {
+        "genres": genres,
+        "artifact": _artifact_signature(artifact),
+        "built_at": time.time(),
+    }
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b" " * (-(len(MAGIC) + 8 + len(header_bytes)) % 4)
+
+    tmp_output = output + f".tmp-{os.getpid()}"
+    try:
+        with open(tmp_output, "wb") as out, open(postings.name, "rb") as part:
+            out.write(MAGIC + struct.pack("<II", FORMAT_VERSION, len(header_bytes)) + header_bytes)
+            while True:
+                block = part.read(16 * 1024 * 1024)
+                if not block:
+                    break
+                out.write(block)
+        os.replace(tmp_output, output)
+    finally:
+        os.unlink(postings.name)
+        if os.path.exists(tmp_output):
+            os.unlink(tmp_output)
+
+    print(f"--- Genre index: {len(genres)} genres, {offset} postings written to {output} "
+          f"in {time.perf_counter() - start:.1f}s ---")
+    return header
+
+
+class GenreIndex:
+    """Read-only, memory-mapped view of a genre index."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            prefix = f.read(len(MAGIC) + 8)
+            if prefix[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a genre index")
+            version, header_size = struct.unpack("<II", prefix[len(MAGIC):])
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported genre index version {version}")
+            self.header = json.loads(f.read(header_size))
+        self.genres = self.header["genres"]
+        self.postings = np.memmap(path, dtype="<u4", mode="r", offset=len(prefix) + header_size) \
+            if sum(count for _, count in self.genres.values()) else np.zeros(0, dtype="<u4")
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def matches_artifact(self, artifact) -> bool:
+        """Whether the index was built for this artifact."""
+        return self.header.get("artifact") == _artifact_signature(artifact)
+
+    def posting(self, genre: str) -> np.ndarray:
+        offset, count = self.genres[genre]
+        return self.postings[offset:offset + count]
+
+    def resolve(self, query: str) -> list:
+        return resolve_genres(self.genres, query)
+
+    def rows(self, query: str, rows: int) -> np.ndarray | None:
+        """
+        Sorted artifact rows of the tracks in the queried genres.
+
+        Args:
+            query: One or more comma-separated genres
+            rows: Rows of the artifact (size of the NumPy fallback mask)
+
+        Returns:
+            uint32 array (best-popularity rows first), or None when the
+            query names no known genre
+        """
+        key = normalize_genre(query)
+        with self._lock:
+            if key in self._queries:
+                self._queries.move_to_end(key)
+                return self._queries[key]
+
+        genres = self.resolve(query)
+        if not genres:
+            result = None
+        elif len(genres) == 1:
+            result = self.posting(genres[0])
+        elif pyroaring is not None:
+            union = pyroaring.BitMap.union(*(pyroaring.BitMap(self.posting(g)) for g in genres))
+            result = np.frombuffer(union.to_array(), dtype=np.uint32)
+        else:
+            mask = np.zeros(rows, dtype=bool)
+            for genre in genres:
+                mask[self.posting(genre)] = True
+            result = np.flatnonzero(mask).astype(np.uint32)
+
+        with self._lock:
+            self._queries[key] = result
+            while len(self._queries) > QUERY_CACHE_SIZE:
+                self._queries.popitem(last=False)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "genres": len(self.genres),
+            "postings": int(len(self.postings)),
+            "bitmap_unions": pyroaring is not None,
+            "cached_queries": len(self._queries),
+        }
+
+
+def main():
+    from data_spotify.database_service import CATALOG_ARTIFACT_FILE, DB_FILE
+    from data_spotify.feature_artifact import FeatureArtifact
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--db", default=DB_FILE, help="Catalog database file")
+    parser.add_argument("--artifact", default=CATALOG_ARTIFACT_FILE,
+                        help="Feature artifact built from --db")
+    parser.add_argument("--output", help="Index file (default: genre_index.bin next to the artifact)")
+    args = parser.parse_args()
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(args.artifact)), "genre_index.bin")
+    build_genre_index(args.db, FeatureArtifact(args.artifact), output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+"""
+Persistent store of every user's library (saved tracks and playlist
+tracks) with their audio features.
+
+This is a read-write DuckDB file, separate from the read-only catalog.
+All users share one table, user_tracks. It is keyed and clustered by
+user_id (the leading primary key column), so each user's rows form one
+partition. This avoids creating one table per user.
+
+Sync state (the latest saved-track added_at cursor, playlist snapshot
+IDs) lives in user_sync_state so library syncs only fetch what changed.
+
+vibe_sessions keeps each user's last playlist request (mood target,
+queued URIs, processed profile) so follow-ups survive restarts.
+"""
+import json
+import os
+import threading
+import time
+
+import duckdb
+import pandas as pd
+
+from tracing import span
+
+from data_spotify.database_service import (
+    FEATURE_COLUMNS,
+    FEATURE_SCALES,
+    build_feature_filters,
+    get_audio_features_by_track_ids
+)
+
+USER_DB_FILE = os.getenv(
+    "USER_LIBRARY_DB_FILE",
+    os.path.join(os.path.dirname(__file__), "user_dbs", "user_library.duckdb")
+)
+
+# DuckDB allows one writer process per file; other workers retry briefly
+LOCK_RETRIES = 20
+LOCK_RETRY_DELAY_SECONDS = 0.05
+
+# Typed feature columns of user_tracks (same names as the catalog features)
+STORE_FEATURE_COLUMNS = {name: f"ut.{name}" for name in FEATURE_COLUMNS}
+
+_SCHEMA = [
+    f"""
+    CREATE TABLE IF NOT EXISTS user_tracks (
+        user_id VARCHAR NOT NULL,
+        source VARCHAR NOT NULL,
+        track_id VARCHAR NOT NULL,
+        uri VARCHAR NOT NULL,
+        name VARCHAR,
+        artist VARCHAR,
+        added_at TIMESTAMP,
+        {", ".join(f"{name} FLOAT" for name in FEATURE_COLUMNS)},
+        PRIMARY KEY (user_id, source, track_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_sync_state (
+        user_id VARCHAR NOT NULL,
+        source VARCHAR NOT NULL,
+        cursor TIMESTAMP,
+        snapshot_id VARCHAR,
+        synced_at TIMESTAMP,
+        skipped INTEGER,
+        PRIMARY KEY (user_id, source)
+    )
+    """,
+    # Stores created before the column existed
+    "ALTER TABLE user_sync_state ADD COLUMN IF NOT EXISTS skipped INTEGER",
+    """
+    CREATE TABLE IF NOT EXISTS vibe_sessions (
+        user_id VARCHAR PRIMARY KEY,
+        message VARCHAR,
+        mood_params VARCHAR,
+        queued_uris VARCHAR,
+        user_profile VARCHAR,
+        profile_fetched_at DOUBLE,
+        updated_at DOUBLE
+    )
+    """,
+]
+
+# JSON-encoded columns of vibe_sessions
+_SESSION_JSON_COLUMNS = ("mood_params", "queued_uris", "user_profile")
+_SESSION_COLUMNS = (
+    "user_id", "message", "mood_params", "queued_uris",
+    "user_profile", "profile_fetched_at", "updated_at",
+)
+
+_local_lock = threading.Lock()
+_schema_ready = False
+
+
+def to_timestamp(value):
+    """Converts a Spotify added_at value to a naive UTC datetime (or None)."""
+    if value is None or value == "":
+        return None
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return timestamp.to_pydatetime()
+
+
+def get_store_connection():
+    """
+    Opens a read-write connection to the user library store.
+
+    Creates the file and schema on first use and retries while another
+    worker process holds the write lock.
+    """
+    global _schema_ready
+    os.makedirs(os.path.dirname(USER_DB_FILE), exist_ok=True)
+
+    for attempt in range(LOCK_RETRIES):
+        try:
+            conn = duckdb.connect(database=USER_DB_FILE, read_only=False)
+            break
+        except duckdb.IOException:
+            if attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(LOCK_RETRY_DELAY_SECONDS)
+
+    if not _schema_ready:
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        _schema_ready = True
+    return conn
+
+
+def upsert_user_tracks(
+    user_id: str,
+    source: str,
+    songs: list,
+    replace: bool = False
+) -> int:
+    """
+    Inserts or updates library tracks for one user and source.
+
+    Audio features are looked up in the catalog once, at write time, so
+    searches never have to join against the 8M-row catalog.
+
+    Args:
+        user_id: Spotify user ID
+        source: 'saved' or 'playlist:<playlist_id>'
+        songs: List of dicts with uri, name, artist and optional added_at
+        replace: Delete the source's existing rows first (full resync)
+
+    Returns:
+        Number of rows written
+    """
+    songs = [song for song in songs if song.get("uri")]
+    track_ids = [song["uri"].split(":")[-1] for song in songs]
+    features = get_audio_features_by_track_ids(track_ids)
+
+    rows = []
+    for song, track_id in zip(songs, track_ids):
+        track_features = features.get(track_id) or {}
+        rows.append({
+            "user_id": user_id,
+            "source": source,
+            "track_id": track_id,
+            "uri": song["uri"],
+            "name": song.get("name"),
+            "artist": song.get("artist"),
+            "added_at": to_timestamp(song.get("added_at")),
+            **{name: track_features.get(name) for name in FEATURE_COLUMNS},
+        })
+    incoming = pd.DataFrame(
+        rows,
+        columns=["user_id", "source", "track_id", "uri", "name", "artist",
+                 "added_at", *FEATURE_COLUMNS]
+    ).drop_duplicates(subset=["track_id"], keep="first")
+
+    with _local_lock:
+        conn = get_store_connection()
+        try:
+            conn.execute("BEGIN TRANSACTION")
+            if replace:
+                conn.execute(
+                    "DELETE FROM user_tracks WHERE user_id = ? AND source = ?",
+                    [user_id, source]
+                )
+            if len(incoming):
+                conn.register("incoming", incoming)
+                conn.execute(
+                    "INSERT OR REPLACE INTO user_tracks "
+                    "SELECT * FROM incoming"
+                )
+                conn.unregister("incoming")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    return len(incoming)
+
+
+def get_sync_state(user_id: str) -> dict:
+    """
+    Returns the sync state of every source of a user.
+
+    Args:
+        user_id: Spotify user ID
+
+    Returns:
+        dict mapping source -> {"cursor", "snapshot_id", "synced_at", "skipped"}
+    """
+    with _local_lock:
+        conn = get_store_connection()
+        try:
+            rows = conn.execute(
+                "SELECT source, cursor, snapshot_id, synced_at, skipped "
+                "FROM user_sync_state WHERE user_id = ?",
+                [user_id]
+            ).fetchall()
+        finally:
+            conn.close()
+    return {
+        source: {
+            "cursor": cursor, "snapshot_id": snapshot_id,
+            "synced_at": synced_at, "skipped": skipped,
+        }
+        for source, cursor, snapshot_id, synced_at, skipped in rows
+    }
+
+
+def set_sync_state(
+    user_id: str,
+    source: str,
+    cursor=None,
+    snapshot_id: str = None,
+    skipped: int = None
+):
+    """
+    Records the sync position of one source.
+
+    Args:
+        user_id: Spotify user ID
+        source: 'saved' or 'playlist:<playlist_id>'
+        cursor: Latest Spotify added_at seen (ISO string or datetime)
+        snapshot_id: Playlist snapshot_id at sync time
+        skipped: Spotify items of the source that are not stored
+                 (unavailable tracks, local files, episodes, duplicates)
+    """
+    cursor = to_timestamp(cursor)
+    with _local_lock:
+        conn = get_store_connection()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO user_sync_state "
+                "(user_id, source, cursor, snapshot_id, synced_at, skipped) "
+                "VALUES (?, ?, ?, ?, now(), ?)",
+                [user_id, source, cursor, snapshot_id, skipped]
+            )
+        finally:
+            conn.close()
+
+
+def delete_user_sources(user_id: str, sources: list):
+    """
+    Removes the tracks and sync state of sources that no longer exist
+    (e.g. playlists the user deleted or unfollowed).
+
+    Args:
+        user_id: Spotify user ID
+        sources: Sources to remove
+    """
+    if not sources:
+        return
+    placeholders = ", ".join("?" for _ in sources)
+    with _local_lock:
+        conn = get_store_connection()
+        try:
+            for table in ("user_tracks", "user_sync_state"):
+                conn.execute(
+                    f"DELETE FROM {table} WHERE user_id = ? "
+                    f"AND source IN ({placeholders})",
+                    [user_id, *sources]
+                )
+        finally:
+            conn.close()
+
+
+def count_user_tracks(user_id: str, source: str = None) -> int:
+    """Counts stored tracks of a user, optionally for one source."""
+    query = "SELECT count(*) FROM user_tracks WHERE user_id = ?"
+    params = [user_id]
+    if source:
+        query += " AND source = ?"
+        params.append(source)
+    with _local_lock:
+        conn = get_store_connection()
+        try:
+            return conn.execute(query, params).fetchone()[0]
+        finally:
+            conn.close()
+
+
+def search_user_tracks(user_id: str, mood_params: dict, limit: int = 10) -> list:
+    """
+    Searches a user's library by audio feature ranges.
+
+    Uses the same range filters as the catalog search and orders by
+    distance to the centre of the requested ranges. A track present in
+    several sources (liked and in a playlist) is returned once.
+
+    Args:
+        user_id: Spotify user ID
+        mood_params: Same format as database_service.search_all_songs
+        limit: Maximum number of results
+
+    Returns:
+        List of dicts with track_name, artist_name, uri and mood_distance
+    """
+    where_clauses, params = build_feature_filters(
+        mood_params,
+        columns=STORE_FEATURE_COLUMNS,
+        untyped=False
+    )
+
+    distance_terms = []
+    distance_params = []
+    for name, value in mood_params.items():
+        if isinstance(value, dict) and name in STORE_FEATURE_COLUMNS:
+            low = value.get("min", value.get("max"))
+            high = value.get("max", value.get("min"))
+            distance_terms.append(f"power((ut.{name} - ?) / ?, 2)")
+            distance_params.extend([(low + high) / 2, FEATURE_SCALES[name]])
+    distance_sql = (
+        f"sqrt({' + '.join(distance_terms)})" if distance_terms else "0"
+    )
+
+    query = f"""
+        SELECT
+            ut.name as track_name,
+            ut.artist as artist_name,
+            ut.uri as uri,
+            min({distance_sql}) as mood_distance
+        FROM user_tracks ut
+        WHERE ut.user_id = ? AND ut.energy IS NOT NULL
+        {"".join(" AND " + clause for clause in where_clauses)}
+        GROUP BY ut.uri, ut.name, ut.artist
+        ORDER BY mood_distance, max(ut.added_at) DESC NULLS LAST
+        LIMIT {int(limit)}
+    """
+
+    try:
+        with _local_lock:
+            conn = get_store_connection()
+            try:
+                with span("db_query", query="search_user_tracks") as query_span:
+                    results = conn.execute(
+                        query,
+                        distance_params + [user_id] + params
+                    ).fetchdf()
+                    query_span.set(rows=len(results))
+            finally:
+                conn.close()
+        return results.to_dict('records')
+    except Exception as e:
+        print(f"Error searching user library: {e}")
+        return []
+
+
+def get_vibe_session(user_id: str) -> dict | None:
+    """
+    Loads a user's stored vibe session.
+
+    Args:
+        user_id: Spotify user ID
+
+    Returns:
+        dict with message, mood_params, queued_uris, user_profile,
+        profile_fetched_at and updated_at, or None
+    """
+    with _local_lock:
+        conn = get_store_connection()
+        try:
+            row = conn.execute(
+                f"SELECT {', '.join(_SESSION_COLUMNS)} FROM vibe_sessions WHERE user_id = ?",
+                [user_id]
+            ).fetchone()
+        finally:
+            conn.close()
+    if row is None:
+        return None
+    session = dict(zip(_SESSION_COLUMNS, row))
+    for column in _SESSION_JSON_COLUMNS:
+        session[column] = json.loads(session[column]) if session[column] else None
+    return session
+
+
+def save_vibe_session(session: dict, max_uris: int = None) -> dict:
+    """
+    Stores a user's vibe session, merged with the stored row.
+
+    The read and the write run in one transaction on one connection, so
+    concurrent requests of the same user (possibly in other worker
+    processes) cannot drop each other's queued URIs: queued_uris is the
+    union of the stored and the new URIs, in queue order. A None
+    user_profile keeps the stored profile and its profile_fetched_at.
+
+    Args:
+        session: dict with the vibe_sessions columns (user_id required)
+        max_uris: Most recent queued URIs to keep (None keeps all)
+
+    Returns:
+        The session as stored
+    """
+    session = dict(session)
+    with _local_lock:
+        conn = get_store_connection()
+        try:
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                row = conn.execute(
+                    "SELECT queued_uris, user_profile, profile_fetched_at "
+                    "FROM vibe_sessions WHERE user_id = ?",
+                    [session["user_id"]]
+                ).fetchone()
+                if row is not None:
+                    stored_uris = json.loads(row[0]) if row[0] else []
+                    session["queued_uris"] = list(dict.fromkeys(
+                        stored_uris + list(session.get("queued_uris") or [])
+                    ))
+                    if session.get("user_profile") is None and row[1]:
+                        session["user_profile"] = json.loads(row[1])
+                        session["profile_fetched_at"] = row[2]
+                if max_uris is not None:
+                    session["queued_uris"] = list(session.get("queued_uris") or [])[-max_uris:]
+
+                values = [
+                    json.dumps(session.get(column)) if column in _SESSION_JSON_COLUMNS
+                    else session.get(column)
+                    for column in _SESSION_COLUMNS
+                ]
+                conn.execute(
+                    f"INSERT OR REPLACE INTO vibe_sessions VALUES ({', '.join('?' for _ in values)})",
+                    values
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+    return session
@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from tracing import metrics
+
+logger = logging.getLogger(__name__)
+
+# Event-loop diagnostics: scheduling lag and blocking-call detection.
+#
+# Several handlers (routers/spotify.py, /chat) and ADK tools do blocking
+# I/O (spotipy, DuckDB) inside async code. While one of them runs, every
+# other request on the worker waits. Two tools make that visible:
+#
+# - The lag monitor is a task that sleeps LOOP_LAG_INTERVAL_SECONDS and
+#   records how late it wakes up (vibe_event_loop_lag_seconds). Lag is
+#   the time the loop was busy with something else when it should have
+#   run the task.
+#
+# - The blocking detector (LOOP_BLOCK_DEBUG=1) is a watchdog thread. When
+#   the monitor task has not run for LOOP_BLOCK_THRESHOLD_MS, it captures
+#   the loop thread's stack, so the code holding the loop is caught in the
+#   act (sampling until the loop resumes). The block is recorded with its
+#   duration, the handler (outermost frame in this codebase) and the
+#   blocking site (innermost frame in this codebase, e.g. an ADK tool or a
+#   database call) seen in most samples, as
+#   vibe_event_loop_blocks_total{handler,site}.
+#
+# Both are exposed in /metrics and GET /admin/event_loop (behind
+# ADMIN_TOKEN, see routers/admin.py). Capturing stacks costs a little
+# CPU, so the detector is off by default.
+
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.05"))
+LOOP_BLOCK_DEBUG = os.getenv("LOOP_BLOCK_DEBUG", "").lower() in ("1", "true", "yes")
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+
+# Lag samples kept for percentiles (about a minute at the default interval)
+LAG_SAMPLES = 1200
+
+# Blocking events kept for the admin endpoint
+RECENT_BLOCKS = 50
+
+# Frames from these files are part of this codebase
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_EXCLUDED_PARTS = ("site-packages", os.sep + "benchmarks" + os.sep)
+
+metrics.describe(
+    "vibe_event_loop_lag_seconds", "histogram",
+    "Delay between when the event loop should have run a task and when it did"
+)
+metrics.describe(
+    "vibe_event_loop_blocks_total", "counter",
+    "Times the event loop was held longer than the blocking threshold"
+)
+metrics.describe(
+    "vibe_event_loop_block_seconds", "histogram",
+    "Duration of detected event-loop blocks"
+)
+
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def _is_app_frame(filename: str) -> bool:
+    return (
+        filename.startswith(_BACKEND_DIR)
+        and not any(part in filename for part in _EXCLUDED_PARTS)
+        and filename != os.path.abspath(__file__)
+    )
+
+
+def _frame_label(frame) -> str:
+    filename = frame.f_code.co_filename[len(_BACKEND_DIR):]
+    return f"{filename}:{frame.f_code.co_name}"
+
+
+def capture_stack(thread_id: int) -> tuple:
+    """
+    Captures a thread's current stack.
+
+    Returns:
+        (stack lines outermost first, list of app frame labels outermost
+        first)
+    """
+    frame = sys._current_frames().get(thread_id)
+    stack, app_frames = [], []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_filename}:{frame.f_lineno} in {code.co_name}")
+        if _is_app_frame(code.co_filename):
+            app_frames.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    app_frames.reverse()
+    return stack, app_frames
+
+
+class LoopMonitor:
+    """Lag monitor task plus the optional blocking-detector thread."""
+
+    def __init__(
+        self,
+        interval: float = LOOP_LAG_INTERVAL_SECONDS,
+        block_debug: bool = LOOP_BLOCK_DEBUG,
+        block_threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS
+    ):
+        self.interval = interval
+        self.block_debug = block_debug
+        self.block_threshold = block_threshold_ms / 1000
+        self.lags = deque(maxlen=LAG_SAMPLES)
+        self.max_lag = 0.0
+        self.blocks = deque(maxlen=RECENT_BLOCKS)
+        self.block_counts = Counter()
+        self._lock = threading.Lock()
+        self._expected_wake = None
+        self._loop_thread_id = None
+        self._task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Starts monitoring the running event loop."""
+        if self._task is not None:
+            return
+        self._stopped.clear()
+        self._loop_thread_id = threading.get_ident()
+        self._expected_wake = time.perf_counter() + self.interval
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        if self.block_debug:
+            self._watchdog = threading.Thread(
+                target=self._watch, name="loop-block-watchdog", daemon=True
+            )
+            self._watchdog.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _run(self):
+        while True:
+            self._expected_wake = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - self._expected_wake, 0.0)
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            metrics.observe("vibe_event_loop_lag_seconds", lag)
+
+    def _watch(self):
+        """Watchdog thread: catches the loop thread while it is blocked."""
+        poll = max(self.block_threshold / 4, 0.005)
+        while not self._stopped.wait(poll):
+            expected_wake = self._expected_wake
+            if time.perf_counter() - expected_wake < self.block_threshold:
+                continue
+
+            # Sample the stack until the loop runs the monitor task again;
+            # a long block may span several calls, the most sampled one
+            # is reported
+            samples = []
+            while self._expected_wake == expected_wake:
+                samples.append(capture_stack(self._loop_thread_id))
+                if self._stopped.wait(poll):
+                    return
+            duration = time.perf_counter() - expected_wake
+            self._record_block(duration, samples)
+
+    def _record_block(self, duration: float, samples: list):
+        sites = Counter(app_frames[-1] if app_frames else "unknown" for _, app_frames in samples)
+        site = sites.most_common(1)[0][0]
+        stack, app_frames = next(
+            (stack, app_frames) for stack, app_frames in samples
+            if (app_frames[-1] if app_frames else "unknown") == site
+        )
+        handler = app_frames[0] if app_frames else "unknown"
+        with self._lock:
+            self.block_counts[(handler, site)] += 1
+            self.blocks.append({
+                "at": time.time(),
+                "duration_ms": round(duration * 1000, 1),
+                "handler": handler,
+                "site": site,
+                "samples_by_site": dict(sites),
+                "app_frames": app_frames,
+                "stack": stack[-40:],
+            })
+        metrics.inc("vibe_event_loop_blocks_total", handler=handler, site=site)
+        metrics.observe("vibe_event_loop_block_seconds", duration)
+        logger.debug("Event loop blocked %.0fms by %s (in %s)", duration * 1000, site, handler)
+
+    def stats(self, include_stacks: bool = False) -> dict:
+        """
+        Lag percentiles and recent blocks.
+
+        Args:
+            include_stacks: Keep each block's full stack (file paths and
+                            line numbers); the frame labels are always kept
+        """
+        lags = list(self.lags)
+        with self._lock:
+            block_counts = self.block_counts.most_common()
+            blocks = list(self.blocks)[::-1]
+        if not include_stacks:
+            blocks = [
+                {key: value for key, value in block.items() if key != "stack"}
+                for block in blocks
+            ]
+        return {
+            "lag": {
+                "interval_ms": self.interval * 1000,
+                "samples": len(lags),
+                "p50_ms": round(_percentile(lags, 50) * 1000, 2),
+                "p95_ms": round(_percentile(lags, 95) * 1000, 2),
+                "p99_ms": round(_percentile(lags, 99) * 1000, 2),
+                "max_ms": round(self.max_lag * 1000, 2),
+            },
+            "blocking": {
+                "enabled": self.block_debug,
+                "threshold_ms": self.block_threshold * 1000,
+                "total": sum(count for _, count in block_counts),
+                "by_site": [
+                    {"handler": handler, "site": site, "count": count}
+                    for (handler, site), count in block_counts
+                ],
+                "recent": blocks,
+            },
+        }
+
+
+# Shared monitor, started with the app (see main.py)
+loop_monitor = LoopMonitor()
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from tracing import metrics
+
+# Conditional GET (ETag / If-None-Match) for the read endpoints that the
+# frontend refreshes often (/spotify/user_playlists, /spotify/queue,
+# /spotify/user_context).
+#
+# A response body is serialized once and stored with its ETag (a hash of
+# the body) for a short, per-endpoint TTL, keyed by access token, endpoint
+# and projection. While the entry is fresh, repeated reads neither call
+# Spotify nor serialize anything, and a client that sends the ETag back
+# in If-None-Match gets an empty 304. When the entry expired, Spotify is
+# called again. If the content is unchanged, the ETag is the same, so the
+# client still gets a 304.
+#
+# Endpoints whose data the user changes through this API (queue, player
+# controls, new playlists) are invalidated explicitly (see
+# routers/spotify.py). ETags are weak because the gzip middleware
+# re-encodes bodies.
+
+USER_PLAYLISTS_TTL_SECONDS = float(os.getenv("USER_PLAYLISTS_CACHE_SECONDS", "60"))
+QUEUE_TTL_SECONDS = float(os.getenv("QUEUE_CACHE_SECONDS", "5"))
+USER_CONTEXT_TTL_SECONDS = float(os.getenv("USER_CONTEXT_CACHE_SECONDS", "300"))
+
+MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+
+# Browsers must revalidate every time, but may use the ETag to do it
+CACHE_CONTROL = "private, no-cache"
+
+metrics.describe(
+    "vibe_conditional_requests_total", "counter",
+    "Cacheable read requests, by endpoint and result (not_modified, hit, miss)"
+)
+
+
+def compute_etag(body: bytes) -> str:
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison of an ETag with the request's If-None-Match."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+class ResponseCache:
+    """Serialized response bodies with ETags, TTLs and LRU eviction."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> tuple | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: tuple, etag: str, body: bytes, ttl: float):
+        with self._lock:
+            self._entries[key] = (etag, body, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token_info: dict, *endpoints: str):
+        """Drops a user's cached bodies of the given endpoints."""
+        access_token = (token_info or {}).get("access_token")
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == access_token and k[1] in endpoints]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries}
+
+
+def cached_read(
+    request: Request,
+    token_info: dict,
+    endpoint: str,
+    fetch,
+    ttl: float,
+    variant: str = None
+) -> Response:
+    """
+    Serves a read endpoint with ETag / 304 support and a body cache.
+
+    Args:
+        request: Incoming request (If-None-Match)
+        token_info: Token of the user (cache key)
+        endpoint: Endpoint name (cache key, metrics label)
+        fetch: Function returning the response data (may call Spotify)
+        ttl: Seconds the serialized body may be reused
+        variant: Anything else the body depends on (e.g. ?fields=)
+
+    Returns:
+        304, the cached body, or the freshly fetched body. Errors are
+        returned uncached and without an ETag.
+    """
+    key = (token_info["access_token"], endpoint, variant)
+    entry = response_cache.get(key)
+    if entry is None:
+        data = fetch()
+        if isinstance(data, dict) and "error" in data:
+            return JSONResponse(data)
+        body = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+        etag = compute_etag(body)
+        response_cache.set(key, etag, body, ttl)
+        result = "miss"
+    else:
+        etag, body, _ = entry
+        result = "hit"
+
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request, etag):
+        metrics.inc("vibe_conditional_requests_total", endpoint=endpoint, result="not_modified")
+        return Response(status_code=304, headers=headers)
+    metrics.inc("vibe_conditional_requests_total", endpoint=endpoint, result=result)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Shared body cache of the cacheable read endpoints
+response_cache = ResponseCache()
@@ -1,21 +1,48 @@
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
+import asyncio
 import json
 
 from dotenv import load_dotenv
 import os
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 import os
 
+# Load .env before importing modules that read configuration at import time
+load_dotenv()
+
 # Import the new router
-from routers import spotify
+from routers import admin, spotify
 from spotify_service import get_user_context, get_current_queue, get_spotify_oauth, get_access_token
-from agents.agent_manager import run_agent_with_context
+from agents.admission import AdmissionRejected, admission_controller
+from agents.profile_prefetch import PREFETCH_WAIT_SECONDS, profile_prefetcher
+from agents.request_coalescer import RequestCoalescer, normalize_request
+from agents.vibe_session import continue_vibe, parse_follow_up, vibe_sessions
+from diagnostics import loop_monitor
+from http_cache import response_cache
+from playback_stream import playback_hub
+from tracing import span, start_trace
+from warmup import startup_warmup
 
-load_dotenv()
+# The agent pipeline (google.adk, ~5s to import) is imported on first use
+# or by the startup warm-up, not at module load (see warmup.py)
+if TYPE_CHECKING:
+    from agents.deadline import Deadline
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Event-loop lag monitor (and blocking detector with LOOP_BLOCK_DEBUG=1)
+    loop_monitor.start()
+    # Load the agent graph, database and clients; /ready turns green after
+    await startup_warmup.start()
+    yield
+    loop_monitor.stop()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Get frontend URL from environment variable, with a default for local dev
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://127.0.0.1:3000")
@@ -29,13 +56,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON responses (playlists, queues, search results);
+# event streams are never compressed
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MINIMUM_SIZE", "1000")))
+
 # Session middleware removed - using token-based auth only to avoid shared sessions
 # is_production = FRONTEND_URL.startswith("https://")
 
 
 
-# Include the spotify router
+# Include the spotify and admin routers
 app.include_router(spotify.router)
+app.include_router(admin.router)
+
+# Identical /chat requests of a user share one run; only successful
+# results are kept for the retention window, so failures can be retried
+chat_coalescer = RequestCoalescer(
+    retain_if=lambda result: result.get("status") == "success"
+)
 
 class ChatRequest(BaseModel):
     message: str
@@ -44,6 +82,14 @@ class ChatRequest(BaseModel):
 def read_root():
     return {"Hello": "World"}
 
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 until the startup warm-up has finished."""
+    return JSONResponse(
+        startup_warmup.stats(),
+        status_code=200 if startup_warmup.ready else 503
+    )
+
 @app.get("/login")
 def login():
     oauth = get_spotify_oauth()
@@ -58,6 +104,9 @@ def callback(request: Request):
         return RedirectResponse(f"{FRONTEND_URL}/")
 
     token_info = get_access_token(code)
+    # Build the user context in the background while the UI loads,
+    # so the first /chat does not wait for ~14 Spotify calls
+    profile_prefetcher.start(token_info)
     # Don't store in session - pass to frontend via URL
     # Frontend will store in localStorage (per-user)
     access_token = token_info.get("access_token", "")
@@ -88,44 +137,140 @@ def logout(request: Request):
 
 @app.post("/chat")
 async def chat(request: Request, chat_request: ChatRequest):
-    import spotipy
-    from spotify_service import validate_and_add_tracks_to_queue
+    # Attach the per-stage trace to the response with ?trace=true
+    include_trace = request.query_params.get("trace") in ("1", "true")
+
+    with start_trace() as trace:
+        response = await _run_chat(request, chat_request)
+        if include_trace:
+            response["trace"] = trace.to_dict()
+        return response
+
+
+async def _run_chat(request: Request, chat_request: ChatRequest) -> dict:
+    from agents.deadline import Deadline
+    from spotify_service import get_user_id
 
     token_info = get_token_info(request)
     if not token_info:
         raise HTTPException(status_code=401, detail="User not authenticated")
 
+    # End-to-end deadline; agent stages get what is left of it
+    deadline = Deadline()
+
     # Get user ID from Spotify
-    sp = spotipy.Spotify(auth=token_info["access_token"])
-    user_info = sp.current_user()
-    user_id = user_info["id"]
-
-    # Get user profile and queue (no caching without sessions)
-    print("--- Fetching user profile... ---")
-    user_profile = get_user_context(token_info)
-    current_queue = get_current_queue(token_info)
-
-    # Combine cached profile with real-time queue for full context
-    spotify_context = {
-        "user_profile": user_profile,
-        "queue": current_queue
-    }
-
-    # Run the agent with the full context
-    agent_result = await run_agent_with_context(
-        user_message=chat_request.message,
-        spotify_context=spotify_context,
-        user_id=user_id
-    )
+    with span("user_lookup"):
+        user_id = get_user_id(token_info)
+
+    def generate():
+        return _generate_and_queue_playlist(token_info, user_id, chat_request.message, deadline)
+
+    if parse_follow_up(chat_request.message) is not None:
+        # "more like this" twice means two more batches: never coalesced
+        result, coalesced = await generate(), False
+    else:
+        # Duplicate requests (double-clicks, retries) share one pipeline run
+        key = (user_id, normalize_request(chat_request.message))
+        result, coalesced = await chat_coalescer.run(key, generate)
+    response = dict(result)
+    if coalesced:
+        response["coalesced"] = True
+    return response
+
+
+async def _generate_and_queue_playlist(
+    token_info: dict,
+    user_id: str,
+    message: str,
+    deadline: "Deadline"
+) -> dict:
+    from agents.agent_manager import run_agent_with_context
+    from spotify_service import validate_and_add_tracks_to_queue
+
+    # Session reads and writes hit the DuckDB store, off the event loop
+    session = await asyncio.to_thread(vibe_sessions.get, user_id)
+    adjustments = parse_follow_up(message) if session and session.get("mood_params") else None
+
+    fetched_profile = None
+    if adjustments is not None:
+        # "more like this" / "a bit more energetic": shift the previous
+        # target and search directly, no profile fetch and no LLM
+        with span("vibe_follow_up", adjustments=len(adjustments)):
+            agent_result = await asyncio.to_thread(continue_vibe, session, adjustments)
+        mood_params = agent_result.get("mood_params")
+    else:
+        # Reuse the profile stored in the vibe session while it is fresh,
+        # else the one prefetched at login, else fetch it now
+        user_profile = await asyncio.to_thread(vibe_sessions.fresh_profile, user_id)
+        user_profile_str = None
+        if user_profile is None:
+            with span("profile_prefetch_wait"):
+                prefetched = await profile_prefetcher.get(
+                    user_id, token_info,
+                    max_wait=min(PREFETCH_WAIT_SECONDS, deadline.remaining() / 3)
+                )
+            if prefetched:
+                user_profile = fetched_profile = prefetched["user_profile"]
+                user_profile_str = prefetched["user_profile_str"]
+            else:
+                with span("profile_fetch"):
+                    user_profile = get_user_context(token_info)
+                if "error" not in user_profile:
+                    fetched_profile = user_profile
+        with span("queue_fetch"):
+            current_queue = get_current_queue(token_info)
+
+        # Combine cached profile with real-time queue for full context
+        spotify_context = {
+            "user_profile": user_profile,
+            "user_profile_str": user_profile_str,
+            "queue": current_queue
+        }
+
+        # Run the agent with the full context, once the admission controller
+        # grants a pipeline slot (waiting at most half of the time left)
+        try:
+            async with admission_controller.admit(user_id, max_wait=deadline.remaining() / 2):
+                agent_result = await run_agent_with_context(
+                    user_message=message,
+                    spotify_context=spotify_context,
+                    user_id=user_id,
+                    deadline=deadline
+                )
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=e.status_code,
+                detail=f"Too many playlist requests in progress ({e.reason}), try again shortly",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        # The target the scout actually searched with; None (unknown)
+        # sends the next message through the full pipeline again
+        mood_params = agent_result.get("mood_params")
+
+        # Do not queue again what this vibe session already queued
+        if session and agent_result.get("status") == "success":
+            already_queued = set(session.get("queued_uris") or [])
+            agent_result["playlist"] = [
+                uri for uri in agent_result.get("playlist", []) if uri not in already_queued
+            ]
 
     # Check if playlist was generated successfully
     if agent_result.get("status") == "success":
         playlist = agent_result.get("playlist", [])
         
         # Validate and add tracks to queue (done in spotify_service)
-        validation_result = validate_and_add_tracks_to_queue(
-            token_info,
-            playlist
+        with span("validation_and_queueing", tracks=len(playlist)):
+            validation_result = validate_and_add_tracks_to_queue(
+                token_info,
+                playlist
+            )
+        # Push the new queue to the user's open player tabs
+        response_cache.invalidate(token_info, "queue")
+        playback_hub.nudge(user_id=user_id)
+        await asyncio.to_thread(
+            vibe_sessions.record,
+            user_id, message, mood_params, validation_result["valid_tracks"],
+            user_profile=fetched_profile
         )
         
         # Prepare response
@@ -137,6 +282,12 @@ async def chat(request: Request, chat_request: ChatRequest):
             "invalid_tracks": len(validation_result["invalid_tracks"]),
             "playlist_preview": validation_result["valid_tracks"][:5]
         }
+        if agent_result.get("degraded"):
+            # Some agents ran out of time; the playlist is a fallback
+            response["degraded"] = True
+            response["fallback_source"] = agent_result.get("fallback_source")
+        if agent_result.get("follow_up"):
+            response["follow_up"] = True
         
         if validation_result["invalid_tracks"]:
             response["warning"] = f"{len(validation_result['invalid_tracks'])} tracks were invalid and skipped"
@@ -147,4 +298,4 @@ async def chat(request: Request, chat_request: ChatRequest):
         return {
             "status": "error",
             "message": agent_result.get("message", "Failed to generate playlist")
-        }
\ No newline at end of file
+        }
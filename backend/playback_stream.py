@@ -0,0 +1,305 @@
+import asyncio
+import json
+import os
+import secrets
+import time
+
+import spotify_service
+from projections import compact_playback, compact_track
+from shared_cache import get_cache
+from tracing import metrics
+
+# Server-side playback state push (GET /spotify/playback/stream, SSE).
+#
+# Instead of every open tab polling /spotify/current_playback and
+# /spotify/queue, the backend runs one PlaybackPoller per active user,
+# shared by all of that user's connections. The poll interval adapts to
+# the player state: fast while playing (and right when the current track
+# should end), slow while paused, slower without an active device, with
+# exponential backoff on Spotify errors. The queue is only refetched when
+# the track changed, after a nudge (/chat queued tracks, player controls)
+# or every QUEUE_REFRESH_SECONDS.
+#
+# Successive states are diffed and only changed parts are pushed:
+#
+#     event: playback   compact current playback (or null, see
+#                       projections.py), sent when the track, play/pause
+#                       state, device or shuffle/repeat changed, or the
+#                       position jumped (seek)
+#     event: queue      compact list of upcoming tracks, sent when it changed
+#
+#     event: reauth     the access token was rejected; the stream ends and
+#                       the client reconnects with a fresh token
+#
+# Clients extrapolate the progress locally between events. A poller stops
+# as soon as its user's last connection closes.
+#
+# EventSource cannot send headers and query strings end up in access logs,
+# so browsers do not put the access token in the stream URL: they exchange
+# it for a one-time ticket (POST /spotify/playback/stream_ticket) and open
+# the stream with ?ticket=.
+
+PLAYING_POLL_SECONDS = float(os.getenv("PLAYBACK_POLL_PLAYING_SECONDS", "3"))
+PAUSED_POLL_SECONDS = float(os.getenv("PLAYBACK_POLL_PAUSED_SECONDS", "15"))
+IDLE_POLL_SECONDS = float(os.getenv("PLAYBACK_POLL_IDLE_SECONDS", "30"))
+QUEUE_REFRESH_SECONDS = float(os.getenv("PLAYBACK_QUEUE_REFRESH_SECONDS", "30"))
+MAX_BACKOFF_SECONDS = 60.0
+
+# Keep-alive comment interval (proxies close idle connections)
+HEARTBEAT_SECONDS = 15.0
+
+# Position drift tolerated before a playback event is sent (seek detection)
+PROGRESS_TOLERANCE_MS = 2500
+
+# Pending events per connection; a slow client only gets the latest ones
+SUBSCRIBER_BUFFER = 16
+
+# How long a stream ticket can be redeemed
+STREAM_TICKET_SECONDS = float(os.getenv("PLAYBACK_STREAM_TICKET_SECONDS", "30"))
+
+metrics.describe(
+    "vibe_playback_polls_total", "counter",
+    "Spotify requests made by the playback pollers, by kind"
+)
+metrics.describe(
+    "vibe_playback_events_total", "counter",
+    "Playback stream events pushed to clients, by event"
+)
+
+
+# Stream tickets, shared by all workers (the ticket may be redeemed by
+# another worker than the one that issued it)
+_stream_tickets = get_cache("stream_ticket", STREAM_TICKET_SECONDS)
+
+
+def _track_uri(snapshot: dict | None) -> str | None:
+    return ((snapshot or {}).get("item") or {}).get("uri")
+
+
+def _is_auth_error(error: str) -> bool:
+    """Whether a spotify_service error means the access token was rejected."""
+    return "http status: 401" in (error or "")
+
+
+def issue_stream_ticket(user_id: str, token_info: dict) -> str:
+    """
+    Exchanges an access token for a one-time playback stream ticket.
+
+    Returns:
+        Opaque ticket, valid for STREAM_TICKET_SECONDS
+    """
+    ticket = secrets.token_urlsafe(32)
+    _stream_tickets.set(ticket, {"user_id": user_id, "access_token": token_info["access_token"]})
+    return ticket
+
+
+def redeem_stream_ticket(ticket: str) -> tuple | None:
+    """
+    Redeems a stream ticket (once).
+
+    Returns:
+        (user_id, token_info), or None for an unknown or expired ticket
+    """
+    if not ticket:
+        return None
+    entry = _stream_tickets.get(ticket)
+    if entry is None:
+        return None
+    _stream_tickets.delete(ticket)
+    return entry["user_id"], {"access_token": entry["access_token"]}
+
+
+class PlaybackPoller:
+    """Polls one user's playback and fans changes out to their connections."""
+
+    def __init__(self, user_id: str, token_info: dict):
+        self.user_id = user_id
+        self.token_info = token_info
+        self.subscribers = set()
+        self.playback = None
+        self.queue = None
+        self._polled_at = 0.0
+        self._queue_fetched_at = 0.0
+        self._refresh_queue = True
+        self._failures = 0
+        self._wake = asyncio.Event()
+        self.task = None
+        # Set when Spotify rejected the token; the poller then stops
+        self.expired = False
+
+    def publish(self, event: str, data, subscribers=None):
+        for subscriber in subscribers or self.subscribers:
+            if subscriber.full():
+                subscriber.get_nowait()  # Drop the oldest pending event
+            subscriber.put_nowait((event, data))
+            metrics.inc("vibe_playback_events_total", event=event)
+
+    def nudge(self, refresh_queue: bool = True):
+        """Polls right away (e.g. after the queue or player was changed)."""
+        self._refresh_queue = self._refresh_queue or refresh_queue
+        self._wake.set()
+
+    def _playback_changed(self, new: dict | None) -> bool:
+        old = self.playback
+        if old is None or new is None:
+            return old is not new
+        if any(
+            old.get(key) != new.get(key)
+            for key in ("is_playing", "shuffle_state", "repeat_state", "device")
+        ) or _track_uri(old) != _track_uri(new):
+            return True
+        expected = old["progress_ms"]
+        if old["is_playing"]:
+            expected += (time.monotonic() - self._polled_at) * 1000
+        return abs(new["progress_ms"] - expected) > PROGRESS_TOLERANCE_MS
+
+    def next_interval(self) -> float:
+        """Seconds until the next poll, based on the last known state."""
+        if self._failures:
+            return min(PLAYING_POLL_SECONDS * 2 ** self._failures, MAX_BACKOFF_SECONDS)
+        if self.playback is None:
+            return IDLE_POLL_SECONDS
+        if not self.playback["is_playing"]:
+            return PAUSED_POLL_SECONDS
+        # Poll again just after the current track should have ended
+        duration_ms = (self.playback.get("item") or {}).get("duration_ms") or 0
+        remaining = (duration_ms - self.playback["progress_ms"]) / 1000
+        return max(min(PLAYING_POLL_SECONDS, remaining + 0.5), 0.5)
+
+    async def poll_once(self):
+        result = await asyncio.to_thread(spotify_service.get_current_playback, self.token_info)
+        metrics.inc("vibe_playback_polls_total", kind="playback")
+        if "error" in result:
+            if _is_auth_error(result["error"]):
+                # The token expired: end the streams so that the clients
+                # reconnect with a fresh one
+                self.expired = True
+                self.publish("reauth", None)
+                return
+            self._failures += 1
+            print(f"Warning: Playback poll failed for {self.user_id}: {result['error']}")
+            return
+        self._failures = 0
+
+        snapshot = compact_playback(result.get("current_playback"))
+        track_changed = _track_uri(snapshot) != _track_uri(self.playback)
+        if not self._polled_at or self._playback_changed(snapshot):
+            self.publish("playback", snapshot)
+        self.playback = snapshot
+        self._polled_at = time.monotonic()
+
+        if (
+            track_changed
+            or self._refresh_queue
+            or time.monotonic() - self._queue_fetched_at > QUEUE_REFRESH_SECONDS
+        ):
+            self._refresh_queue = False
+            queue_data = await asyncio.to_thread(spotify_service.get_current_queue, self.token_info)
+            metrics.inc("vibe_playback_polls_total", kind="queue")
+            if "error" in queue_data:
+                return
+            self._queue_fetched_at = time.monotonic()
+            queue = [compact_track(track) for track in queue_data.get("queue") or []]
+            if queue != self.queue:
+                self.queue = queue
+                self.publish("queue", queue)
+
+    async def run(self):
+        while self.subscribers and not self.expired:
+            self._wake.clear()
+            await self.poll_once()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.next_interval())
+            except asyncio.TimeoutError:
+                pass
+
+
+class PlaybackHub:
+    """One PlaybackPoller per user with open playback streams."""
+
+    def __init__(self):
+        self.pollers = {}
+        # access_token -> user_id, to nudge from token-only endpoints
+        self._token_users = {}
+
+    def subscribe(self, user_id: str, token_info: dict) -> asyncio.Queue:
+        """
+        Registers a connection and starts the user's poller if needed.
+
+        The connection immediately gets the last known state, if any.
+        """
+        poller = self.pollers.get(user_id)
+        if poller is None or poller.expired or poller.task is None or poller.task.done():
+            poller = PlaybackPoller(user_id, token_info)
+            self.pollers[user_id] = poller
+        # The newest connection's token is the freshest one
+        poller.token_info = token_info
+        self._token_users[token_info["access_token"]] = user_id
+
+        subscriber = asyncio.Queue(maxsize=SUBSCRIBER_BUFFER)
+        poller.subscribers.add(subscriber)
+        if poller.task is None:
+            poller.task = asyncio.create_task(poller.run())
+        else:
+            if poller.playback is not None:
+                poller.publish("playback", poller.playback, [subscriber])
+            if poller.queue is not None:
+                poller.publish("queue", poller.queue, [subscriber])
+        self._update_gauges()
+        return subscriber
+
+    def unsubscribe(self, user_id: str, subscriber: asyncio.Queue):
+        poller = self.pollers.get(user_id)
+        if poller is None or subscriber not in poller.subscribers:
+            # Its poller expired and was replaced
+            return
+        poller.subscribers.discard(subscriber)
+        if not poller.subscribers:
+            if poller.task:
+                poller.task.cancel()
+            del self.pollers[user_id]
+            for token in [t for t, u in self._token_users.items() if u == user_id]:
+                del self._token_users[token]
+        self._update_gauges()
+
+    def user_for_token(self, token_info: dict) -> str | None:
+        return self._token_users.get((token_info or {}).get("access_token"))
+
+    def nudge(self, user_id: str = None, token_info: dict = None, refresh_queue: bool = True):
+        """Makes a user's poller (if any) poll right away."""
+        poller = self.pollers.get(user_id or self.user_for_token(token_info))
+        if poller:
+            poller.nudge(refresh_queue)
+
+    def _update_gauges(self):
+        metrics.set_gauge("vibe_playback_pollers", len(self.pollers))
+        metrics.set_gauge(
+            "vibe_playback_streams", sum(len(p.subscribers) for p in self.pollers.values())
+        )
+
+    def stats(self) -> dict:
+        return {
+            "pollers": len(self.pollers),
+            "streams": sum(len(p.subscribers) for p in self.pollers.values()),
+        }
+
+    async def stream(self, user_id: str, token_info: dict):
+        """Server-sent events of one connection (ends when it closes)."""
+        subscriber = self.subscribe(user_id, token_info)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(subscriber.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+                if event == "reauth":
+                    return
+        finally:
+            self.unsubscribe(user_id, subscriber)
+
+
+# Shared hub for the playback stream endpoint
+playback_hub = PlaybackHub()
@@ -0,0 +1,151 @@
+# Compact views of Spotify objects for the passthrough endpoints.
+#
+# Raw Spotify JSON is mostly payload nobody renders: full album objects,
+# external URLs, and available_markets lists of ~180 country codes per
+# track and album. /spotify/search, /spotify/user_playlists,
+# /spotify/queue and /spotify/current_playback return these compact views
+# by default. They keep everything the frontend uses (name,
+# artists[].name, album.images, duration_ms, id/uri).
+#
+# A client that needs something else passes ?fields= with comma-separated
+# dotted paths into the raw Spotify response. Lists are traversed
+# implicitly, e.g.
+#
+#     GET /spotify/queue?fields=queue.name,queue.artists.name,queue.popularity
+#
+# Error responses ({"error": ...}) are returned unchanged.
+
+
+def compact_image(image: dict) -> dict:
+    return {"url": image.get("url"), "width": image.get("width"), "height": image.get("height")}
+
+
+def compact_artist(artist: dict) -> dict:
+    return {"id": artist.get("id"), "name": artist.get("name"), "uri": artist.get("uri")}
+
+
+def compact_track(track: dict | None) -> dict | None:
+    """Track (or episode) with the fields the player UI renders."""
+    if not track:
+        return None
+    album = track.get("album") or {}
+    return {
+        "id": track.get("id"),
+        "uri": track.get("uri"),
+        "name": track.get("name"),
+        "artists": [compact_artist(artist) for artist in track.get("artists") or []],
+        "album": {
+            "id": album.get("id"),
+            "name": album.get("name"),
+            "images": [compact_image(image) for image in album.get("images") or []],
+        },
+        "duration_ms": track.get("duration_ms"),
+        "explicit": track.get("explicit"),
+    }
+
+
+def compact_playlist(playlist: dict | None) -> dict | None:
+    if not playlist:
+        return None
+    owner = playlist.get("owner") or {}
+    tracks = playlist.get("tracks") or {}
+    return {
+        "id": playlist.get("id"),
+        "uri": playlist.get("uri"),
+        "name": playlist.get("name"),
+        "owner": {"id": owner.get("id"), "display_name": owner.get("display_name")},
+        "images": [compact_image(image) for image in playlist.get("images") or []],
+        "tracks": {"total": tracks.get("total")},
+        "snapshot_id": playlist.get("snapshot_id"),
+        "public": playlist.get("public"),
+        "collaborative": playlist.get("collaborative"),
+    }
+
+
+def compact_playback(current_playback: dict | None) -> dict | None:
+    """Playback state: device, play/pause, position and current item."""
+    if not current_playback:
+        return None
+    device = current_playback.get("device") or {}
+    return {
+        "is_playing": bool(current_playback.get("is_playing")),
+        "progress_ms": current_playback.get("progress_ms") or 0,
+        "shuffle_state": current_playback.get("shuffle_state"),
+        "repeat_state": current_playback.get("repeat_state"),
+        "device": {
+            "id": device.get("id"),
+            "name": device.get("name"),
+            "type": device.get("type"),
+            "volume_percent": device.get("volume_percent"),
+        },
+        "currently_playing_type": current_playback.get("currently_playing_type"),
+        "item": compact_track(current_playback.get("item")),
+    }
+
+
+def parse_fields(fields: str) -> dict:
+    """
+    Parses "a.b,a.c,d" into the path tree {"a": {"b": {}, "c": {}}, "d": {}}.
+    """
+    tree = {}
+    for path in filter(None, (field.strip() for field in fields.split(","))):
+        node = tree
+        for key in path.split("."):
+            node = node.setdefault(key, {})
+    return tree
+
+
+def select_fields(data, tree: dict):
+    """Keeps only the paths in tree (an empty subtree keeps the whole value)."""
+    if not tree:
+        return data
+    if isinstance(data, list):
+        return [select_fields(item, tree) for item in data]
+    if isinstance(data, dict):
+        return {
+            key: select_fields(data[key], subtree)
+            for key, subtree in tree.items() if key in data
+        }
+    return data
+
+
+def project(data: dict, compact, fields: str = None) -> dict:
+    """
+    Applies ?fields= to a raw response, or else its compact view.
+
+    Args:
+        data: Response of a spotify_service function
+        compact: Function building the compact view of data
+        fields: Comma-separated dotted paths into data
+
+    Returns:
+        Projected response (errors unchanged)
+    """
+    if not isinstance(data, dict) or "error" in data:
+        return data
+    if fields:
+        return select_fields(data, parse_fields(fields))
+    return compact(data)
+
+
+# Compact views of whole endpoint responses
+
+def compact_search(data: dict) -> dict:
+    return {"results": [compact_track(track) for track in data.get("results") or []]}
+
+
+def compact_user_playlists(data: dict) -> dict:
+    return {"playlists": [compact_playlist(playlist) for playlist in data.get("playlists") or []]}
+
+
+def compact_queue(data: dict) -> dict:
+    return {
+        "currently_playing": compact_track(data.get("currently_playing")),
+        "queue": [compact_track(track) for track in data.get("queue") or []],
+    }
+
+
+def compact_current_playback(data: dict) -> dict:
+    if "current_playback" not in data:
+        return data  # {"message": "No track currently playing."}
+    return {"current_playback": compact_playback(data["current_playback"])}
@@ -0,0 +1,98 @@
+import hmac
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+from agents.admission import admission_controller
+from agents.profile_prefetch import profile_prefetcher
+from agents.translation_cache import translation_cache
+from diagnostics import LOOP_BLOCK_DEBUG, loop_monitor
+from http_cache import response_cache
+from playback_stream import playback_hub
+import shared_cache
+from tracing import metrics
+
+# This router exposes operational endpoints (metrics, cache statistics)
+# for scrapers and operators. They reveal internals (user IDs in cache
+# keys, catalog paths, code locations), so every endpoint requires the
+# ADMIN_TOKEN, sent as "X-Admin-Token: <token>" or, for scrapers,
+# "Authorization: Bearer <token>". Without ADMIN_TOKEN (the default)
+# the endpoints are off and answer 404.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def require_admin(request: Request):
+    """Dependency rejecting requests without the admin token."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = request.headers.get("X-Admin-Token")
+    if token is None:
+        authorization = request.headers.get("Authorization", "")
+        token = authorization[len("Bearer "):] if authorization.startswith("Bearer ") else ""
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(
+    tags=["Admin"],
+    dependencies=[Depends(require_admin)],
+)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Process metrics in the Prometheus text exposition format."""
+    stats = translation_cache.stats()
+    metrics.set_gauge("vibe_mood_cache_entries", stats["size"])
+    metrics.set_gauge("vibe_mood_cache_hits", stats["hits"])
+    metrics.set_gauge("vibe_mood_cache_misses", stats["misses"])
+    return PlainTextResponse(
+        metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
+@router.get("/admin/caches")
+def get_cache_stats():
+    """Hit statistics of the in-process caches and the shared cache."""
+    return {
+        "mood_translation": translation_cache.stats(),
+        "profile_prefetch": profile_prefetcher.stats(),
+        "responses": response_cache.stats(),
+        "shared": shared_cache.stats(),
+    }
+
+
+@router.get("/admin/admission")
+def get_admission_stats():
+    """Pipelines in flight and waiting in the /chat admission queue."""
+    return admission_controller.stats()
+
+
+@router.get("/admin/playback_streams")
+def get_playback_stream_stats():
+    """Active playback pollers and open playback streams."""
+    return playback_hub.stats()
+
+
+@router.get("/admin/event_loop")
+def get_event_loop_stats():
+    """
+    Event-loop lag percentiles and detected blocking calls (with their
+    stacks only while LOOP_BLOCK_DEBUG is on).
+    """
+    return loop_monitor.stats(include_stacks=LOOP_BLOCK_DEBUG)
+
+
+@router.get("/admin/catalog")
+def get_catalog_stats():
+    """Catalog version served by this worker and the published snapshots."""
+    from data_spotify import catalog_snapshots
+    from data_spotify.database_service import get_catalog
+
+    return {
+        "serving": get_catalog().stats(),
+        "current": catalog_snapshots.current_version(),
+        "snapshots": catalog_snapshots.list_snapshots(),
+    }
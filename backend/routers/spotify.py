@@ -1,6 +1,17 @@
+import asyncio
+
 from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import spotify_service
+import projections
+from http_cache import (
+    QUEUE_TTL_SECONDS, USER_CONTEXT_TTL_SECONDS, USER_PLAYLISTS_TTL_SECONDS,
+    cached_read, response_cache
+)
+from playback_stream import (
+    STREAM_TICKET_SECONDS, issue_stream_ticket, playback_hub, redeem_stream_ticket
+)
 
 # This router handles all the direct Spotify control endpoints.
 # It uses the functions from spotify_service.py to interact with the Spotify API.
@@ -26,6 +37,11 @@ async def get_valid_token(request: Request) -> dict:
     else:
         raise HTTPException(status_code=401, detail="User not authenticated")
 
+def _player_changed(token_info: dict):
+    """Refreshes everything derived from the player state after a change."""
+    response_cache.invalidate(token_info, "queue")
+    playback_hub.nudge(token_info=token_info)
+
 # --- Request Models ---
 
 class PlayRequest(BaseModel):
@@ -51,59 +67,107 @@ class TransferPlaybackRequest(BaseModel):
 @router.post("/play")
 async def play_song(play_request: PlayRequest, token_info: dict = Depends(get_valid_token)):
     spotify_service.add_to_queue(token_info, play_request.song_uri)
-    return spotify_service.start_playback(token_info)
+    result = spotify_service.start_playback(token_info)
+    _player_changed(token_info)
+    return result
 
 @router.post("/transfer_playback")
 async def transfer_playback(transfer_request: TransferPlaybackRequest, token_info: dict = Depends(get_valid_token)):
-    return spotify_service.transfer_playback(token_info, transfer_request.device_id)
+    result = spotify_service.transfer_playback(token_info, transfer_request.device_id)
+    _player_changed(token_info)
+    return result
 
 @router.post("/pause")
 async def pause_playback(token_info: dict = Depends(get_valid_token)):
-    return spotify_service.pause_playback(token_info)
+    result = spotify_service.pause_playback(token_info)
+    _player_changed(token_info)
+    return result
 
 @router.post("/stop")
 async def stop_playback(token_info: dict = Depends(get_valid_token)):
-    return spotify_service.stop_playback(token_info)
+    result = spotify_service.stop_playback(token_info)
+    _player_changed(token_info)
+    return result
 
 @router.post("/skip")
 async def skip_track(token_info: dict = Depends(get_valid_token)):
-    return spotify_service.next_track(token_info)
+    result = spotify_service.next_track(token_info)
+    _player_changed(token_info)
+    return result
 
 @router.post("/previous")
 async def previous_track(token_info: dict = Depends(get_valid_token)):
-    return spotify_service.previous_track(token_info)
+    result = spotify_service.previous_track(token_info)
+    _player_changed(token_info)
+    return result
 
 @router.post("/queue_add")
 async def add_to_queue(play_request: PlayRequest, token_info: dict = Depends(get_valid_token)):
-    return spotify_service.add_to_queue(token_info, play_request.song_uri)
+    result = spotify_service.add_to_queue(token_info, play_request.song_uri)
+    _player_changed(token_info)
+    return result
 
 @router.post("/create_playlist_from_queue")
 async def create_playlist_from_queue(playlist_request: PlaylistRequest, token_info: dict = Depends(get_valid_token)):
-    return spotify_service.create_playlist_from_queue(token_info, playlist_request.playlist_name)
+    result = spotify_service.create_playlist_from_queue(token_info, playlist_request.playlist_name)
+    response_cache.invalidate(token_info, "user_playlists", "user_context")
+    return result
 
 @router.post("/add_to_likes")
 async def add_to_likes(track_uri_request: TrackUriRequest, token_info: dict = Depends(get_valid_token)):
     return spotify_service.add_track_to_likes(token_info, track_uri_request.track_uri)
 
+# The passthrough endpoints below return compact views by default;
+# ?fields= selects paths of the raw Spotify response (see projections.py).
+# user_playlists, queue and user_context support ETag / If-None-Match and
+# briefly reuse the serialized body (see http_cache.py).
+
 @router.get("/user_playlists")
-async def get_user_playlists(token_info: dict = Depends(get_valid_token)):
-    return spotify_service.get_user_playlists(token_info)
+async def get_user_playlists(request: Request, fields: str = None, token_info: dict = Depends(get_valid_token)):
+    return cached_read(
+        request, token_info, "user_playlists",
+        lambda: projections.project(
+            spotify_service.get_user_playlists(token_info), projections.compact_user_playlists, fields
+        ),
+        ttl=USER_PLAYLISTS_TTL_SECONDS,
+        variant=fields
+    )
 
 @router.get("/current_playback")
-async def get_current_playback(token_info: dict = Depends(get_valid_token)):
-    return spotify_service.get_current_playback(token_info)
+async def get_current_playback(fields: str = None, token_info: dict = Depends(get_valid_token)):
+    return projections.project(
+        spotify_service.get_current_playback(token_info), projections.compact_current_playback, fields
+    )
 
 @router.post("/search")
-async def search_track(search_request: SearchRequest, token_info: dict = Depends(get_valid_token)):
-    return spotify_service.search_track(token_info, search_request.query)
+async def search_track(search_request: SearchRequest, fields: str = None, token_info: dict = Depends(get_valid_token)):
+    return projections.project(
+        spotify_service.search_track(token_info, search_request.query), projections.compact_search, fields
+    )
 
+@router.get("/user_context")
 @router.post("/user_context")
-def get_user_context(token_info: dict = Depends(get_valid_token)):
-    return spotify_service.get_user_context(token_info)
+def get_user_context(request: Request, token_info: dict = Depends(get_valid_token)):
+    return cached_read(
+        request, token_info, "user_context",
+        lambda: spotify_service.get_user_context(token_info),
+        ttl=USER_CONTEXT_TTL_SECONDS
+    )
+
+@router.post("/sync_library")
+def sync_library(full: bool = False, token_info: dict = Depends(get_valid_token)):
+    return spotify_service.sync_user_library(token_info, full=full)
 
 @router.get("/queue")
-async def get_queue(token_info: dict = Depends(get_valid_token)):
-    return spotify_service.get_current_queue(token_info)
+async def get_queue(request: Request, fields: str = None, token_info: dict = Depends(get_valid_token)):
+    return cached_read(
+        request, token_info, "queue",
+        lambda: projections.project(
+            spotify_service.get_current_queue(token_info), projections.compact_queue, fields
+        ),
+        ttl=QUEUE_TTL_SECONDS,
+        variant=fields
+    )
 
 @router.post("/play_from_queue")
 async def play_from_queue(body: PlayFromQueueBody, token_info: dict = Depends(get_valid_token)):
@@ -130,4 +194,56 @@ async def play_from_queue(body: PlayFromQueueBody, token_info: dict = Depends(ge
     if isinstance(result, dict) and result.get("error"):
         raise HTTPException(status_code=400, detail=result["error"])
 
+    _player_changed(token_info)
     return {"message": f"Playing from queue index {body.index}", "count": len(uris)}
+
+
+async def _stream_user_id(token_info: dict) -> str:
+    user_id = playback_hub.user_for_token(token_info)
+    if user_id is None:
+        try:
+            user_id = await asyncio.to_thread(spotify_service.get_user_id, token_info)
+        except Exception:
+            raise HTTPException(status_code=401, detail="User not authenticated")
+    return user_id
+
+
+@router.post("/playback/stream_ticket")
+async def playback_stream_ticket(token_info: dict = Depends(get_valid_token)):
+    """
+    One-time ticket for GET /playback/stream.
+
+    EventSource cannot send the Authorization header, and a token in the
+    URL would end up in access logs; the ticket is short-lived and only
+    valid once.
+    """
+    user_id = await _stream_user_id(token_info)
+    return {
+        "ticket": issue_stream_ticket(user_id, token_info),
+        "expires_in": int(STREAM_TICKET_SECONDS),
+    }
+
+
+@router.get("/playback/stream")
+async def playback_stream(request: Request, ticket: str = None):
+    """
+    Server-sent events with the user's playback state and queue.
+
+    Pushes "playback" and "queue" events when they change (see
+    playback_stream.py). Authenticated with the Authorization header or,
+    from a browser, with ?ticket= from POST /playback/stream_ticket.
+    """
+    redeemed = redeem_stream_ticket(ticket)
+    if redeemed:
+        user_id, token_info = redeemed
+    else:
+        if ticket:
+            raise HTTPException(status_code=401, detail="Invalid or expired stream ticket")
+        token_info = await get_valid_token(request)
+        user_id = await _stream_user_id(token_info)
+
+    return StreamingResponse(
+        playback_hub.stream(user_id, token_info),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
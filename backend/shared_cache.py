@@ -0,0 +1,309 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from tracing import metrics
+
+try:
+    import msgpack
+except ImportError:  # Optional: JSON is used when msgpack is not installed
+    msgpack = None
+
+# Cache shared by all uvicorn workers.
+#
+# In-process caches are duplicated and cold in every worker, so with N
+# workers each one sees about 1/N of the traffic and hit rates drop
+# accordingly. Caches built with get_cache() share one backend, selected
+# with CACHE_BACKEND:
+#
+#     lru     in-process LRU (default; single worker, tests)
+#     sqlite  on-disk SQLite file shared by all workers on the host
+#             (CACHE_SQLITE_PATH, WAL mode)
+#     redis   any Redis-compatible server (CACHE_REDIS_URL), shared across
+#             hosts; benchmarks/fake_redis.py is a local stand-in
+#
+# Values are serialized with msgpack (JSON if it is not installed), with
+# a one-byte format marker so both can be read. Keys are namespaced and
+# hashed, so tokens never appear in the store. Backend failures count as
+# misses: a cache outage slows requests down but never fails them.
+#
+# Namespaces in use:
+#     token_user      access token -> Spotify user ID (spotify_service)
+#     user_context    user ID -> processed profile (spotify_service)
+#     track_validity  track URI -> validation result (spotify_service)
+#     catalog_search  search arguments -> rows (database_service)
+#     stream_ticket   one-time ticket -> user ID and access token
+#                     (playback_stream)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "lru").lower()
+CACHE_SQLITE_PATH = os.getenv(
+    "CACHE_SQLITE_PATH", os.path.join(os.path.dirname(__file__), ".cache.sqlite")
+)
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://127.0.0.1:6379/0")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "50000"))
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "vibe")
+
+metrics.describe(
+    "vibe_cache_requests_total", "counter",
+    "Shared cache lookups, by namespace and result (hit, miss, error)"
+)
+
+_FORMAT_MSGPACK = b"m"
+_FORMAT_JSON = b"j"
+
+
+def serialize(value) -> bytes:
+    if msgpack is not None:
+        return _FORMAT_MSGPACK + msgpack.packb(value, use_bin_type=True)
+    return _FORMAT_JSON + json.dumps(value, separators=(",", ":")).encode()
+
+
+def deserialize(data: bytes):
+    marker, payload = data[:1], data[1:]
+    if marker == _FORMAT_MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack value, but msgpack is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload)
+
+
+class LRUBackend:
+    """In-process LRU of serialized values with per-entry expiry."""
+
+    name = "lru"
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": self.name, "entries": len(self._entries)}
+
+
+class SQLiteBackend:
+    """
+    On-disk store shared by every process on the host.
+
+    One connection per thread; WAL lets readers proceed while a writer
+    commits. Expired rows are purged and the size is capped every
+    PURGE_EVERY writes.
+    """
+
+    name = "sqlite"
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> bytes | None:
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: float):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl)
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self.purge()
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge(self):
+        """Drops expired rows, then the soonest-expiring ones over the cap."""
+        conn = self._connection()
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM cache WHERE key IN ("
+            " SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def stats(self) -> dict:
+        (entries,) = self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()
+        return {"backend": self.name, "path": self.path, "entries": entries}
+
+
+class RedisBackend:
+    """Redis (or any server speaking its protocol), shared across hosts."""
+
+    name = "redis"
+
+    def __init__(self, url: str = CACHE_REDIS_URL):
+        import redis
+
+        self.url = url
+        # RESP2 is spoken by every Redis-compatible server (and fake_redis.py)
+        self._client = redis.Redis.from_url(
+            url, protocol=2, socket_timeout=0.5, socket_connect_timeout=0.5
+        )
+
+    def get(self, key: str) -> bytes | None:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._client.set(key, value, px=max(int(ttl * 1000), 1))
+
+    def delete(self, key: str):
+        self._client.delete(key)
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "entries": self._client.dbsize()}
+
+
+BACKENDS = {"lru": LRUBackend, "sqlite": SQLiteBackend, "redis": RedisBackend}
+
+_backend = None
+_backend_lock = threading.Lock()
+_caches = {}
+
+
+def get_backend():
+    """Returns the process-wide backend selected by CACHE_BACKEND."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if CACHE_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown CACHE_BACKEND: {CACHE_BACKEND}")
+            _backend = BACKENDS[CACHE_BACKEND]()
+        return _backend
+
+
+class Cache:
+    """A namespace of the shared cache with its default TTL."""
+
+    def __init__(self, namespace: str, ttl_seconds: float, backend=None):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self._backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def backend(self):
+        return self._backend or get_backend()
+
+    def _key(self, key) -> str:
+        if not isinstance(key, str):
+            key = json.dumps(key, sort_keys=True, separators=(",", ":"), default=str)
+        digest = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return f"{CACHE_KEY_PREFIX}:{self.namespace}:{digest}"
+
+    def _count(self, result: str):
+        metrics.inc("vibe_cache_requests_total", namespace=self.namespace, result=result)
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss (or backend error)."""
+        try:
+            data = self.backend.get(self._key(key))
+            value = None if data is None else deserialize(data)
+        except Exception as e:
+            self.errors += 1
+            self._count("error")
+            print(f"Warning: Cache get failed ({self.namespace}): {e}")
+            return None
+        if value is None:
+            self.misses += 1
+            self._count("miss")
+        else:
+            self.hits += 1
+            self._count("hit")
+        return value
+
+    def set(self, key, value, ttl_seconds: float = None):
+        try:
+            self.backend.set(
+                self._key(key), serialize(value),
+                self.ttl_seconds if ttl_seconds is None else ttl_seconds
+            )
+        except Exception as e:
+            self.errors += 1
+            print(f"Warning: Cache set failed ({self.namespace}): {e}")
+
+    def delete(self, key):
+        try:
+            self.backend.delete(self._key(key))
+        except Exception as e:
+            print(f"Warning: Cache delete failed ({self.namespace}): {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def get_cache(namespace: str, ttl_seconds: float) -> Cache:
+    """Returns the cache of a namespace (created on first use)."""
+    if namespace not in _caches:
+        _caches[namespace] = Cache(namespace, ttl_seconds)
+    return _caches[namespace]
+
+
+def stats() -> dict:
+    """Backend statistics plus this process's lookups per namespace."""
+    try:
+        backend = get_backend().stats()
+    except Exception as e:
+        backend = {"backend": CACHE_BACKEND, "error": str(e)}
+    return {
+        "backend": backend,
+        "serializer": "msgpack" if msgpack is not None else "json",
+        "namespaces": {name: cache.stats() for name, cache in _caches.items()},
+    }
@@ -1,18 +1,41 @@
-import spotipy
 import os
 import time
-from spotipy.oauth2 import SpotifyOAuth
+from typing import TYPE_CHECKING
+
+from shared_cache import get_cache
+
+# spotipy (and requests under it) is imported on first use to keep the
+# app's import time down; startup warm-up loads it (see warmup.py)
+if TYPE_CHECKING:
+    import spotipy
 
 # This service file contains the core logic for interacting with the
 # Spotify API. It is used by the routers to expose functionality via
 # HTTP endpoints and by the agent flow.
 
+# Spotify endpoints. Point these at benchmarks/fake_spotify.py (e.g.
+# SPOTIFY_API_BASE_URL=http://127.0.0.1:8090/v1/ and
+# SPOTIFY_ACCOUNTS_URL=http://127.0.0.1:8090) to run without Spotify.
+SPOTIFY_API_BASE_URL = os.getenv("SPOTIFY_API_BASE_URL", "https://api.spotify.com/v1/")
+SPOTIFY_ACCOUNTS_URL = os.getenv("SPOTIFY_ACCOUNTS_URL", "https://accounts.spotify.com")
+
+# Caches shared by all workers (see shared_cache.py). Access tokens live
+# an hour; a track that exists keeps existing.
+_token_users = get_cache("token_user", 3600)
+_user_contexts = get_cache("user_context", int(os.getenv("PROFILE_CACHE_SECONDS", "900")))
+_track_validity = get_cache("track_validity", int(os.getenv("TRACK_VALIDITY_CACHE_SECONDS", "86400")))
+
+# Unknown track URIs are re-checked sooner than valid ones
+TRACK_NOT_FOUND_CACHE_SECONDS = 3600
+
 # --- Authentication Functions ---
 
 
 def get_spotify_oauth():
     """Creates and returns a SpotifyOAuth object."""
-    
+    from spotipy.cache_handler import MemoryCacheHandler
+    from spotipy.oauth2 import SpotifyOAuth
+
     # Comprehensive scope for all app functionalities
     scope = (
         "streaming "
@@ -25,22 +48,51 @@ def get_spotify_oauth():
         "user-top-read "
         "playlist-modify-private "
         "playlist-read-private "
-        "user-library-modify"
+        "user-library-modify "
+        "user-library-read"
     )
     
-    return SpotifyOAuth(
+    oauth = SpotifyOAuth(
         client_id=os.getenv("SPOTIPY_CLIENT_ID"),
         client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
         redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
         scope=scope,
-        cache_handler=None
+        # Tokens belong to the frontend; never keep them server-side
+        # (cache_handler=None would fall back to a shared .cache file)
+        cache_handler=MemoryCacheHandler()
     )
+    oauth.OAUTH_AUTHORIZE_URL = f"{SPOTIFY_ACCOUNTS_URL}/authorize"
+    oauth.OAUTH_TOKEN_URL = f"{SPOTIFY_ACCOUNTS_URL}/api/token"
+    return oauth
+
+
+def get_spotify_client(token_info: dict) -> "spotipy.Spotify":
+    """Creates a Spotify Web API client for the given token."""
+    import spotipy
+
+    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp.prefix = SPOTIFY_API_BASE_URL
+    return sp
+
+
+def get_user_id(token_info: dict) -> str:
+    """
+    Returns the Spotify user ID of a token (cached across workers).
+
+    Raises:
+        spotipy.SpotifyException: When the token is invalid
+    """
+    user_id = _token_users.get(token_info["access_token"])
+    if user_id is None:
+        user_id = get_spotify_client(token_info).current_user()["id"]
+        _token_users.set(token_info["access_token"], user_id)
+    return user_id
 
 
 def get_access_token(code: str) -> dict:
     """Gets the access token from the authorization code."""
     oauth = get_spotify_oauth()
-    token_info = oauth.get_access_token(code)
+    token_info = oauth.get_access_token(code, check_cache=False)
     # Manually add expires_at if it's not there, Spotipy usually adds it.
     if 'expires_at' not in token_info:
         token_info['expires_at'] = int(time.time()) + token_info['expires_in']
@@ -76,7 +128,7 @@ def refresh_token_if_needed(token_info: dict) -> dict:
 # --- Data Fetching and Preprocessing ---
 
 
-def _fetch_playlist_tracks(sp: spotipy.Spotify, playlist_id: str, limit: int = 50) -> list:
+def _fetch_playlist_tracks(sp: "spotipy.Spotify", playlist_id: str, limit: int = 50) -> list:
     """
     Fetches tracks from a specific playlist.
     
@@ -89,7 +141,12 @@ def _fetch_playlist_tracks(sp: spotipy.Spotify, playlist_id: str, limit: int = 5
         List of track dictionaries with name, artist, uri
     """
     try:
-        tracks = sp.playlist_tracks(playlist_id, limit=limit)["items"]
+        tracks = sp.playlist_tracks(
+            playlist_id,
+            # Only what is kept below (the full items are ~20x larger)
+            fields="items(track(name,uri,artists(name)))",
+            limit=limit
+        )["items"]
         return [
             {
                 "name": item["track"]["name"],
@@ -169,8 +226,14 @@ def _preprocess_user_context(context: dict) -> dict:
 
 
 def get_user_context(token_info: dict):
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
+        # A profile processed by any worker in the last minutes is reused
+        user_id = get_user_id(token_info)
+        cached = _user_contexts.get(user_id)
+        if cached is not None:
+            return cached
+
         # Fetch user's playlists
         playlists = sp.current_user_playlists(limit=50)["items"]
         
@@ -206,13 +269,171 @@ def get_user_context(token_info: dict):
         }
         
         # Process the context (no API calls in preprocessing)
-        return _preprocess_user_context(raw_context)
+        user_context = _preprocess_user_context(raw_context)
+        _user_contexts.set(user_id, user_context)
+        return user_context
     except Exception as e:
         return {"error": f"Error fetching user context: {e}"}
 
 
+def _library_song(item: dict) -> dict | None:
+    """Converts a saved-track or playlist item into a library song dict."""
+    track = item.get("track")
+    if not track or not (track.get("uri") or "").startswith("spotify:track:"):
+        return None  # Skip null tracks, local files and episodes
+    artists = track.get("artists") or [{"name": "Unknown"}]
+    return {
+        "name": track["name"],
+        "artist": artists[0]["name"],
+        "uri": track["uri"],
+        "added_at": item.get("added_at"),
+    }
+
+
+def _sync_saved_tracks(sp: "spotipy.Spotify", user_id: str, state: dict, full: bool) -> int:
+    """
+    Syncs the user's saved tracks into the library store.
+
+    Pages newest-first and stops at the stored added_at cursor, so an
+    incremental sync usually costs a single request. Falls back to a
+    full resync when the stored tracks plus the items that are never
+    stored (unavailable tracks, local files, episodes, duplicates) no
+    longer add up to Spotify's total (tracks were un-liked).
+
+    Returns:
+        Number of tracks written
+    """
+    from data_spotify import user_library_store
+
+    saved_state = state.get("saved") or {}
+    # Stores synced before "skipped" was recorded need one full sync
+    cursor = None if full or saved_state.get("skipped") is None else saved_state.get("cursor")
+    stored_before = user_library_store.count_user_tracks(user_id, "saved") if cursor else 0
+    new_songs = []
+    new_items = 0
+    offset = 0
+    while True:
+        page = sp.current_user_saved_tracks(limit=50, offset=offset)
+        total = page["total"]
+        reached_cursor = False
+        for item in page["items"]:
+            added_at = user_library_store.to_timestamp(item.get("added_at"))
+            if cursor and added_at and added_at <= cursor:
+                reached_cursor = True
+                break
+            new_items += 1
+            song = _library_song(item)
+            if song:
+                new_songs.append(song)
+        offset += len(page["items"])
+        if reached_cursor or not page.get("next"):
+            break
+
+    written = user_library_store.upsert_user_tracks(
+        user_id, "saved", new_songs, replace=cursor is None
+    )
+    stored = user_library_store.count_user_tracks(user_id, "saved")
+    if cursor is None:
+        skipped = total - stored
+    else:
+        skipped = saved_state["skipped"] + new_items - (stored - stored_before)
+        if stored + skipped != total:
+            print(f"--- Saved tracks changed for {user_id}, running full resync ---")
+            return _sync_saved_tracks(sp, user_id, state, full=True)
+
+    newest = max((song["added_at"] for song in new_songs if song["added_at"]), default=None)
+    user_library_store.set_sync_state(user_id, "saved", cursor=newest or cursor, skipped=skipped)
+    return written
+
+
+def _sync_playlists(sp: "spotipy.Spotify", user_id: str, state: dict, full: bool) -> dict:
+    """
+    Syncs the user's playlists into the library store.
+
+    Playlist items are ordered by position rather than added_at, so a
+    playlist is refetched only when its snapshot_id changed.
+
+    Returns:
+        dict with synced, unchanged and removed playlist counts
+    """
+    from data_spotify import user_library_store
+
+    playlists = []
+    page = sp.current_user_playlists(limit=50)
+    while page:
+        playlists.extend(p for p in page["items"] if p)
+        page = sp.next(page) if page.get("next") else None
+
+    stats = {"synced": 0, "unchanged": 0, "removed": 0}
+    current_sources = set()
+    for playlist in playlists:
+        source = f"playlist:{playlist['id']}"
+        current_sources.add(source)
+        stored = state.get(source) or {}
+        if not full and stored.get("snapshot_id") == playlist.get("snapshot_id"):
+            stats["unchanged"] += 1
+            continue
+
+        songs = []
+        tracks_page = sp.playlist_tracks(playlist["id"], limit=100)
+        while tracks_page:
+            songs.extend(filter(None, map(_library_song, tracks_page["items"])))
+            tracks_page = sp.next(tracks_page) if tracks_page.get("next") else None
+
+        user_library_store.upsert_user_tracks(user_id, source, songs, replace=True)
+        newest = max((song["added_at"] for song in songs if song["added_at"]), default=None)
+        user_library_store.set_sync_state(
+            user_id, source, cursor=newest, snapshot_id=playlist.get("snapshot_id")
+        )
+        stats["synced"] += 1
+
+    removed = [
+        source for source in state
+        if source.startswith("playlist:") and source not in current_sources
+    ]
+    user_library_store.delete_user_sources(user_id, removed)
+    stats["removed"] = len(removed)
+    return stats
+
+
+def sync_user_library(token_info: dict, user_id: str = None, full: bool = False) -> dict:
+    """
+    Incrementally syncs the user's saved tracks and playlists into the
+    persistent library store (with catalog audio features).
+
+    Args:
+        token_info: Spotify authentication token
+        user_id: Spotify user ID (fetched when not given)
+        full: Ignore cursors and snapshots and refetch everything
+
+    Returns:
+        dict with sync statistics, or an error
+    """
+    from data_spotify import user_library_store
+
+    sp = get_spotify_client(token_info)
+    try:
+        start = time.time()
+        user_id = user_id or sp.current_user()["id"]
+        state = user_library_store.get_sync_state(user_id)
+        saved_written = _sync_saved_tracks(sp, user_id, state, full)
+        playlist_stats = _sync_playlists(sp, user_id, state, full)
+        _user_contexts.delete(user_id)
+        result = {
+            "user_id": user_id,
+            "saved_tracks_written": saved_written,
+            "playlists": playlist_stats,
+            "total_tracks": user_library_store.count_user_tracks(user_id),
+            "seconds": round(time.time() - start, 2),
+        }
+        print(f"--- Library sync complete: {result} ---")
+        return result
+    except Exception as e:
+        return {"error": f"Error syncing user library: {e}"}
+
+
 def add_to_queue(token_info: dict, song_uri: str):
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
         sp.add_to_queue(song_uri)
         return {"message": f"Added {song_uri} to queue."}
@@ -221,7 +442,7 @@ def add_to_queue(token_info: dict, song_uri: str):
     
 
 def start_playback(token_info: dict, uri: str, device_id: str | None = None):
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
         sp.start_playback()
         return {"message": "Playback started."}
@@ -233,7 +454,7 @@ def start_playback_with_uris(token_info: dict, uris: list[str], device_id: str |
     """
     Reemplaza la playback queue con 'uris' y comienza a reproducir desde la primera.
     """
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
         sp.start_playback(device_id=device_id, uris=uris)
         return {"message": "Playback started.", "uris": uris}
@@ -245,7 +466,7 @@ def start_playback_from_context(token_info: dict, context_uri: str, offset_uri:
     """
     Inicia reproducción en un contexto (playlist/álbum) y opcionalmente arrancando en 'offset_uri'.
     """
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
         offset = {"uri": offset_uri} if offset_uri else None
         sp.start_playback(device_id=device_id, context_uri=context_uri, offset=offset)
@@ -256,7 +477,7 @@ def start_playback_from_context(token_info: dict, context_uri: str, offset_uri:
 
 
 def pause_playback(token_info: dict):
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
         sp.pause_playback()
         return {"message": "Playback paused."}
@@ -265,7 +486,7 @@ def pause_playback(token_info: dict):
 
 
 def next_track(token_info: dict):
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
         sp.next_track()
         return {"message": "Skipped to next track."}
@@ -274,9 +495,10 @@ def next_track(token_info: dict):
 
 
 def get_current_playback(token_info: dict):
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
-        current_playback = sp.current_playback()
+        # With a market, Spotify omits the available_markets lists
+        current_playback = sp.current_playback(market="from_token")
         if current_playback:
             return {"current_playback": current_playback}
         else:
@@ -286,16 +508,16 @@ def get_current_playback(token_info: dict):
 
 
 def search_track(token_info: dict, query: str):
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
-        results = sp.search(q=query, type="track", limit=10)
+        results = sp.search(q=query, type="track", limit=10, market="from_token")
         return {"results": results["tracks"]["items"]}
     except Exception as e:
         return {"error": f"Error searching track: {e}"}
 
 
 def get_current_queue(token_info: dict):
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
         queue = sp.queue()
         return queue
@@ -304,7 +526,7 @@ def get_current_queue(token_info: dict):
 
 
 def stop_playback(token_info: dict):
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
         sp.pause_playback()
         return {"message": "Playback stopped."}
@@ -313,7 +535,7 @@ def stop_playback(token_info: dict):
 
 
 def create_playlist_from_queue(token_info: dict, playlist_name: str):
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
         user_id = sp.current_user()["id"]
         queue_items = sp.queue()["queue"]
@@ -328,6 +550,8 @@ def create_playlist_from_queue(token_info: dict, playlist_name: str):
             public=False
         )
         sp.playlist_add_items(playlist_id=playlist["id"], items=track_uris)
+        # The cached profile lists the user's playlists
+        _user_contexts.delete(user_id)
         msg = (
             f"Playlist '{playlist_name}' created with "
             f"{len(track_uris)} songs."
@@ -338,7 +562,7 @@ def create_playlist_from_queue(token_info: dict, playlist_name: str):
 
 
 def add_track_to_likes(token_info: dict, track_uri: str):
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
         sp.current_user_saved_tracks_add([track_uri])
         return {"message": f"Added {track_uri} to liked songs."}
@@ -347,7 +571,7 @@ def add_track_to_likes(token_info: dict, track_uri: str):
 
 
 def get_user_playlists(token_info: dict):
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
         # Limit to 50 for now
         playlists = sp.current_user_playlists(limit=50)
@@ -357,7 +581,7 @@ def get_user_playlists(token_info: dict):
 
 
 def previous_track(token_info: dict):
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
         sp.previous_track()
         return {"message": "Skipped to previous track."}
@@ -367,7 +591,7 @@ def previous_track(token_info: dict):
 
 def transfer_playback(token_info: dict, device_id: str):
     """Transfers playback to a new device and ensures playback starts."""
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     try:
         sp.transfer_playback(device_id=device_id, force_play=True)
         return {"message": f"Playback transferred to device {device_id}."}
@@ -389,7 +613,9 @@ def validate_track_uri(token_info: dict, track_uri: str) -> dict:
         - track_info: dict with track details if valid
         - error: str if invalid
     """
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    import spotipy
+
+    sp = get_spotify_client(token_info)
     
     try:
         # Check URI format
@@ -399,6 +625,11 @@ def validate_track_uri(token_info: dict, track_uri: str) -> dict:
                 "error": "Invalid URI format"
             }
         
+        # Tracks validated before (by any worker) skip the API call
+        cached = _track_validity.get(track_uri)
+        if cached is not None:
+            return cached
+
         # Extract track ID
         track_id = track_uri.split(":")[-1]
         
@@ -406,7 +637,7 @@ def validate_track_uri(token_info: dict, track_uri: str) -> dict:
         track_info = sp.track(track_id)
         
         if track_info and track_info.get("id"):
-            return {
+            validation = {
                 "valid": True,
                 "track_info": {
                     "name": track_info.get("name"),
@@ -414,12 +645,27 @@ def validate_track_uri(token_info: dict, track_uri: str) -> dict:
                     "uri": track_uri
                 }
             }
+            _track_validity.set(track_uri, validation)
         else:
-            return {
+            validation = {
                 "valid": False,
                 "error": "Track not found in Spotify"
             }
+            _track_validity.set(track_uri, validation, TRACK_NOT_FOUND_CACHE_SECONDS)
+        return validation
             
+    except spotipy.SpotifyException as e:
+        if e.http_status in (400, 404):
+            validation = {
+                "valid": False,
+                "error": "Track not found in Spotify"
+            }
+            _track_validity.set(track_uri, validation, TRACK_NOT_FOUND_CACHE_SECONDS)
+            return validation
+        return {
+            "valid": False,
+            "error": f"Spotify API error: {str(e)}"
+        }
     except Exception as e:
         return {
             "valid": False,
@@ -442,7 +688,7 @@ def validate_and_add_tracks_to_queue(token_info: dict, track_uris: list) -> dict
         - invalid_tracks: list of invalid URIs with reasons
         - total_tracks: int
     """
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = get_spotify_client(token_info)
     
     valid_tracks = []
     invalid_tracks = []
@@ -73,8 +73,7 @@ async def test_real_agents_with_runner():
     print("[OK] Token retrieved successfully")
     
     # Get user info for context
-    import spotipy
-    sp = spotipy.Spotify(auth=token_info["access_token"])
+    sp = spotify_service.get_spotify_client(token_info)
     user_info = sp.current_user()
     user_id = user_info["id"]
     display_name = user_info.get('display_name', 'Unknown')
@@ -162,8 +161,7 @@ async def test_real_agents_with_runner():
     # Step 4: Verify Spotify queue (optional)
     print("\n4. Verifying Spotify queue...")
     try:
-        import spotipy
-        sp = spotipy.Spotify(auth=token_info["access_token"])
+        sp = spotify_service.get_spotify_client(token_info)
         
         # Get current queue
         current_queue = sp.queue()
@@ -0,0 +1,37 @@
+"""
+Access to the operational endpoints (routers/admin.py).
+
+Run from backend/:
+    python -m pytest -q tests
+"""
+import sys
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from routers import admin
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(admin.router)
+    return TestClient(app)
+
+
+def test_admin_endpoints_are_off_without_a_token(monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "")
+    client = _client()
+    assert client.get("/admin/admission").status_code == 404
+    assert client.get("/metrics").status_code == 404
+
+
+def test_admin_endpoints_require_the_token(monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "operator-token")
+    client = _client()
+    assert client.get("/admin/admission").status_code == 401
+    assert client.get("/admin/admission", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    assert client.get("/admin/admission", headers={"X-Admin-Token": "operator-token"}).status_code == 200
+    assert client.get("/metrics", headers={"Authorization": "Bearer operator-token"}).status_code == 200
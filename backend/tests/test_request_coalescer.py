@@ -0,0 +1,44 @@
+"""
+Single-flight /chat requests (agents/request_coalescer.py).
+
+Run from backend/:
+    python -m pytest -q tests
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents.request_coalescer import RequestCoalescer, normalize_request
+
+
+def test_normalize_request_keeps_word_order():
+    assert normalize_request("  Rock   NOT pop ") == "rock not pop"
+    assert normalize_request("rock not pop") != normalize_request("pop not rock")
+
+
+def test_cancelled_runner_does_not_cancel_duplicates():
+    async def scenario():
+        coalescer = RequestCoalescer(retention_seconds=0)
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"status": "success", "run": len(calls)}
+
+        leader = asyncio.create_task(coalescer.run("key", work))
+        await asyncio.sleep(0.01)
+        duplicates = [asyncio.create_task(coalescer.run("key", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        results = await asyncio.gather(*duplicates)
+        assert leader.cancelled()
+        # One duplicate ran the work again, the other shared its result
+        assert len(calls) == 2
+        assert sorted(coalesced for _, coalesced in results) == [False, True]
+        assert all(result["run"] == 2 for result, _ in results)
+
+    asyncio.run(scenario())
@@ -0,0 +1,69 @@
+"""
+Follow-up detection of the vibe sessions (agents/vibe_session.py).
+
+Run from backend/:
+    python -m pytest -q tests
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents.vibe_session import ADJUSTMENT_STEP, TEMPO_STEP, parse_follow_up
+
+
+@pytest.mark.parametrize("message, expected", [
+    # More of the same
+    ("more like this", {}),
+    ("keep going", {}),
+    ("a bit more of this please", {}),
+    ("más así", {}),
+    # Comparisons with the previous playlist
+    ("a bit more energetic", {"energy": ADJUSTMENT_STEP * 0.5}),
+    ("much more energetic", {"energy": ADJUSTMENT_STEP * 1.5}),
+    ("less sad", {"valence": ADJUSTMENT_STEP}),
+    ("calmer", {"energy": -ADJUSTMENT_STEP}),
+    ("slower please", {"tempo": -TEMPO_STEP}),
+    ("un poco más alegre", {"valence": ADJUSTMENT_STEP * 0.5}),
+    ("menos triste y más rápido", {"valence": ADJUSTMENT_STEP, "tempo": TEMPO_STEP}),
+    # New requests: intensity words alone are not a comparison
+    ("a lot of happy songs", None),
+    ("a little sad music for studying", None),
+    ("way too tired, give me energetic rock", None),
+    ("much love for jazz", None),
+    ("a bit", None),
+    ("happy songs", None),
+    ("more songs for a long road trip with friends tonight", None),
+    ("", None),
+])
+def test_parse_follow_up(message, expected):
+    result = parse_follow_up(message)
+    if expected is None:
+        assert result is None
+    else:
+        assert result == pytest.approx(expected)
+
+
+def test_sessions_are_shared_through_the_store(tmp_path, monkeypatch):
+    from agents.vibe_session import VibeSessionStore
+    from data_spotify import user_library_store
+
+    monkeypatch.setattr(user_library_store, "USER_DB_FILE", str(tmp_path / "user_library.duckdb"))
+    monkeypatch.setattr(user_library_store, "_schema_ready", False)
+
+    # Two workers, each with its own process-local copy
+    first, second = VibeSessionStore(), VibeSessionStore()
+    first.record("user", "chill", {"energy": [0.1, 0.4]}, ["a1"], user_profile={"top": []})
+    second.record("user", "more like this", {"energy": [0.1, 0.4]}, ["b1"])
+    first.record("user", "more like this", {"energy": [0.1, 0.4]}, ["a2"])
+
+    session = second.get("user")
+    assert session["message"] == "more like this"
+    assert session["queued_uris"] == ["a1", "b1", "a2"]
+    assert session["user_profile"] == {"top": []}
+
+    # A run whose search target is unknown leaves no target to follow up on
+    first.record("user", "something else", None, ["a3"])
+    assert second.get("user")["mood_params"] is None
@@ -0,0 +1,299 @@
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Lightweight per-request tracing and process-wide metrics.
+#
+# A Trace is bound to the current request through a context variable, so
+# spans opened anywhere below the /chat handler (agent callbacks, tools,
+# database queries) are attached to it, including inside the tasks the
+# ParallelAgent spawns. Every finished span is also aggregated into the
+# process-wide MetricsRegistry, exported in Prometheus text format by
+# GET /metrics.
+
+# Histogram buckets (seconds) shared by all latency metrics
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+# Span attributes that are exported as token counters
+TOKEN_ATTRIBUTES = ("prompt_tokens", "output_tokens")
+
+
+class MetricsRegistry:
+    """
+    Thread-safe in-process registry of counters and histograms.
+
+    Metrics are identified by name plus a sorted tuple of label pairs,
+    which is all the Prometheus text format needs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._types = {}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def describe(self, name: str, metric_type: str, help_text: str):
+        """Registers the type and help text of a metric."""
+        with self._lock:
+            self._types[name] = metric_type
+            self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, /, **labels):
+        """Increments a counter."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._types.setdefault(name, "counter")
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, /, **labels):
+        """Sets a gauge to an absolute value."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._types.setdefault(name, "gauge")
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, /, **labels):
+        """Records one observation in a histogram."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._types.setdefault(name, "histogram")
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    "buckets": [0] * len(LATENCY_BUCKETS),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def histogram_snapshot(self, name: str) -> dict:
+        """
+        Returns count, sum and bucket counts of every label set of a
+        histogram (used by admin endpoints and benchmarks).
+        """
+        with self._lock:
+            return {
+                labels: {
+                    "count": data["count"],
+                    "sum": data["sum"],
+                    "buckets": dict(zip(LATENCY_BUCKETS, data["buckets"])),
+                }
+                for (metric, labels), data in self._histograms.items()
+                if metric == name
+            }
+
+    def reset(self):
+        """Clears all recorded values (descriptions are kept)."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        with self._lock:
+            lines = []
+            names = sorted(
+                {key[0] for key in self._counters}
+                | {key[0] for key in self._gauges}
+                | {key[0] for key in self._histograms}
+            )
+            for name in names:
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {self._types.get(name, 'untyped')}")
+
+                for (metric, labels), value in sorted(self._counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+                for (metric, labels), value in sorted(self._gauges.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+                for (metric, labels), data in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(LATENCY_BUCKETS, data["buckets"]):
+                        bucket_labels = labels + (("le", str(bound)),)
+                        lines.append(
+                            f"{name}_bucket{_format_labels(bucket_labels)} {count}"
+                        )
+                    inf_labels = labels + (("le", "+Inf"),)
+                    lines.append(
+                        f"{name}_bucket{_format_labels(inf_labels)} {data['count']}"
+                    )
+                    lines.append(f"{name}_sum{_format_labels(labels)} {data['sum']}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {data['count']}")
+            return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: tuple) -> str:
+    """Formats label pairs as {key="value",...}."""
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+# Process-wide metrics registry
+metrics = MetricsRegistry()
+metrics.describe(
+    "vibe_stage_duration_seconds", "histogram",
+    "Duration of pipeline stages (profile fetch, LLM turns, tools, DB queries...)"
+)
+metrics.describe(
+    "vibe_llm_tokens_total", "counter",
+    "LLM tokens used, by agent and kind (prompt/output)"
+)
+metrics.describe(
+    "vibe_stage_errors_total", "counter",
+    "Pipeline stages that raised an exception"
+)
+
+
+class Span:
+    """One timed stage of a request, with free-form attributes."""
+
+    def __init__(self, name: str, trace_start: float = None, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.offset = self.start - trace_start if trace_start else 0.0
+        self.end = None
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds (up to now if the span is still open)."""
+        return (self.end or time.perf_counter()) - self.start
+
+    def set(self, **attributes):
+        """Adds attributes (e.g. token counts) to the span."""
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "start_ms": round(self.offset * 1000, 2),
+            "duration_ms": round(self.duration * 1000, 2),
+            **self.attributes,
+        }
+
+
+class Trace:
+    """All spans recorded while handling one request."""
+
+    def __init__(self, trace_id: str = None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.start = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.offset)
+            return {
+                "trace_id": self.trace_id,
+                "duration_ms": round((time.perf_counter() - self.start) * 1000, 2),
+                "spans": [span.to_dict() for span in spans],
+            }
+
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def current_trace() -> Trace | None:
+    """Returns the trace of the current request, if any."""
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(trace_id: str = None):
+    """
+    Binds a new Trace to the current context for the duration of the block.
+
+    Usage:
+        with start_trace() as trace:
+            ...
+            response["trace"] = trace.to_dict()
+    """
+    trace = Trace(trace_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def begin_span(name: str, **attributes) -> Span:
+    """
+    Opens a span and attaches it to the current trace (if any).
+
+    Use with end_span() when start and end happen in different
+    callbacks; otherwise prefer the span() context manager.
+    """
+    trace = current_trace()
+    span_ = Span(name, trace.start if trace else None, **attributes)
+    if trace:
+        trace.add(span_)
+    return span_
+
+
+def end_span(span_: Span, error: Exception = None):
+    """Closes a span and records its duration and token counts as metrics."""
+    if span_.end is not None:
+        return
+    span_.end = time.perf_counter()
+    label = (
+        span_.attributes.get("tool")
+        or span_.attributes.get("agent")
+        or span_.attributes.get("query")
+        or ""
+    )
+    metrics.observe(
+        "vibe_stage_duration_seconds", span_.duration,
+        stage=span_.name, name=label
+    )
+    if error is not None:
+        span_.set(error=f"{type(error).__name__}: {error}")
+        metrics.inc("vibe_stage_errors_total", stage=span_.name, name=label)
+    for attribute in TOKEN_ATTRIBUTES:
+        if span_.attributes.get(attribute):
+            metrics.inc(
+                "vibe_llm_tokens_total", span_.attributes[attribute],
+                agent=label, kind=attribute.replace("_tokens", "")
+            )
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Times a block of code as a span of the current trace.
+
+    Usage:
+        with span("profile_fetch"):
+            user_profile = get_user_context(token_info)
+    """
+    span_ = begin_span(name, **attributes)
+    try:
+        yield span_
+    except BaseException as e:
+        end_span(span_, error=e)
+        raise
+    else:
+        end_span(span_)
@@ -0,0 +1,558 @@
+"""
+Resumable, streaming ingest of the Kaggle catalog into a typed snapshot.
+
+The dataset (maltegrosse/8-m-spotify-tracks-genre-audio-features) is a
+SQLite file whose columns are untyped text. The pipeline turns it into a
+published catalog snapshot (see data_spotify/catalog_snapshots.py):
+
+    fetch      locate the .sqlite file: a Kaggle download, or offline a
+               local .sqlite, .zip archive or directory. Archives are
+               extracted in chunks; the file is hashed (sha256) while it
+               streams and checked against --sha256 when given
+    validate   SQLite header, required tables and columns, row counts
+               (and PRAGMA quick_check with --integrity-check)
+    build      copies the tables the app uses into typed tables, chunk by
+               chunk (INGEST_CHUNK_ROWS), collecting per-column
+               statistics (nulls, min, max, mean) in the same pass
+    index      creates the join indexes and runs ANALYZE
+    verify     row counts against the source, quick_check of the result
+    publish    publishes the database as a snapshot, with its feature
+               artifact and the ingest report in the manifest
+
+Memory stays bounded: rows move inside SQLite (INSERT ... SELECT over
+rowid ranges) with a fixed page cache, and indexes are sorted on disk.
+Each chunk is committed together with its progress, and finished stages
+are recorded in <workdir>/state.json, so an interrupted ingest resumes
+where it stopped when run again with the same input.
+
+Usage (from backend/):
+    python -m utils.catalog_ingest                       # Kaggle download
+    python -m utils.catalog_ingest --archive spotify.zip --sha256 <hex>
+    python -m utils.catalog_ingest --archive /data/spotify.sqlite --output ingest.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import time
+import zipfile
+
+from data_spotify.catalog_snapshots import publish_snapshot
+
+KAGGLE_DATASET = "maltegrosse/8-m-spotify-tracks-genre-audio-features"
+
+INGEST_WORKDIR = os.getenv(
+    "INGEST_WORKDIR",
+    os.path.join(os.path.dirname(__file__), "..", "data_spotify", "ingest")
+)
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "100000"))
+# SQLite page cache of the build, in MB
+INGEST_CACHE_MB = int(os.getenv("INGEST_CACHE_MB", "64"))
+# Fewer tracks than this means a truncated or wrong file
+INGEST_MIN_TRACKS = int(os.getenv("INGEST_MIN_TRACKS", "1"))
+
+COPY_CHUNK_BYTES = 8 * 1024 * 1024
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+# Typed tables built from the dataset: only the columns the app reads
+CATALOG_SCHEMA = {
+    "tracks": {
+        "id": "TEXT", "name": "TEXT", "audio_feature_id": "TEXT",
+        "popularity": "INTEGER", "duration": "INTEGER",
+    },
+    "audio_features": {
+        "id": "TEXT", "energy": "REAL", "valence": "REAL",
+        "danceability": "REAL", "acousticness": "REAL",
+        "instrumentalness": "REAL", "speechiness": "REAL",
+        "tempo": "REAL", "loudness": "REAL",
+    },
+    "artists": {"id": "TEXT", "name": "TEXT"},
+    "r_track_artist": {"track_id": "TEXT", "artist_id": "TEXT"},
+    "genres": {"id": "TEXT"},
+    "r_artist_genre": {"genre_id": "TEXT", "artist_id": "TEXT"},
+}
+
+CATALOG_INDEXES = {
+    "idx_tracks_id": ("tracks", "id"),
+    "idx_tracks_popularity": ("tracks", "popularity"),
+    "idx_audio_features_id": ("audio_features", "id"),
+    "idx_artists_id": ("artists", "id"),
+    "idx_r_track_artist_track": ("r_track_artist", "track_id"),
+    "idx_r_track_artist_artist": ("r_track_artist", "artist_id"),
+    "idx_r_artist_genre_artist": ("r_artist_genre", "artist_id"),
+    "idx_r_artist_genre_genre": ("r_artist_genre", "genre_id"),
+}
+
+# Features whose values should lie in [0, 1]
+UNIT_FEATURES = [
+    "energy", "valence", "danceability", "acousticness",
+    "instrumentalness", "speechiness",
+]
+
+STAGES = ["fetch", "validate", "build", "index", "verify", "publish"]
+
+
+def _typed(column: str, sql_type: str) -> str:
+    """Source column cast to its type; blank or missing values become NULL."""
+    if sql_type == "TEXT":
+        return f"CAST({column} AS TEXT)"
+    return f"CAST(NULLIF(TRIM(CAST({column} AS TEXT)), '') AS {sql_type})"
+
+
+def _merge_stats(total: dict, chunk: dict):
+    for column, values in chunk.items():
+        merged = total.setdefault(column, {"nulls": 0})
+        merged["nulls"] += values["nulls"]
+        if "sum" in values:
+            merged["sum"] = merged.get("sum", 0.0) + (values["sum"] or 0.0)
+            merged["count"] = merged.get("count", 0) + values["count"]
+            for key, pick in (("min", min), ("max", max)):
+                if values[key] is not None:
+                    merged[key] = values[key] if merged.get(key) is None else pick(merged[key], values[key])
+        if "out_of_range" in values:
+            merged["out_of_range"] = merged.get("out_of_range", 0) + values["out_of_range"]
+
+
+class IngestPipeline:
+    """Runs the ingest stages, skipping those a previous run finished."""
+
+    def __init__(
+        self,
+        archive: str = None,
+        dataset: str = KAGGLE_DATASET,
+        sha256: str = None,
+        workdir: str = INGEST_WORKDIR,
+        chunk_rows: int = INGEST_CHUNK_ROWS,
+        integrity_check: bool = False,
+        version: str = None,
+        make_current: bool = True,
+        keep_workdir: bool = False
+    ):
+        """
+        Args:
+            archive: Local .sqlite file, .zip archive or directory (offline);
+                     None downloads `dataset` with kagglehub
+            dataset: Kaggle dataset handle
+            sha256: Expected checksum of the .sqlite file
+            workdir: Directory for the extracted file, the build and its state
+            chunk_rows: Rows copied per transaction
+            integrity_check: Run PRAGMA quick_check on the source too
+            version: Snapshot name (defaults to a UTC timestamp)
+            make_current: Activate the snapshot once published
+            keep_workdir: Keep the work directory after publishing
+        """
+        self.archive = archive
+        self.dataset = dataset
+        self.sha256 = sha256.lower() if sha256 else None
+        self.workdir = os.path.abspath(workdir)
+        self.chunk_rows = chunk_rows
+        self.integrity_check = integrity_check
+        self.version = version
+        self.make_current = make_current
+        self.keep_workdir = keep_workdir
+        self.catalog_file = os.path.join(self.workdir, "catalog.sqlite")
+        self.state_file = os.path.join(self.workdir, "state.json")
+        self.state = {}
+
+    # --- state ---
+
+    def _load_state(self):
+        try:
+            with open(self.state_file) as f:
+                self.state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.state = {}
+
+    def _save_state(self):
+        tmp_path = self.state_file + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_file)
+
+    def _reset(self, origin: dict):
+        """Starts over: the input differs from the interrupted run's."""
+        if self.state:
+            print("--- Ingest: input changed, discarding the previous run ---")
+        shutil.rmtree(self.workdir, ignore_errors=True)
+        os.makedirs(self.workdir, exist_ok=True)
+        self.state = {"origin": origin, "stages": {}}
+        self._save_state()
+
+    # --- input ---
+
+    def _locate_input(self) -> str:
+        """Path of the .sqlite file, .zip archive or directory to ingest."""
+        if self.archive:
+            return os.path.abspath(self.archive)
+        import kagglehub
+
+        print(f"Downloading dataset {self.dataset} from Kaggle...")
+        return kagglehub.dataset_download(self.dataset)
+
+    @staticmethod
+    def _find_sqlite(path: str) -> str:
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                if name.endswith(".sqlite"):
+                    return os.path.join(root, name)
+        raise ValueError(f"No .sqlite file found in {path}")
+
+    def _origin(self, path: str) -> dict:
+        if os.path.isdir(path):
+            path = self._find_sqlite(path)
+        stat = os.stat(path)
+        return {"path": path, "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+    # --- stages ---
+
+    def fetch(self) -> dict:
+        """Extracts (if needed) and hashes the source file."""
+        import hashlib
+
+        path = self.state["origin"]["path"]
+        digest = hashlib.sha256()
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                members = [m for m in archive.infolist() if m.filename.endswith(".sqlite")]
+                if not members:
+                    raise ValueError(f"No .sqlite file in {path}")
+                member = members[0]
+                source = os.path.join(self.workdir, "source.sqlite")
+                part = source + ".part"
+                done = os.path.getsize(part) if os.path.exists(part) else 0
+                with archive.open(member) as reader, open(part, "ab") as writer:
+                    # Resume: the existing prefix is re-read (deflate
+                    # streams cannot seek) and hashed, not written again
+                    if done:
+                        print(f"--- Ingest: resuming extraction at {done / 1e6:.0f} MB ---")
+                        self._stream(reader, member.file_size, digest, stop=done)
+                    self._stream(reader, member.file_size, digest, writer=writer, start=done)
+                os.replace(part, source)
+        else:
+            source = path
+            with open(path, "rb") as reader:
+                self._stream(reader, os.path.getsize(path), digest)
+
+        checksum = digest.hexdigest()
+        if self.sha256 and checksum != self.sha256:
+            raise ValueError(f"Checksum mismatch for {path}: {checksum} != {self.sha256}")
+        return {"source": source, "bytes": os.path.getsize(source), "sha256": checksum}
+
+    @staticmethod
+    def _stream(reader, total: int, digest, writer=None, start: int = 0, stop: int = None):
+        """Hashes (and copies) `reader` from byte `start` to `stop`, printing progress."""
+        done = start
+        next_report = 0.0
+        started = time.perf_counter()
+        while stop is None or done < stop:
+            size = COPY_CHUNK_BYTES if stop is None else min(COPY_CHUNK_BYTES, stop - done)
+            chunk = reader.read(size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            if writer is not None:
+                writer.write(chunk)
+            done += len(chunk)
+            if total and done / total >= next_report:
+                rate = (done - start) / max(time.perf_counter() - started, 1e-9) / 1e6
+                print(f"--- Ingest: {done / 1e6:.0f}/{total / 1e6:.0f} MB "
+                      f"({100 * done / total:.0f}%, {rate:.0f} MB/s) ---")
+                next_report = done / total + 0.1
+
+    def _source_connection(self) -> sqlite3.Connection:
+        source = self.state["stages"]["fetch"]["source"]
+        return sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+
+    def validate(self) -> dict:
+        """Checks the source's format, schema and row counts."""
+        source = self.state["stages"]["fetch"]["source"]
+        with open(source, "rb") as f:
+            if f.read(len(SQLITE_MAGIC)) != SQLITE_MAGIC:
+                raise ValueError(f"{source} is not a SQLite database")
+
+        conn = self._source_connection()
+        try:
+            problems = []
+            for table, columns in CATALOG_SCHEMA.items():
+                found = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if not found:
+                    problems.append(f"missing table {table}")
+                else:
+                    problems.extend(
+                        f"missing column {table}.{column}" for column in columns if column not in found
+                    )
+            if problems:
+                raise ValueError("Invalid catalog: " + "; ".join(problems))
+
+            rows = {}
+            for table in CATALOG_SCHEMA:
+                (rows[table],) = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+                print(f"--- Ingest: {table}: {rows[table]} rows ---")
+            if rows["tracks"] < INGEST_MIN_TRACKS:
+                raise ValueError(f"Only {rows['tracks']} tracks (expected >= {INGEST_MIN_TRACKS})")
+
+            quick_check = "skipped"
+            if self.integrity_check:
+                quick_check = conn.execute("PRAGMA quick_check").fetchone()[0]
+                if quick_check != "ok":
+                    raise ValueError(f"Source integrity check failed: {quick_check}")
+        finally:
+            conn.close()
+        return {"rows": rows, "quick_check": quick_check}
+
+    def _catalog_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.catalog_file, isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = -{INGEST_CACHE_MB * 1024}")
+        conn.execute("PRAGMA temp_store = FILE")
+        return conn
+
+    def build(self) -> dict:
+        """Copies every table into its typed version, chunk by chunk."""
+        source = self.state["stages"]["fetch"]["source"]
+        expected = self.state["stages"]["validate"]["rows"]
+        conn = self._catalog_connection()
+        try:
+            conn.execute("ATTACH DATABASE ? AS src", (f"file:{source}?mode=ro",))
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS _ingest_progress (
+                    table_name TEXT PRIMARY KEY,
+                    last_rowid INTEGER,
+                    rows INTEGER,
+                    stats TEXT
+                )
+            """)
+            tables = {}
+            for table, columns in CATALOG_SCHEMA.items():
+                definition = ", ".join(f"{name} {sql_type}" for name, sql_type in columns.items())
+                conn.execute(f"CREATE TABLE IF NOT EXISTS main.{table} ({definition})")
+                tables[table] = self._copy_table(conn, table, columns, expected[table])
+        finally:
+            conn.close()
+        return {"tables": tables}
+
+    def _copy_table(self, conn, table: str, columns: dict, expected: int) -> dict:
+        progress = conn.execute(
+            "SELECT last_rowid, rows, stats FROM _ingest_progress WHERE table_name = ?", (table,)
+        ).fetchone()
+        last_rowid, rows, stats = (
+            (progress[0], progress[1], json.loads(progress[2])) if progress else (0, 0, {})
+        )
+        if progress:
+            print(f"--- Ingest: resuming {table} at {rows}/{expected} rows ---")
+
+        names = ", ".join(columns)
+        select = ", ".join(_typed(name, sql_type) for name, sql_type in columns.items())
+        start = time.perf_counter()
+        copied = 0
+        while True:
+            (upper,) = conn.execute(
+                f"SELECT MAX(rowid) FROM (SELECT rowid FROM src.{table} "
+                f"WHERE rowid > ? ORDER BY rowid LIMIT ?)", (last_rowid, self.chunk_rows)
+            ).fetchone()
+            if upper is None:
+                break
+            conn.execute("BEGIN")
+            (first,) = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM main.{table}").fetchone()
+            count = conn.execute(
+                f"INSERT INTO main.{table} ({names}) SELECT {select} FROM src.{table} "
+                f"WHERE rowid > ? AND rowid <= ? ORDER BY rowid", (last_rowid, upper)
+            ).rowcount
+            _merge_stats(stats, self._chunk_stats(conn, table, columns, first))
+            last_rowid, rows = upper, rows + count
+            conn.execute(
+                "INSERT OR REPLACE INTO _ingest_progress VALUES (?, ?, ?, ?)",
+                (table, last_rowid, rows, json.dumps(stats))
+            )
+            conn.execute("COMMIT")
+
+            copied += count
+            elapsed = time.perf_counter() - start
+            rate = copied / max(elapsed, 1e-9)
+            eta = (expected - rows) / rate if rate else 0
+            print(f"--- Ingest: {table} {rows}/{expected} rows "
+                  f"({100 * rows / max(expected, 1):.0f}%, {rate:,.0f} rows/s, ETA {eta:.0f}s) ---")
+
+        for values in stats.values():
+            if values.get("count"):
+                values["mean"] = values.pop("sum") / values["count"]
+        return {"rows": rows, "columns": stats}
+
+    @staticmethod
+    def _chunk_stats(conn, table: str, columns: dict, after_rowid: int) -> dict:
+        """Statistics of the rows just inserted (still in the page cache)."""
+        aggregates = []
+        for name, sql_type in columns.items():
+            aggregates.append(f"SUM({name} IS NULL)")
+            if sql_type != "TEXT":
+                aggregates += [f"COUNT({name})", f"MIN({name})", f"MAX({name})", f"SUM({name})"]
+                if name in UNIT_FEATURES:
+                    aggregates.append(f"SUM({name} < 0 OR {name} > 1)")
+        values = iter(conn.execute(
+            f"SELECT {', '.join(aggregates)} FROM main.{table} WHERE rowid > ?", (after_rowid,)
+        ).fetchone())
+
+        stats = {}
+        for name, sql_type in columns.items():
+            column = stats[name] = {"nulls": next(values) or 0}
+            if sql_type != "TEXT":
+                column["count"], column["min"], column["max"], column["sum"] = (
+                    next(values), next(values), next(values), next(values)
+                )
+                if name in UNIT_FEATURES:
+                    column["out_of_range"] = next(values) or 0
+        return stats
+
+    def index(self) -> dict:
+        """Creates the join indexes (sorted on disk) and runs ANALYZE."""
+        conn = self._catalog_connection()
+        timings = {}
+        try:
+            for name, (table, column) in CATALOG_INDEXES.items():
+                start = time.perf_counter()
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})")
+                timings[name] = round(time.perf_counter() - start, 2)
+                print(f"--- Ingest: index {name} ({timings[name]}s) ---")
+            conn.execute("ANALYZE")
+        finally:
+            conn.close()
+        return {"index_seconds": timings}
+
+    def verify(self) -> dict:
+        """Compares row counts with the source and checks the result."""
+        expected = self.state["stages"]["validate"]["rows"]
+        conn = self._catalog_connection()
+        try:
+            problems = []
+            for table, count in expected.items():
+                (rows,) = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+                if rows != count:
+                    problems.append(f"{table}: {rows} rows != {count} in the source")
+            quick_check = conn.execute("PRAGMA quick_check").fetchone()[0]
+            if quick_check != "ok":
+                problems.append(f"quick_check: {quick_check}")
+            if problems:
+                raise ValueError("Catalog verification failed: " + "; ".join(problems))
+
+            warnings = [
+                f"audio_features.{name}: {values['out_of_range']} values outside [0, 1]"
+                for name, values in self.state["stages"]["build"]["tables"]["audio_features"]["columns"].items()
+                if values.get("out_of_range")
+            ]
+            for warning in warnings:
+                print(f"Warning: {warning}")
+
+            # A self-contained file: no progress table, no WAL
+            conn.execute("DROP TABLE IF EXISTS _ingest_progress")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            conn.close()
+        return {"quick_check": quick_check, "warnings": warnings}
+
+    def publish(self) -> dict:
+        """Publishes the typed catalog as a snapshot."""
+        stages = self.state["stages"]
+        origin = self.archive or f"kaggle:{self.dataset}"
+        manifest = publish_snapshot(
+            self.catalog_file,
+            version=self.version,
+            move=True,
+            make_current=self.make_current,
+            source=origin,
+            details={"ingest": {
+                "source_sha256": stages["fetch"]["sha256"],
+                "source_rows": stages["validate"]["rows"],
+                "tables": stages["build"]["tables"],
+                "stage_seconds": {name: stage["seconds"] for name, stage in stages.items()},
+            }},
+        )
+        return {"version": manifest["version"]}
+
+    # --- driver ---
+
+    def run(self) -> dict:
+        """
+        Runs the pending stages.
+
+        Returns:
+            Report with the time of each stage (0 and skipped for stages a
+            previous run finished)
+        """
+        started = time.perf_counter()
+        os.makedirs(self.workdir, exist_ok=True)
+        self._load_state()
+        origin = self._origin(self._locate_input())
+        if self.state.get("origin") != origin:
+            self._reset(origin)
+
+        if "publish" not in self.state["stages"] and not os.path.exists(self.catalog_file):
+            # A failed publish consumed the build (it is moved, not copied)
+            for name in ("build", "index", "verify"):
+                self.state["stages"].pop(name, None)
+
+        report = {"input": origin["path"], "stages": {}}
+        for name in STAGES:
+            if name in self.state["stages"]:
+                report["stages"][name] = {"seconds": 0.0, "skipped": True}
+                continue
+            print(f"--- Ingest stage: {name} ---")
+            start = time.perf_counter()
+            result = getattr(self, name)()
+            result["seconds"] = round(time.perf_counter() - start, 2)
+            self.state["stages"][name] = result
+            self._save_state()
+            report["stages"][name] = {"seconds": result["seconds"], "skipped": False}
+            print(f"--- Ingest stage {name} done in {result['seconds']}s ---")
+
+        report["rows"] = self.state["stages"]["validate"]["rows"]
+        report["snapshot"] = self.state["stages"]["publish"]["version"]
+        report["total_seconds"] = round(time.perf_counter() - started, 2)
+        if not self.keep_workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--archive", help="Local .sqlite file, .zip or directory (default: download from Kaggle)")
+    parser.add_argument("--dataset", default=KAGGLE_DATASET, help="Kaggle dataset handle")
+    parser.add_argument("--sha256", help="Expected sha256 of the .sqlite file")
+    parser.add_argument("--workdir", default=INGEST_WORKDIR)
+    parser.add_argument("--chunk-rows", type=int, default=INGEST_CHUNK_ROWS)
+    parser.add_argument("--integrity-check", action="store_true",
+                        help="Run PRAGMA quick_check on the source")
+    parser.add_argument("--version", help="Snapshot name (default: UTC timestamp)")
+    parser.add_argument("--no-activate", action="store_true", help="Publish without making it current")
+    parser.add_argument("--keep-workdir", action="store_true")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    pipeline = IngestPipeline(
+        archive=args.archive,
+        dataset=args.dataset,
+        sha256=args.sha256,
+        workdir=args.workdir,
+        chunk_rows=args.chunk_rows,
+        integrity_check=args.integrity_check,
+        version=args.version,
+        make_current=not args.no_activate,
+        keep_workdir=args.keep_workdir,
+    )
+    try:
+        report = pipeline.run()
+    except ValueError as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
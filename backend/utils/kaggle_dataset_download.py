@@ -1,36 +1,15 @@
-import kagglehub
-import os
-import shutil
+from utils.catalog_ingest import KAGGLE_DATASET, IngestPipeline
 
-# Define the destination directory for the database file
-DESTINATION_DIR = os.path.join(os.path.dirname(__file__), "..", "data_spotify")
-DESTINATION_FILE_NAME = "spotify.sqlite"
+# Downloads the Kaggle dataset and ingests it as a new catalog snapshot:
+# validated, typed, indexed and published with its feature artifact (see
+# utils/catalog_ingest.py). Running workers switch to it on their own.
+# An interrupted run resumes where it stopped.
 
-# Ensure the destination directory exists
-os.makedirs(DESTINATION_DIR, exist_ok=True)
+print(f"Downloading and ingesting {KAGGLE_DATASET}...")
+report = IngestPipeline(dataset=KAGGLE_DATASET).run()
 
-print("Downloading dataset from Kaggle...")
-# Download latest version
-download_path = kagglehub.dataset_download("maltegrosse/8-m-spotify-tracks-genre-audio-features")
+for name, stage in report["stages"].items():
+    print(f"  {name}: {stage['seconds']}s")
+print(f"Published catalog snapshot {report['snapshot']} ({report['rows']['tracks']} tracks)")
 
-print(f"Dataset downloaded to: {download_path}")
-
-# Assuming the sqlite file is directly in the downloaded path
-# We need to find the .sqlite file within the downloaded directory
-sqlite_file_found = None
-for root, _, files in os.walk(download_path):
-    for file in files:
-        if file.endswith(".sqlite"):
-            sqlite_file_found = os.path.join(root, file)
-            break
-    if sqlite_file_found:
-        break
-
-if sqlite_file_found:
-    destination_path = os.path.join(DESTINATION_DIR, DESTINATION_FILE_NAME)
-    shutil.move(sqlite_file_found, destination_path)
-    print(f"Moved '{sqlite_file_found}' to '{destination_path}'")
-else:
-    print("Error: No .sqlite file found in the downloaded dataset.")
-
-print("Kaggle dataset download and setup complete.")
\ No newline at end of file
+print("Kaggle dataset download and setup complete.")
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from tracing import metrics
+
+logger = logging.getLogger(__name__)
+
+# Startup warm-up and readiness.
+#
+# The heavy dependencies (google.adk / google.genai ~5s, spotipy, duckdb,
+# pandas) are imported on first use, so `import main` is fast and the
+# server starts listening right away. Warm-up then loads what requests
+# need hot, step by step:
+#
+#     shared_cache   connects the shared cache backend
+#     catalog        opens the current catalog version and reads its
+#                    audio features
+#     feature_artifact  maps that version's feature artifact and genre
+#                       index, if built (the sharded scan's worker
+#                       processes start with the first fan-out)
+#     user_library   opens the user library store (schema, pandas)
+#     spotify        imports spotipy and builds a client
+#     agent_graph    imports ADK and builds a throwaway orchestrator
+#
+# GET /ready answers 503 until every step has run, then 200 (a failed
+# step is reported but does not block readiness: the request path
+# retries it lazily). WARMUP_MODE selects when warm-up runs:
+#
+#     background  after startup, while the server already answers (default)
+#     blocking    during startup, before the server accepts connections
+#                 (for platforms whose startup probe only checks the port)
+#     off         no warm-up; /ready is green immediately
+#
+# Other modules add their own steps with startup_warmup.register().
+
+WARMUP_MODE = os.getenv("WARMUP_MODE", "background").lower()
+
+metrics.describe(
+    "vibe_warmup_step_seconds", "gauge",
+    "Duration of each startup warm-up step"
+)
+metrics.describe(
+    "vibe_ready", "gauge",
+    "1 once startup warm-up has finished"
+)
+
+
+class WarmUp:
+    """Ordered warm-up steps and the readiness state they drive."""
+
+    def __init__(self, mode: str = WARMUP_MODE):
+        self.mode = mode
+        self._steps = []
+        self._results = {}
+        self._started_at = None
+        self._finished_at = None
+        self._ready = threading.Event()
+
+    def register(self, name: str, step):
+        """
+        Adds a warm-up step.
+
+        Args:
+            name: Step name, reported by /ready
+            step: Function without arguments, run in a worker thread
+        """
+        self._steps.append((name, step))
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def run(self):
+        """Runs every step in order, then marks the app ready."""
+        self._started_at = time.time()
+        for name, step in self._steps:
+            start = time.perf_counter()
+            try:
+                step()
+                result = {"status": "ok"}
+            except Exception as e:
+                print(f"Warning: Warm-up step {name} failed: {e}")
+                result = {"status": "failed", "error": str(e)}
+            duration = time.perf_counter() - start
+            result["duration_ms"] = round(duration * 1000, 1)
+            self._results[name] = result
+            metrics.set_gauge("vibe_warmup_step_seconds", duration, step=name)
+        self._finished_at = time.time()
+        self._ready.set()
+        metrics.set_gauge("vibe_ready", 1)
+        logger.debug("Warm-up finished in %.2fs", self._finished_at - self._started_at)
+
+    async def start(self):
+        """Starts warm-up according to the mode (awaits it when blocking)."""
+        metrics.set_gauge("vibe_ready", 0)
+        if self.mode == "off":
+            self._ready.set()
+            metrics.set_gauge("vibe_ready", 1)
+        elif self.mode == "blocking":
+            await asyncio.to_thread(self.run)
+        else:
+            threading.Thread(target=self.run, name="warmup", daemon=True).start()
+
+    def stats(self) -> dict:
+        pending = [name for name, _ in self._steps if name not in self._results]
+        return {
+            "ready": self.ready,
+            "mode": self.mode,
+            "duration_ms": (
+                round((self._finished_at - self._started_at) * 1000, 1)
+                if self._finished_at else None
+            ),
+            "steps": self._results,
+            "pending": pending,
+        }
+
+
+def _warm_shared_cache():
+    import shared_cache
+
+    shared_cache.get_backend().stats()
+
+
+def _warm_catalog():
+    from data_spotify.database_service import get_db_connection
+
+    conn = get_db_connection()
+    try:
+        conn.execute("SELECT COUNT(*) FROM audio_features").fetchone()
+    finally:
+        conn.close()
+
+
+def _warm_feature_artifact():
+    from data_spotify.database_service import ensure_genre_index, get_catalog
+
+    catalog = get_catalog()
+    catalog.prepare()
+    ensure_genre_index(catalog)
+
+
+def _warm_user_library():
+    from data_spotify.user_library_store import get_store_connection
+
+    get_store_connection().close()
+
+
+def _warm_spotify():
+    from spotify_service import get_spotify_client
+
+    get_spotify_client({"access_token": "warmup"})
+
+
+def _warm_agent_graph():
+    from google.adk.apps import App
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    import agents.agent_manager  # the rest of the pipeline
+    from agents.orchestrator import create_orchestrator_agent
+    from agents.tracing_plugin import TracingPlugin
+
+    orchestrator = create_orchestrator_agent(
+        user_context={},
+        user_id="warmup",
+        user_profile_str="",
+        queue_str="",
+        user_message="warm-up"
+    )
+    Runner(
+        app=App(name="warmup", root_agent=orchestrator, plugins=[TracingPlugin()]),
+        session_service=InMemorySessionService()
+    )
+
+
+# Shared warm-up for the app lifespan and /ready
+startup_warmup = WarmUp()
+startup_warmup.register("shared_cache", _warm_shared_cache)
+startup_warmup.register("catalog", _warm_catalog)
+startup_warmup.register("feature_artifact", _warm_feature_artifact)
+startup_warmup.register("user_library", _warm_user_library)
+startup_warmup.register("spotify", _warm_spotify)
+startup_warmup.register("agent_graph", _warm_agent_graph)
@@ -17,7 +17,7 @@ export default function VibeFM() {
 
   const [theme, setTheme] = useState("light");
   const [token, setToken] = useState('');
-  const [queue, setQueue] = useState('');
+  const [liveQueue, setLiveQueue] = useState([]);
   const [agentMessage, setAgentMessage] = useState('');
   const [validTracks, setValidTracks] = useState(0);
   const [device, setDevice] = useState('');
@@ -48,20 +48,11 @@ export default function VibeFM() {
   };
 
   const handleUpdateQueue = async () => {
-    await loadQueue(validTracks-1);
-    setValidTracks(validTracks-1);
+    setValidTracks((tracks) => Math.max(tracks - 1, 0));
   }
 
-  const loadQueue = async (tracks) => {
-    // Get actual queue
-    await api.get("/spotify/queue")
-      .then((res) => {
-        setQueue(res.data.queue.slice(0,tracks));
-      })
-      .catch((error) => {
-        console.log(error);
-      });
-  }
+  // Only the tracks queued by Vibe.FM are shown
+  const queue = liveQueue.slice(0, validTracks);
 
   const handleMessage = async (message) => {
  
@@ -78,8 +69,8 @@ export default function VibeFM() {
       await api.post('/chat', { message })
       .then((res) => {
         setAgentMessage(res.data.message);
+        // The new queue arrives through the playback stream
         setValidTracks(res.data.valid_tracks + 1 + validTracks);
-        loadQueue(res.data.valid_tracks + 1 + validTracks);
       })
       .catch((error) => {
         console.log(error);
@@ -145,6 +136,57 @@ export default function VibeFM() {
     }
   }, []);
 
+  useEffect(() => {
+    if (!token) return;
+
+    // The backend pushes queue changes (one poller per user, shared by all
+    // tabs) instead of the page polling /spotify/queue.
+    // EventSource cannot send headers, so the stream is opened with a
+    // one-time ticket rather than the token itself.
+    let stream = null;
+    let retry = null;
+    let closed = false;
+
+    const connect = async () => {
+      let ticket;
+      try {
+        const res = await api.post("/spotify/playback/stream_ticket");
+        ticket = res.data.ticket;
+      } catch (error) {
+        console.log(error);
+        if (!closed) retry = setTimeout(connect, 5000);
+        return;
+      }
+      if (closed) return;
+
+      const source = new EventSource(
+        `${BACKEND}/spotify/playback/stream?ticket=${encodeURIComponent(ticket)}`
+      );
+      stream = source;
+      source.addEventListener("queue", (event) => {
+        setLiveQueue(JSON.parse(event.data) || []);
+      });
+      // The token expired or the stream failed: tickets are single-use,
+      // so reconnect with a new one (the current token is read again)
+      const reconnect = () => {
+        source.close();
+        if (!closed) retry = setTimeout(connect, 1000);
+      };
+      source.addEventListener("reauth", reconnect);
+      source.onerror = (error) => {
+        console.log(error);
+        reconnect();
+      };
+    };
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      if (stream) stream.close();
+    };
+  }, [token]);
+
   return (
     <div className="overflow-hidden h-dvh w-dvw">
 